@@ -0,0 +1,106 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message
+
+from bot.services.parser import ParseError, detect_import_delimiter, parse_import_row
+
+import_router = Router()
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024  # лимит Bot API на скачивание файлов
+
+
+class ImportStates(StatesGroup):
+    waiting_for_file = State()
+
+
+@import_router.message(Command("import"))
+async def bot_import(message: Message, state: FSMContext):
+    # файл разбирается, только если пользователь перед этим вызвал /import
+    await state.set_state(ImportStates.waiting_for_file)
+    await message.answer(
+        "📥 *Импорт словаря*\n\n"
+        "Отправьте файл CSV или TSV, где в каждой строке слово и перевод:\n"
+        "`слово;перевод` или `слово<TAB>перевод`",
+        parse_mode="Markdown",
+    )
+
+
+@import_router.message(ImportStates.waiting_for_file, F.document)
+async def bot_import_file(message: Message, state: FSMContext):
+    document = message.document
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer("❌ Файл слишком большой, максимум 20 МБ")
+        return
+
+    await state.clear()
+    db = message.bot.db
+    user_id = message.from_user.id
+    imported = skipped = 0
+    started = False
+
+    try:
+        file = await message.bot.download(document)
+        lines = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+        first_line = lines.readline()
+        try:
+            delimiter = detect_import_delimiter(first_line)
+        except ParseError as e:
+            await message.answer(str(e), parse_mode="Markdown")
+            return
+
+        rows = csv.reader(_chain(first_line, lines), delimiter=delimiter)
+        # у всей партии одна дата первого повторения, как у /add
+        next_repeat = datetime.now(timezone.utc) + timedelta(days=1)
+        progress = await message.answer("⏳ Импортирую слова...")
+        started = True
+
+        chunk = []
+        for row in rows:
+            if not any(field.strip() for field in row):
+                continue
+            try:
+                chunk.append(parse_import_row(row))
+            except ParseError:
+                skipped += 1
+                continue
+
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                imported += await db.import_words(user_id, chunk, next_repeat)
+                chunk = []
+                await progress.edit_text(f"⏳ Импортировано слов: {imported}")
+
+        if chunk:
+            imported += await db.import_words(user_id, chunk, next_repeat)
+
+        await message.answer(
+            f"✅ *Импорт завершён!*\n\n"
+            f"Добавлено слов: {imported}\n"
+            f"Пропущено строк: {skipped}\n"
+            f"Посмотреть статистику: /stats",
+            parse_mode="Markdown",
+        )
+
+    except UnicodeDecodeError:
+        await message.answer("❌ Файл должен быть в кодировке UTF-8")
+    except Exception:
+        await message.answer("Ошибка подключения к базе данных")
+    finally:
+        # пачки коммитятся по отдельности: если импорт оборвался, уже
+        # загруженные слова всё равно попадают в дневные счётчики
+        if started:
+            await db.log_activity(
+                user_id, "import_words", {"count": imported, "skipped": skipped}
+            )
+
+
+def _chain(first_line: str, lines):
+    yield first_line
+    yield from lines
@@ -1,41 +1,26 @@
-from aiogram import Router, types
+from aiogram import F, Router, types
 from bot.models.checker import Checker
 
 review_router = Router()
 
-user_pending_word: dict[int, dict] = {}
 
-
-@review_router.message()
+# только текст: документы вне /import сюда тоже доходят
+@review_router.message(F.text)
 async def review_flow(message: types.Message):
     user_id = message.from_user.id
     text = message.text.strip().lower()
     db = message.bot.db
 
-    if user_id not in user_pending_word:
+    # слово последнего напоминания хранится в базе: ответ может прийти
+    # на другой узел, чем тот, что отправил напоминание
+    pending = await db.get_pending_word(user_id)
+    if pending is None:
         return
 
-    state = user_pending_word[user_id]
-
-    if state["stage"] == "answer":
-        word = state["word"]
-
-        checker = Checker(
-            user=message.from_user,
-            word=word,
-            answer=text,
-            db=db,
-        )
-
-        await checker.evaluate_with_ml()
-        feedback = checker.feedback()
+    word, answer = pending
 
-        user_pending_word[user_id] = {
-            "stage": "confirm",
-            "word": word,
-            "feedback": feedback,
-            "answer": text,
-        }
+    if answer is None:
+        await db.set_pending_answer(user_id, word.id, text)
 
         await message.answer(
             f"Ваш перевод: *{text}*\n"
@@ -43,30 +28,29 @@ async def review_flow(message: types.Message):
             "Вы правильно перевели слово? Напишите **да** или **нет**"
         )
         return
-    if state["stage"] == "confirm":
-        if text not in ("да", "нет", "yes", "no"):
-            await message.answer("Пожалуйста, ответьте **да** или **нет**")
-            return
 
-        correct = text in ("да", "yes")
-        word = state["word"]
-        feedback = state["feedback"]
-
-        rating = feedback.get("rating", 3)
+    if text not in ("да", "нет", "yes", "no"):
+        await message.answer("Пожалуйста, ответьте **да** или **нет**")
+        return
 
-        word.record_history(rating=rating, is_correct=correct)
+    correct = text in ("да", "yes")
 
-        await db.update_word_next_repeat(
-            user_id=user_id,
-            word_id=word.id,
-            next_repeat=word.next_repeat,
-        )
+    # оценка по ответу пользователя: новые параметры слова и строка
+    # review_log пишутся одной транзакцией
+    checker = Checker(
+        user=message.from_user,
+        word=word,
+        answer=answer,
+        db=db,
+        is_correct=correct,
+    )
+    await checker.evaluate_with_ml()
 
-        await db.log_activity(
-            user_id,
-            f"answered:{word.text}:{'correct' if correct else 'wrong'}",
-        )
+    await db.log_activity(
+        user_id,
+        f"answered:{word.text}:{'correct' if correct else 'wrong'}",
+    )
 
-        await message.answer(f"✅ Ответ сохранён.\n")
+    await message.answer(f"✅ Ответ сохранён.\n")
 
-        del user_pending_word[user_id]
+    await db.clear_pending_word(user_id, word.id)
@@ -8,6 +8,13 @@ from bot.models.stats import Stats
 
 start_router = Router()
 
+DEFAULT_SETTINGS = {
+    "notification_time": "10:00",
+    "reminders_per_day": 1,
+    "timezone": "UTC",
+    "language": "рус",
+}
+
 
 @start_router.message(CommandStart())
 async def bot_start(message: Message):
@@ -17,47 +24,47 @@ async def bot_start(message: Message):
         user_id = message.from_user.id
         username = message.from_user.username or message.from_user.first_name or ""
 
-        user = await db.get_user(user_id)
-        if user:
+        user = User(
+            user_id=user_id,
+            username=username,
+            settings=dict(DEFAULT_SETTINGS),
+            progress={
+                "streak_days": 0,  # сколько дней подряд активен пользователь
+                "total_words": 0,  # всего выучено слов
+                "last_active": None,  # последняя активность
+            },
+            words_added={},
+            last_active=datetime.now(),
+            stats=Stats(user_id=user_id),
+            ml_profile={"learning_rate": 1.0, "difficulty_preference": "medium"},
+        )
+        # регистрация идемпотентна: для существующего пользователя ничего
+        # не меняется, а мы узнаём об этом из того же запроса
+        created = await db.add_user(
+            user_id=user.user_id,
+            username=user.username,
+            settings=user.settings,
+        )
+        if created:
             welcome_text = (
-                f"👋 *С возвращением!*\n\n"
+                f"🎉 *Добро пожаловать в бот-напоминалку для изучения слов!*\n\n"
                 "🎯 *Доступные команды:*\n"
                 "/add - добавить новое слово с переводом в словарь\n"
                 "/stats - посмотреть статистику обучения\n"
                 "/settings - изменить настройки отправки напоминаний\n"
                 "/info - информация о настройках\n\n"
-                "Продолжаем учить слова! 📚"
+                "🚀 *Начните с добавления первого слова в словарь с помощью команды /add!*\n"
             )
         else:
-            user = User(
-                user_id=user_id,
-                username=username,
-                settings={
-                    "notification_time": "10:00",
-                    "reminders_per_day": 1,
-                    "timezone": "UTC",
-                    "language": "рус",
-                },
-                progress={
-                    "streak_days": 0,  # сколько дней подряд активен пользователь
-                    "total_words": 0,  # всего выучено слов
-                    "last_active": None,  # последняя активность
-                },
-                words_added={},
-                last_active=datetime.now(),
-                stats=Stats(user_id=user_id),
-                ml_profile={"learning_rate": 1.0, "difficulty_preference": "medium"},
-            )
             welcome_text = (
-                f"🎉 *Добро пожаловать в бот-напоминалку для изучения слов!*\n\n"
+                f"👋 *С возвращением!*\n\n"
                 "🎯 *Доступные команды:*\n"
                 "/add - добавить новое слово с переводом в словарь\n"
                 "/stats - посмотреть статистику обучения\n"
                 "/settings - изменить настройки отправки напоминаний\n"
                 "/info - информация о настройках\n\n"
-                "🚀 *Начните с добавления первого слова в словарь с помощью команды /add!*\n"
+                "Продолжаем учить слова! 📚"
             )
-            await db.add_user(user_id=user.user_id, username=user.username)
         await message.answer(text=welcome_text, parse_mode="Markdown")
 
     except Exception:
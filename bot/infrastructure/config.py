@@ -1,12 +1,216 @@
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+from functools import lru_cache
 
-load_dotenv()
 
-BOT_TOKEN = os.getenv("BOT_TOKEN")
+class ConfigError(Exception):
+    pass
 
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = int(os.getenv("DB_PORT"))
+
+STORAGE_BACKENDS = ("postgres", "memory")
+SCHEDULER_MODES = ("local", "lease")
+
+
+def _get_int(env, name: str, default: int, minimum: int = 0) -> int:
+    raw = env.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ConfigError(f"{name} должно быть целым числом, получено {raw!r}")
+    if value < minimum:
+        raise ConfigError(f"{name} должно быть не меньше {minimum}, получено {value}")
+    return value
+
+
+def _get_float(env, name: str, default: float, minimum: float = 0.0) -> float:
+    raw = env.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ConfigError(f"{name} должно быть числом, получено {raw!r}")
+    if value < minimum:
+        raise ConfigError(f"{name} должно быть не меньше {minimum}, получено {value}")
+    return value
+
+
+def _get_bool(env, name: str, default: bool) -> bool:
+    raw = env.get(name)
+    if raw in (None, ""):
+        return default
+    return raw.lower() in ("1", "true", "yes")
+
+
+def _get_list(env, name: str) -> list[str]:
+    return [item.strip() for item in env.get(name, "").split(",") if item.strip()]
+
+
+@dataclass(frozen=True)
+class Settings:
+    bot_token: str | None = None
+
+    db_user: str | None = None
+    db_password: str | None = None
+    db_name: str | None = None
+    db_host: str | None = None
+    db_port: int = 5432
+
+    # Буфер записи событий активности
+    activity_batch_size: int = 500
+    activity_flush_interval_ms: int = 200
+    activity_queue_size: int = 10000
+
+    # Пул соединений с базой данных
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+
+    # Кэш пользователей и их настроек
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 60.0
+
+    # Хранилище: postgres или memory (для нагрузочных тестов без базы)
+    storage_backend: str = "postgres"
+
+    # Реплики для чтения: список host или host:port
+    db_replica_hosts: list[str] = field(default_factory=list)
+    # Сколько секунд после записи читать данные пользователя с primary
+    read_your_writes_seconds: float = 5.0
+
+    # Сколько часов после notification_time пользователя можно слать напоминания
+    delivery_window_hours: int = 12
+
+    # Планировщик: local — один узел; lease — несколько узлов делят
+    # напоминания через аренду строк (FOR UPDATE SKIP LOCKED)
+    scheduler_mode: str = "local"
+    node_id: str | None = None  # по умолчанию host:pid
+    lease_seconds: int = 300
+    lease_poll_seconds: float = 5.0
+
+    # Рассылка: сколько отправок одновременно и не больше скольких в секунду
+    # (0 — без ограничения частоты)
+    send_concurrency: int = 20
+    send_rate_per_second: float = 25.0
+
+    # Outbox напоминаний: после outbox_max_attempts неудач сообщение
+    # становится dead; пауза между попытками растёт вдвое от outbox_backoff_seconds
+    outbox_max_attempts: int = 8
+    outbox_backoff_seconds: float = 30.0
+
+    # Холодный архив: старые события и ответы переносятся в файлы
+    archive_dir: str = "archive"
+    activity_retention_days: int = 180
+    review_retention_days: int = 365
+
+    @classmethod
+    def from_env(cls, env=None) -> "Settings":
+        env = os.environ if env is None else env
+
+        storage_backend = env.get("STORAGE_BACKEND") or cls.storage_backend
+        if storage_backend not in STORAGE_BACKENDS:
+            raise ConfigError(
+                f"STORAGE_BACKEND должен быть одним из {STORAGE_BACKENDS}, "
+                f"получено {storage_backend!r}"
+            )
+
+        port = _get_int(env, "DB_PORT", cls.db_port, minimum=1)
+        if port > 65535:
+            raise ConfigError(f"DB_PORT вне диапазона: {port}")
+
+        scheduler_mode = env.get("SCHEDULER_MODE") or cls.scheduler_mode
+        if scheduler_mode not in SCHEDULER_MODES:
+            raise ConfigError(
+                f"SCHEDULER_MODE должен быть одним из {SCHEDULER_MODES}, "
+                f"получено {scheduler_mode!r}"
+            )
+
+        window_hours = _get_int(
+            env, "DELIVERY_WINDOW_HOURS", cls.delivery_window_hours, minimum=1
+        )
+        if window_hours > 24:
+            raise ConfigError(f"DELIVERY_WINDOW_HOURS больше суток: {window_hours}")
+
+        return cls(
+            bot_token=env.get("BOT_TOKEN"),
+            db_user=env.get("DB_USER"),
+            db_password=env.get("DB_PASSWORD"),
+            db_name=env.get("DB_NAME"),
+            db_host=env.get("DB_HOST"),
+            db_port=port,
+            activity_batch_size=_get_int(
+                env, "ACTIVITY_BATCH_SIZE", cls.activity_batch_size, minimum=1
+            ),
+            activity_flush_interval_ms=_get_int(
+                env, "ACTIVITY_FLUSH_INTERVAL_MS", cls.activity_flush_interval_ms
+            ),
+            activity_queue_size=_get_int(
+                env, "ACTIVITY_QUEUE_SIZE", cls.activity_queue_size, minimum=1
+            ),
+            db_pool_size=_get_int(env, "DB_POOL_SIZE", cls.db_pool_size, minimum=1),
+            db_max_overflow=_get_int(env, "DB_MAX_OVERFLOW", cls.db_max_overflow),
+            db_pool_timeout=_get_float(env, "DB_POOL_TIMEOUT", cls.db_pool_timeout),
+            db_pool_recycle=_get_int(env, "DB_POOL_RECYCLE", cls.db_pool_recycle),
+            db_pool_pre_ping=_get_bool(env, "DB_POOL_PRE_PING", cls.db_pool_pre_ping),
+            db_statement_cache_size=_get_int(
+                env, "DB_STATEMENT_CACHE_SIZE", cls.db_statement_cache_size
+            ),
+            user_cache_size=_get_int(
+                env, "USER_CACHE_SIZE", cls.user_cache_size, minimum=1
+            ),
+            user_cache_ttl=_get_float(env, "USER_CACHE_TTL", cls.user_cache_ttl),
+            storage_backend=storage_backend,
+            db_replica_hosts=_get_list(env, "DB_REPLICA_HOSTS"),
+            read_your_writes_seconds=_get_float(
+                env, "READ_YOUR_WRITES_SECONDS", cls.read_your_writes_seconds
+            ),
+            delivery_window_hours=window_hours,
+            scheduler_mode=scheduler_mode,
+            node_id=env.get("NODE_ID") or None,
+            lease_seconds=_get_int(env, "LEASE_SECONDS", cls.lease_seconds, minimum=1),
+            lease_poll_seconds=_get_float(
+                env, "LEASE_POLL_SECONDS", cls.lease_poll_seconds
+            ),
+            send_concurrency=_get_int(
+                env, "SEND_CONCURRENCY", cls.send_concurrency, minimum=1
+            ),
+            send_rate_per_second=_get_float(
+                env, "SEND_RATE_PER_SECOND", cls.send_rate_per_second
+            ),
+            outbox_max_attempts=_get_int(
+                env, "OUTBOX_MAX_ATTEMPTS", cls.outbox_max_attempts, minimum=1
+            ),
+            outbox_backoff_seconds=_get_float(
+                env, "OUTBOX_BACKOFF_SECONDS", cls.outbox_backoff_seconds
+            ),
+            archive_dir=env.get("ARCHIVE_DIR") or cls.archive_dir,
+            activity_retention_days=_get_int(
+                env, "ACTIVITY_RETENTION_DAYS", cls.activity_retention_days, minimum=1
+            ),
+            review_retention_days=_get_int(
+                env, "REVIEW_RETENTION_DAYS", cls.review_retention_days, minimum=1
+            ),
+        )
+
+    def require(self, *names: str):
+        """Проверяет, что обязательные для текущего режима параметры заданы."""
+        missing = [name.upper() for name in names if not getattr(self, name)]
+        if missing:
+            raise ConfigError(f"Не заданы переменные окружения: {', '.join(missing)}")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Загружает настройки при первом обращении (включая .env) и кэширует их.
+    Импорт модуля ничего не читает и не проверяет.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return Settings.from_env()
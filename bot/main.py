@@ -6,23 +6,26 @@ from bot.commands.start import start_router
 from bot.commands.info import info_router
 from bot.commands.stats import stats_router
 from bot.commands.add import add_router
+from bot.commands.import_words import import_router
 from bot.commands.settings import settings_router
 from bot.commands.review import review_router
 
-from bot.services.database import Database
+from bot.services.storage import create_database
 from bot.services.notification import NotificationService
 from bot.services.scheduler import Scheduler
 
-from bot.infrastructure.config import BOT_TOKEN
+from bot.infrastructure.config import get_settings
 from bot.infrastructure.telegram_io import TelegramIO
 
 # python -m bot.main
 
 
 async def main():
-    bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.MARKDOWN)
+    settings = get_settings()
+    settings.require("bot_token")
+    bot = Bot(token=settings.bot_token, parse_mode=ParseMode.MARKDOWN)
 
-    db = Database()
+    db = create_database()
     await db.connect()
     bot.db = db
 
@@ -30,12 +33,13 @@ async def main():
 
     telegram_io = TelegramIO(bot)
     notifier = NotificationService(db, telegram_io)
-    scheduler = Scheduler(db, notifier)
+    scheduler = Scheduler(db, notifier, settings)
 
     dp.include_router(start_router)
     dp.include_router(info_router)
     dp.include_router(stats_router)
     dp.include_router(add_router)
+    dp.include_router(import_router)
     dp.include_router(settings_router)
     dp.include_router(review_router)
 
@@ -46,6 +50,9 @@ async def main():
     try:
         await dp.start_polling(bot)
     finally:
+        # сначала останавливаем фоновые задачи: они пишут события в буфер
+        # активности, а db.close() сбрасывает его последним
+        await scheduler.stop()
         await db.close()
         await bot.session.close()
 
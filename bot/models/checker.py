@@ -4,10 +4,20 @@ from ml.src.ml_inference import predict_interval_and_score
 
 
 class Checker:
-    def __init__(self, user, word, answer: str, db, stats: Stats | None = None):
+    def __init__(
+        self,
+        user,
+        word,
+        answer: str,
+        db,
+        stats: Stats | None = None,
+        is_correct: bool | None = None,
+    ):
         self.user = user
         self.word = word
         self.answer = answer.strip().lower()
+        # самооценка пользователя («да»/«нет»); без неё — check_translation
+        self.is_correct = is_correct
         self.stats = stats
         self.db = db
         self.ml_result = {}
@@ -17,7 +27,9 @@ class Checker:
         Вычисляем правильность ответа и рейтинг:
         4 = Easy (правильно), 1 = Again (неправильно)
         """
-        is_correct = self.word.check_translation(self.answer)
+        is_correct = self.is_correct
+        if is_correct is None:
+            is_correct = self.word.check_translation(self.answer)
         rating = 4 if is_correct else 1
         return rating, is_correct
 
@@ -62,9 +74,11 @@ class Checker:
         days = max(1, int(round(interval_days)))
         self.word.next_repeat = datetime.utcnow() + timedelta(days=days)
 
-        # Обновление истории слова
+        # Обновление истории слова; в базе запись попадёт в review_log
+        review = {"rating": rating, "is_correct": is_correct}
         if hasattr(self.word, "record_history"):
-            self.word.record_history(rating=rating, is_correct=is_correct)
+            review = self.word.record_history(rating=rating, is_correct=is_correct)
+        review = {**review, "interval_days": float(interval_days), "ml_score": ml_score}
 
         # Формирование результата для feedback
         self.ml_result = {
@@ -83,6 +97,7 @@ class Checker:
             stability=self.word.stability,
             ml_score=self.word.ml_score,
             repeat_count=self.word.repeat_count,
+            review=review,
         )
 
         # Можно добавить статистику
@@ -1,4 +1,13 @@
 class Stats:
+    __slots__ = (
+        "user_id",
+        "learned_words",
+        "success_rate",
+        "activity_log",
+        "histogram_data",
+        "ml_stats",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -15,6 +24,18 @@ class Stats:
         self.histogram_data = histogram_data
         self.ml_stats = ml_stats
 
+    @classmethod
+    def from_row(cls, row) -> "Stats":
+        """Собирает статистику из строки таблицы stats."""
+        return cls(
+            row.user_id,
+            row.learned_words,
+            row.success_rate,
+            row.activity_log,
+            row.histogram_data,
+            row.ml_stats,
+        )
+
     def update(self, word_id: int, result: bool):
         self.activity_log.append({"word_id": word_id, "result": result})
         if result:
@@ -1,8 +1,19 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from .stats import Stats
 
 
 class User:
+    __slots__ = (
+        "user_id",
+        "username",
+        "settings",
+        "progress",
+        "words_added",
+        "last_active",
+        "stats",
+        "ml_profile",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -20,14 +31,28 @@ class User:
         self.progress = progress
         self.words_added = words_added
         self.last_active = last_active
-        self.stats = Stats(user_id)
+        self.stats = stats if stats is not None else Stats(user_id)
         self.ml_profile = ml_profile
 
+    @classmethod
+    def from_row(cls, row, stats: Stats | None = None) -> "User":
+        """Собирает пользователя из строки таблицы users."""
+        return cls(
+            row.user_id,
+            row.username,
+            row.settings,
+            row.progress,
+            row.words_added,
+            row.last_active,
+            stats,
+            row.ml_profile,
+        )
+
     def add_word(self, word, translation) -> None:
         self.words_added[word] = translation
 
     def update_last_active(self) -> None:
-        self.last_active = datetime.now(datetime.timezone.utc)
+        self.last_active = datetime.now(timezone.utc)
 
     def get_info(self) -> dict:
         return {
@@ -1,8 +1,41 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from difflib import SequenceMatcher
+from typing import NamedTuple
+
+HISTORY_LIMIT = 20
+
+
+class WordUpdate(NamedTuple):
+    """Изменение одного слова для массового обновления; None — не менять."""
+
+    word_id: int
+    user_id: int
+    next_repeat: datetime | None = None
+    difficulty: float | None = None
+    stability: float | None = None
+    ml_score: float | None = None
+    repeat_count: int | None = None
+    personal_difficulty: float | None = None
 
 
 class Word:
+    # без __dict__: у пользователя могут быть десятки тысяч слов в памяти
+    __slots__ = (
+        "id",
+        "user_id",
+        "text",
+        "translation",
+        "next_repeat",
+        "repeat_count",
+        "created_at",
+        "base_difficulty",
+        "personal_difficulty",
+        "difficulty",
+        "stability",
+        "ml_score",
+        "history",
+    )
+
     def __init__(
         self,
         word_id: int,
@@ -33,6 +66,30 @@ class Word:
         self.ml_score = ml_score
         self.history = history
 
+    @classmethod
+    def from_row(cls, row) -> "Word":
+        """Собирает слово из строки таблицы words."""
+        return cls(
+            row.word_id,
+            row.user_id,
+            row.text,
+            row.translation,
+            row.next_repeat,
+            row.repeat_count,
+            row.created_at,
+            row.base_difficulty,
+            row.personal_difficulty,
+            row.difficulty,
+            row.stability,
+            row.ml_score,
+            row.history,
+        )
+
+    @property
+    def word_id(self) -> int:
+        # то же имя, что у колонки, как в строках с проекцией колонок
+        return self.id
+
     def check_translation(self, answer: str, threshold: float = 0.8) -> bool:
         """
         Заглушка: сейчас проверка перевода не используется,
@@ -43,22 +100,26 @@ class Word:
 
     def update_repeat(self):
         self.repeat_count += 1
-        self.next_repeat = datetime.now(datetime.timezone.utc) + timedelta(days=1)
+        self.next_repeat = datetime.now(timezone.utc) + timedelta(days=1)
 
     def schedule_next_repeat(self, days: int):
-        self.next_repeat = datetime.now(datetime.timezone.utc) + timedelta(days=days)
+        self.next_repeat = datetime.now(timezone.utc) + timedelta(days=days)
 
     def is_due(self) -> bool:
-        return datetime.now(datetime.timezone.utc) >= self.next_repeat
+        return datetime.now(timezone.utc) >= self.next_repeat
 
-    def record_history(self, rating: int, is_correct: bool) -> None:
-        self.history.append(
-            {
-                "timestamp": datetime.utcnow().isoformat(),
-                "rating": rating,
-                "is_correct": is_correct,
-            }
-        )
+    def record_history(self, rating: int, is_correct: bool) -> dict:
+        """
+        Запоминает ответ в памяти (только последние HISTORY_LIMIT записей)
+        и возвращает запись. Полная история хранится в таблице review_log.
+        """
+        entry = {
+            "timestamp": datetime.now(timezone.utc),
+            "rating": rating,
+            "is_correct": is_correct,
+        }
+        self.history = ((self.history or []) + [entry])[-HISTORY_LIMIT:]
+        return entry
 
     def get_info(self):
         return {
@@ -0,0 +1,44 @@
+from datetime import date, timezone
+
+ROLLUP_COUNTERS = ("adds", "reviews", "correct", "wrong")
+
+
+def activity_counters(action: str, payload: dict | None = None) -> dict[str, int]:
+    """
+    Переводит событие активности в приращения дневных счётчиков.
+    События, которые в статистику не попадают (напоминания, мотивация),
+    дают пустой словарь.
+    """
+    if action.startswith("add_word:"):
+        return {"adds": 1}
+    if action == "import_words":
+        return {"adds": int((payload or {}).get("count", 0))}
+    if action.startswith("answered:"):
+        if action.endswith(":correct"):
+            return {"reviews": 1, "correct": 1}
+        return {"reviews": 1, "wrong": 1}
+    return {}
+
+
+def aggregate_daily(records: list[dict]) -> list[dict]:
+    """
+    Сворачивает пачку событий в строки activity_daily: по одной на пару
+    (user_id, день в UTC), со всеми счётчиками.
+    """
+    buckets: dict[tuple[int, date], dict] = {}
+    for record in records:
+        counters = activity_counters(record["action"], record.get("payload"))
+        if not counters:
+            continue
+
+        day = record["ts"].astimezone(timezone.utc).date()
+        bucket = buckets.get((record["user_id"], day))
+        if bucket is None:
+            bucket = {"user_id": record["user_id"], "day": day}
+            bucket.update({name: 0 for name in ROLLUP_COUNTERS})
+            buckets[(record["user_id"], day)] = bucket
+
+        for name, value in counters.items():
+            bucket[name] += value
+
+    return list(buckets.values())
@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+
+# таблица -> первичный ключ (для удаления порциями и отсева дублей)
+ARCHIVE_KEYS = {"activity_events": "event_id", "review_log": "review_id"}
+
+ARCHIVE_FILE = "part.jsonl.gz"
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Неподдерживаемый тип в архиве: {type(value).__name__}")
+
+
+def _partition_dir(base_dir: str, table: str, day: date) -> str:
+    return os.path.join(base_dir, table, f"date={day.isoformat()}")
+
+
+def write_archive(base_dir: str, table: str, records: list[dict]) -> int:
+    """
+    Дописывает записи в архив: gzip JSONL, по файлу на день (UTC) по полю ts.
+    Каждый вызов добавляет в файл новый gzip-блок, поэтому запись идёт
+    порциями без перечитывания. Данные сбрасываются на диск до возврата,
+    чтобы строки можно было удалять из базы.
+    """
+    by_day: dict[date, list[dict]] = {}
+    for record in records:
+        day = record["ts"].astimezone(timezone.utc).date()
+        by_day.setdefault(day, []).append(record)
+
+    for day, day_records in sorted(by_day.items()):
+        directory = _partition_dir(base_dir, table, day)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, ARCHIVE_FILE), "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                for record in day_records:
+                    line = json.dumps(record, default=_encode, ensure_ascii=False)
+                    archive.write(line.encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    return len(records)
+
+
+def iter_archive(
+    base_dir: str,
+    table: str,
+    since: date | None = None,
+    until: date | None = None,
+    user_id: int | None = None,
+):
+    """
+    Читает архив обратно по дням в диапазоне [since, until] (для обучения ML
+    или выгрузки данных пользователя). Если запись попала в архив дважды
+    (сбой между записью файла и COMMIT), она отдаётся один раз.
+    """
+    table_dir = os.path.join(base_dir, table)
+    if not os.path.isdir(table_dir):
+        return
+
+    key = ARCHIVE_KEYS[table]
+    for name in sorted(os.listdir(table_dir)):
+        if not name.startswith("date="):
+            continue
+        day = date.fromisoformat(name[len("date="):])
+        if (since and day < since) or (until and day > until):
+            continue
+
+        seen = set()
+        path = os.path.join(table_dir, name, ARCHIVE_FILE)
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                record = json.loads(line)
+                if record[key] in seen:
+                    continue
+                seen.add(record[key])
+                if user_id is not None and record["user_id"] != user_id:
+                    continue
+                record["ts"] = datetime.fromisoformat(record["ts"])
+                yield record
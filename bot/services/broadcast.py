@@ -0,0 +1,145 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+BROADCAST_BATCH = 500
+
+
+@dataclass
+class BroadcastProgress:
+    name: str
+    total: int
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+    eta_seconds: float | None = None
+    finished: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.skipped
+
+
+class Broadcast:
+    """
+    Рассылка по списку получателей с контрольными точками.
+
+    Получатели читаются порциями по user_id (keyset: WHERE user_id > last),
+    после каждой порции в таблицу broadcasts записывается последний
+    обработанный user_id и счётчики. После падения или перезапуска рассылка
+    продолжается с контрольной точки, а не с начала.
+
+    Перед отправкой порции её конец записывается как inflight_user_id. Если
+    процесс упал посреди порции, при продолжении она пропускается и
+    учитывается в skipped: лучше не дослать часть мотивации, чем отправить
+    её дважды.
+    """
+
+    def __init__(
+        self,
+        db,
+        name: str,
+        fetch_batch,
+        count,
+        send,
+        fan_out,
+        owner: str,
+        lease_seconds: int,
+        batch_size: int = BROADCAST_BATCH,
+        clock=time.monotonic,
+    ):
+        self.db = db
+        self.name = name
+        self.fetch_batch = fetch_batch  # (after_user_id, limit) -> list[user_id]
+        self.count = count  # () -> сколько всего получателей
+        self.send = send  # (user_id) -> отправка одному получателю
+        self.fan_out = fan_out  # (items, worker, name) -> FanOutResult
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.clock = clock
+
+    async def _checkpoint(self, **fields) -> bool:
+        return await self.db.checkpoint_broadcast(
+            self.name, self.owner, self.lease_seconds, **fields
+        )
+
+    async def run(self) -> BroadcastProgress | None:
+        """
+        Выполняет или продолжает рассылку. None — рассылка уже завершена
+        или её ведёт другой узел.
+        """
+        state = await self.db.claim_broadcast(
+            self.name, self.owner, self.lease_seconds, await self.count()
+        )
+        if state is None:
+            return None
+
+        progress = BroadcastProgress(
+            name=self.name,
+            total=state.total,
+            sent=state.sent,
+            failed=state.failed,
+            skipped=state.skipped,
+        )
+        last_user_id = state.last_user_id
+
+        if state.inflight_user_id is not None:
+            # порция прервана посередине: неизвестно, кому уже отправлено
+            lost = await self.fetch_batch(last_user_id, self.batch_size)
+            lost = [user_id for user_id in lost if user_id <= state.inflight_user_id]
+            progress.skipped += len(lost)
+            last_user_id = state.inflight_user_id
+            print(f"Рассылка {self.name}: пропущено {len(lost)} после сбоя")
+            if not await self._checkpoint(
+                last_user_id=last_user_id,
+                inflight_user_id=None,
+                skipped=progress.skipped,
+            ):
+                return progress
+
+        started = self.clock()
+        processed_at_start = progress.processed
+        while True:
+            batch = await self.fetch_batch(last_user_id, self.batch_size)
+            if not batch:
+                break
+
+            if not await self._checkpoint(inflight_user_id=batch[-1]):
+                print(f"Рассылка {self.name}: аренду перехватил другой узел")
+                return progress
+
+            result = await self.fan_out(batch, self.send, self.name)
+            progress.sent += result.done
+            progress.failed += result.failed
+            last_user_id = batch[-1]
+
+            # получатели могли добавиться после подсчёта
+            progress.total = max(progress.total, progress.processed)
+            elapsed = self.clock() - started
+            done_now = progress.processed - processed_at_start
+            if elapsed > 0 and done_now:
+                remaining = progress.total - progress.processed
+                progress.eta_seconds = remaining * elapsed / done_now
+
+            if not await self._checkpoint(
+                last_user_id=last_user_id,
+                inflight_user_id=None,
+                total=progress.total,
+                sent=progress.sent,
+                failed=progress.failed,
+            ):
+                print(f"Рассылка {self.name}: аренду перехватил другой узел")
+                return progress
+            print(
+                f"Рассылка {self.name}: {progress.processed}/{progress.total}, "
+                f"осталось ~{progress.eta_seconds or 0:.0f} с"
+            )
+
+            if len(batch) < self.batch_size:
+                break
+
+        progress.finished = True
+        progress.eta_seconds = 0.0
+        await self._checkpoint(finished_at=datetime.now(timezone.utc))
+        return progress
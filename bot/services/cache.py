@@ -0,0 +1,82 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class AsyncTTLCache:
+    """
+    Асинхронный read-through кэш с ограничением размера (LRU) и временем
+    жизни записей. Для холодного ключа загрузчик вызывается один раз,
+    остальные корутины ждут тот же результат.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._loading: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[Hashable], Awaitable[Any]]
+    ):
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+
+        self.misses += 1
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader(key)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть
+            raise
+        else:
+            # если ключ инвалидировали во время загрузки, результат мог
+            # устареть: отдаём его ожидающим, но в кэш не кладём
+            if self._loading.get(key) is future:
+                self._set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+        self._loading.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._loading.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _set(self, key: Hashable, value):
+        self._data[key] = (self.clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
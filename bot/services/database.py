@@ -4,31 +4,90 @@ from sqlalchemy import (
     MetaData,
     Column,
     Integer,
+    SmallInteger,
+    BigInteger,
     String,
     DateTime,
+    Date,
     Float,
+    Boolean,
     JSON,
+    Index,
+    PrimaryKeyConstraint,
     insert,
     update,
+    delete,
     select,
+    func,
+    literal,
+    true,
+    column,
+    text,
+    values,
+    cast,
+    case,
+    extract,
+    inspect,
 )
 from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from datetime import datetime, timezone, timedelta
+import asyncio
+import itertools
+import time
 
-from bot.infrastructure.config import DB_USER, DB_PASSWORD, DB_NAME, DB_HOST, DB_PORT
+from bot.infrastructure.config import Settings, get_settings
 from bot.models.user import User
 from bot.models.stats import Stats
-from bot.models.word import Word
+from bot.models.word import Word, WordUpdate
+from bot.services.activity import ROLLUP_COUNTERS, aggregate_daily
+from bot.services.archive import ARCHIVE_KEYS, write_archive
+from bot.services.delivery_window import (
+    DEFAULT_NOTIFICATION_TIME,
+    DEFAULT_TIMEZONE,
+    JITTER_MODULUS,
+    JITTER_MULTIPLIER,
+    MINUTES_PER_DAY,
+    MOTIVATION_SPREAD_MINUTES,
+    NOTIFICATION_TIME_PATTERN,
+    minute_of_day,
+    motivation_minute,
+    notify_minute,
+)
+from bot.services.cache import AsyncTTLCache
+from bot.services.pool import TimedAsyncQueuePool
+from bot.services.write_buffer import WriteBuffer
 
 
-DATABASE_URL = (
-    f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+def _database_url(settings: Settings, host: str, port) -> str:
+    return (
+        f"postgresql+asyncpg://{settings.db_user}:{settings.db_password}"
+        f"@{host}:{port}/{settings.db_name}"
+        f"?prepared_statement_cache_size={settings.db_statement_cache_size}"
+    )
+
+
+def _create_engine(settings: Settings, url: str):
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=TimedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={"statement_cache_size": settings.db_statement_cache_size},
+    )
+
+
+def _replica_url(settings: Settings, address: str) -> str:
+    host, _, port = address.partition(":")
+    return _database_url(settings, host, port or settings.db_port)
+
+
+def _sessionmaker(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
 
 metadata = MetaData()
 
@@ -46,6 +105,44 @@ users = Table(
         default=lambda: datetime.now(timezone.utc),
     ),
     Column("ml_profile", JSONB, default=dict),
+    # min(words.next_repeat) по словам пользователя, поддерживается при
+    # каждой записи слов; NULL — слов нет
+    Column("next_due_at", DateTime(timezone=True)),
+    # минута суток по UTC, когда открывается окно уведомлений пользователя
+    # (settings.notification_time в settings.timezone)
+    Column("notify_minute", SmallInteger),
+    # минута суток по UTC для мотивации: notify_minute плюс детерминированный
+    # сдвиг пользователя (bot.services.delivery_window.motivation_minute)
+    Column("motivation_minute", SmallInteger),
+    # аренда пользователя узлом планировщика в режиме lease: пока
+    # lease_until в будущем, другие узлы его не берут
+    Column("lease_owner", String),
+    Column("lease_until", DateTime(timezone=True)),
+    # раньше этого момента пользователю не шлём следующее напоминание:
+    # темп reminders_per_day хранится в базе, а не только в памяти узла
+    Column("remind_after", DateTime(timezone=True)),
+    # когда пользователю можно отправить следующее напоминание: самое
+    # позднее из next_due_at, remind_after и его ближайшего слота в окне
+    # уведомлений (_next_send); NULL — слов нет
+    Column("next_send_at", DateTime(timezone=True)),
+    # слово из последнего напоминания, на которое ждём ответ, и ответ
+    # пользователя до подтверждения. Хранятся в базе, а не в памяти узла:
+    # напоминание может отправить один узел, а ответ получить другой
+    Column("pending_word_id", Integer),
+    Column("pending_answer", String),
+)
+
+# Планировщик берёт пользователей, которым пора отправлять, диапазоном по
+# next_send_at; пользователи без слов в индекс не попадают
+Index(
+    "ix_users_next_send_at",
+    users.c.next_send_at,
+    postgresql_where=users.c.next_send_at.isnot(None),
+)
+
+# Пользователи одной минутной корзины мотивации, порциями по user_id
+Index(
+    "ix_users_motivation_minute_user_id", users.c.motivation_minute, users.c.user_id
 )
 
 words = Table(
@@ -70,6 +167,10 @@ words = Table(
     Column("history", JSONB, default=list),
 )
 
+# Самое раннее слово пользователя: пересчёт users.next_due_at и выбор слова
+# для напоминания
+Index("ix_words_user_id_next_repeat", words.c.user_id, words.c.next_repeat)
+
 stats = Table(
     "stats",
     metadata,
@@ -81,186 +182,1540 @@ stats = Table(
     Column("ml_stats", JSONB, default=dict),
 )
 
+# Журнал активности: только INSERT, секционирование по месяцам
+activity_events = Table(
+    "activity_events",
+    metadata,
+    Column("event_id", BigInteger, autoincrement=True),
+    Column("user_id", Integer, nullable=False),
+    Column("ts", DateTime(timezone=True), nullable=False),
+    Column("action", String, nullable=False),
+    Column("payload", JSONB),
+    PrimaryKeyConstraint("event_id", "ts"),
+    postgresql_partition_by="RANGE (ts)",
+)
+
+Index("ix_activity_events_ts", activity_events.c.ts, postgresql_using="brin")
+Index("ix_activity_events_user_id_ts", activity_events.c.user_id, activity_events.c.ts)
+
+# Дневные счётчики активности для /stats, обновляются вместе с записью событий
+activity_daily = Table(
+    "activity_daily",
+    metadata,
+    Column("user_id", Integer, nullable=False),
+    Column("day", Date, nullable=False),
+    Column("adds", Integer, nullable=False, default=0),
+    Column("reviews", Integer, nullable=False, default=0),
+    Column("correct", Integer, nullable=False, default=0),
+    Column("wrong", Integer, nullable=False, default=0),
+    PrimaryKeyConstraint("user_id", "day"),
+)
+
+# История ответов по словам: только INSERT, данные для обучения ML
+review_log = Table(
+    "review_log",
+    metadata,
+    Column("review_id", BigInteger, primary_key=True, autoincrement=True),
+    Column("word_id", Integer, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("ts", DateTime(timezone=True), nullable=False),
+    Column("rating", Integer, nullable=False),
+    Column("is_correct", Boolean, nullable=False),
+    Column("interval_days", Float),
+    Column("ml_score", Float),
+)
+
+Index("ix_review_log_word_id_ts", review_log.c.word_id, review_log.c.ts)
+Index("ix_review_log_ts", review_log.c.ts, postgresql_using="brin")
+
+# Разовые задачи планировщика (корзина мотивации, архивация) при нескольких
+# узлах: выполняет тот, кто взял аренду; done — задача завершена
+job_leases = Table(
+    "job_leases",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("owner", String, nullable=False),
+    Column("lease_until", DateTime(timezone=True), nullable=False),
+    Column("done", Boolean, nullable=False, default=False),
+    Column("claimed_at", DateTime(timezone=True), nullable=False),
+)
+
+# Рассылки с контрольными точками: last_user_id — все до него обработаны,
+# inflight_user_id — конец порции, которая сейчас отправляется
+broadcasts = Table(
+    "broadcasts",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("owner", String, nullable=False),
+    Column("lease_until", DateTime(timezone=True), nullable=False),
+    Column("last_user_id", Integer),
+    Column("inflight_user_id", Integer),
+    Column("total", Integer, nullable=False, default=0),
+    Column("sent", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("skipped", Integer, nullable=False, default=0),
+    Column("started_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+    Column("finished_at", DateTime(timezone=True)),
+)
+
+# Исходящие сообщения (transactional outbox): строка пишется в той же
+# транзакции, что и решение о напоминании, а отправляет её диспетчер.
+# status: pending → sent или dead (исчерпаны попытки)
+outbox = Table(
+    "outbox",
+    metadata,
+    Column("message_id", BigInteger, primary_key=True, autoincrement=True),
+    Column("idempotency_key", String, nullable=False, unique=True),
+    Column("kind", String, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("word_id", Integer),
+    Column("payload", JSONB, default=dict),
+    Column("status", String, nullable=False, default="pending"),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("next_attempt_at", DateTime(timezone=True), nullable=False),
+    Column("last_error", String),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("sent_at", DateTime(timezone=True)),
+)
+
+Index(
+    "ix_outbox_pending_next_attempt_at",
+    outbox.c.next_attempt_at,
+    postgresql_where=outbox.c.status == "pending",
+)
+
+ACTIVITY_PARTITIONS_AHEAD = 2  # сколько месяцев вперёд создаём секции
+ACTIVITY_MIGRATION_BATCH = 500
+STREAM_BATCH_SIZE = 1000
+BULK_UPDATE_CHUNK = 1000
+ARCHIVE_BATCH = 5000
+WINDOW_SETTINGS = {"notification_time", "timezone"}
+# настройки, от которых зависит users.next_send_at
+SEND_SETTINGS = WINDOW_SETTINGS | {"reminders_per_day"}
+REMINDERS_PER_DAY = users.c.settings["reminders_per_day"].as_integer()
+# delivery_window.jitter(user_id), умноженный на JITTER_MODULUS
+USER_JITTER_HASH = cast(users.c.user_id, BigInteger) * JITTER_MULTIPLIER % JITTER_MODULUS
+
+WORD_COPY_COLUMNS = [
+    "user_id",
+    "text",
+    "translation",
+    "next_repeat",
+    "repeat_count",
+    "created_at",
+    "base_difficulty",
+    "personal_difficulty",
+    "difficulty",
+    "stability",
+    "ml_score",
+    "history",
+]
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+ACTIVITY_DEFAULT_PARTITION_DDL = (
+    "CREATE TABLE IF NOT EXISTS activity_events_default "
+    "PARTITION OF activity_events DEFAULT"
+)
+
+
+def _activity_partition_name(month: datetime) -> str:
+    return f"activity_events_y{month:%Y}m{month:%m}"
+
+
+def _activity_partition_ddl(month: datetime) -> list[str]:
+    """
+    Создаёт месячную секцию activity_events. События этого месяца, уже
+    попавшие в default-секцию, переносятся в новую таблицу до ATTACH: иначе
+    Postgres откажется создавать секцию, и месяц так и остался бы в default.
+    Выполнять одной транзакцией.
+    """
+    name = _activity_partition_name(month)
+    lower, upper = month.isoformat(), _next_month(month).isoformat()
+    return [
+        f"CREATE TABLE {name} "
+        f"(LIKE activity_events INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"WITH moved AS (DELETE FROM activity_events_default "
+        f"WHERE ts >= '{lower}' AND ts < '{upper}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE activity_events ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')",
+    ]
+
+
+# индексы прежних версий, которые больше не нужны ни одному запросу
+DROPPED_INDEXES = [
+    "ix_users_next_due_at",
+    "ix_words_next_repeat_user_id",
+    "ix_users_notify_minute_user_id",
+]
+
+
+def _upgrade_schema(sync_conn, window_minutes: int):
+    # create_all не трогает уже существующие таблицы, поэтому новые колонки
+    # и индексы досоздаём отдельно
+    user_columns = {col["name"] for col in inspect(sync_conn).get_columns("users")}
+    if "next_due_at" not in user_columns:
+        sync_conn.execute(
+            text("ALTER TABLE users ADD COLUMN next_due_at TIMESTAMP WITH TIME ZONE")
+        )
+    if "notify_minute" not in user_columns:
+        sync_conn.execute(text("ALTER TABLE users ADD COLUMN notify_minute SMALLINT"))
+        sync_conn.execute(text(NOTIFY_MINUTE_BACKFILL))
+    if "motivation_minute" not in user_columns:
+        sync_conn.execute(text("ALTER TABLE users ADD COLUMN motivation_minute SMALLINT"))
+        sync_conn.execute(
+            update(users).values(
+                motivation_minute=(
+                    users.c.notify_minute
+                    + USER_JITTER_HASH * MOTIVATION_SPREAD_MINUTES // JITTER_MODULUS
+                )
+                % MINUTES_PER_DAY
+            )
+        )
+    if "lease_owner" not in user_columns:
+        sync_conn.execute(
+            text(
+                "ALTER TABLE users ADD COLUMN lease_owner VARCHAR, "
+                "ADD COLUMN lease_until TIMESTAMP WITH TIME ZONE"
+            )
+        )
+    if "remind_after" not in user_columns:
+        sync_conn.execute(
+            text("ALTER TABLE users ADD COLUMN remind_after TIMESTAMP WITH TIME ZONE")
+        )
+    if "pending_word_id" not in user_columns:
+        sync_conn.execute(
+            text(
+                "ALTER TABLE users ADD COLUMN pending_word_id INTEGER, "
+                "ADD COLUMN pending_answer VARCHAR"
+            )
+        )
+    if "next_send_at" not in user_columns:
+        sync_conn.execute(
+            text("ALTER TABLE users ADD COLUMN next_send_at TIMESTAMP WITH TIME ZONE")
+        )
+        # после остальных колонок: next_send_at зависит от окна и remind_after
+        sync_conn.execute(_refresh_next_due(window_minutes))
+
+    for name in DROPPED_INDEXES:
+        sync_conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+# то же, что bot.services.delivery_window.notify_minute, но на стороне
+# Postgres для уже зарегистрированных пользователей: время проверяется тем
+# же шаблоном, дата — сегодняшняя по UTC, а не по зоне сессии. Некорректные
+# время и зона заменяются значениями по умолчанию
+NOTIFY_MINUTE_SQL = f"""
+    SELECT extract(hour FROM opens) * 60 + extract(minute FROM opens)
+    FROM (
+        SELECT (
+            ((now() AT TIME ZONE 'UTC')::date + CASE
+                WHEN settings->>'notification_time' ~ '^{NOTIFICATION_TIME_PATTERN}$'
+                THEN make_time(
+                    split_part(settings->>'notification_time', ':', 1)::int,
+                    split_part(settings->>'notification_time', ':', 2)::int,
+                    0
+                )
+                ELSE '{DEFAULT_NOTIFICATION_TIME}'::time
+            END)
+            AT TIME ZONE CASE
+                WHEN settings->>'timezone' IN (SELECT name FROM pg_timezone_names)
+                THEN settings->>'timezone'
+                ELSE '{DEFAULT_TIMEZONE}'
+            END
+        ) AT TIME ZONE 'UTC' AS opens
+    ) AS window_start
+"""
+NOTIFY_MINUTE_BACKFILL = f"UPDATE users SET notify_minute = ({NOTIFY_MINUTE_SQL})"
+
+
+def _due_users_criteria(now: datetime, window_minutes: int) -> list:
+    # пользователи берутся диапазоном по индексу next_send_at. Проверка окна
+    # отсеивает только тех, чьё время отправки прошло, пока окно было
+    # открыто, а узлы не работали: их next_send_at переносит планировщик
+    # (refresh_next_send)
+    since_open = (
+        minute_of_day(now) - users.c.notify_minute + MINUTES_PER_DAY
+    ) % MINUTES_PER_DAY
+    # и не раньше первого слота пользователя: since_open >= jitter * slot,
+    # в целых числах без деления. since_open — SMALLINT, поэтому
+    # приводим к BIGINT: иначе 2**32 связывается как SMALLINT
+    reminders_per_day = func.greatest(func.coalesce(REMINDERS_PER_DAY, 1), 1)
+    first_slot_passed = (
+        cast(since_open, BigInteger) * reminders_per_day * JITTER_MODULUS
+        >= window_minutes * USER_JITTER_HASH
+    )
+    return [
+        users.c.next_send_at <= now,
+        users.c.notify_minute.is_(None)
+        | ((since_open < window_minutes) & first_slot_passed),
+    ]
+
+
+def _earliest_send(moment, opens_at, window_minutes: int):
+    """
+    То же, что bot.services.delivery_window.earliest_send, но на стороне
+    Postgres и в секундах эпохи: ближайший момент не раньше moment внутри
+    окна, открывающегося в минуту opens_at, и не раньше первого слота
+    пользователя.
+    """
+    seconds = cast(extract("epoch", moment), Float)
+    opens = cast(opens_at, Integer) * 60
+    # последнее открытие окна не позже moment
+    start = func.floor((seconds - opens) / 86400, type_=Float) * 86400 + opens
+    reminders_per_day = func.greatest(func.coalesce(REMINDERS_PER_DAY, 1), 1)
+    first = start + cast(USER_JITTER_HASH * (window_minutes * 60), Float) / (
+        cast(reminders_per_day, BigInteger) * JITTER_MODULUS
+    )
+    send_at = case(
+        (seconds < first, first),
+        (seconds < start + window_minutes * 60, seconds),
+        else_=first + 86400,
+    )
+    return case(
+        (opens_at.is_(None), moment),
+        else_=func.to_timestamp(send_at, type_=DateTime(timezone=True)),
+    )
+
+
+def _next_send(next_due, opens_at, window_minutes: int, now: datetime | None = None):
+    # users.next_send_at для срока next_due; с now — ещё и не раньше now
+    moments = [next_due, users.c.remind_after]
+    if now is not None:
+        moments.append(literal(now, DateTime(timezone=True)))
+    return case(
+        (
+            next_due.isnot(None),
+            _earliest_send(func.greatest(*moments), opens_at, window_minutes),
+        )
+    )
+
+
+def _set_next_due(next_due, *criteria, window_minutes: int):
+    # новый срок считается один раз в подзапросе и идёт сразу в обе
+    # колонки: next_due_at и зависящую от него next_send_at
+    fresh = (
+        select(users.c.user_id, next_due.label("next_due_at"))
+        .where(*criteria)
+        .subquery("fresh")
+    )
+    return (
+        update(users)
+        .where(users.c.user_id == fresh.c.user_id)
+        .values(
+            next_due_at=fresh.c.next_due_at,
+            next_send_at=_next_send(
+                fresh.c.next_due_at, users.c.notify_minute, window_minutes
+            ),
+        )
+    )
+
+
+def _refresh_next_send(window_minutes: int, user_ids, now: datetime | None = None):
+    # пересчёт next_send_at без изменения сроков слов
+    return (
+        update(users)
+        .where(users.c.user_id.in_(user_ids))
+        .values(
+            next_send_at=_next_send(
+                users.c.next_due_at, users.c.notify_minute, window_minutes, now
+            )
+        )
+    )
+
+
+def _first_due_words(due_users, now: datetime):
+    # самое раннее просроченное слово каждого пользователя из due_users
+    first_word = (
+        select(words)
+        .where(words.c.user_id == due_users.c.user_id, words.c.next_repeat <= now)
+        .order_by(words.c.next_repeat)
+        .limit(1)
+        .lateral("first_word")
+    )
+    return select(
+        first_word, due_users.c.reminders_per_day, due_users.c.notify_minute
+    ).select_from(
+        due_users.join(first_word, true())
+    )
+
+
+def _refresh_next_due(window_minutes: int, user_ids=None):
+    """
+    Пересчитывает users.next_due_at как min(next_repeat) по словам
+    пользователя (по индексу words(user_id, next_repeat)) и вместе с ним
+    next_send_at. Нужен, когда срок слова сдвигается на более поздний.
+    """
+    earliest = (
+        select(func.min(words.c.next_repeat))
+        .where(words.c.user_id == users.c.user_id)
+        .scalar_subquery()
+    )
+    criteria = [] if user_ids is None else [users.c.user_id.in_(user_ids)]
+    return _set_next_due(earliest, *criteria, window_minutes=window_minutes)
+
+
+def _lower_next_due(user_id: int, next_repeat: datetime, window_minutes: int):
+    # новое слово может только приблизить срок; LEAST в Postgres игнорирует NULL
+    return _set_next_due(
+        func.least(users.c.next_due_at, next_repeat),
+        users.c.user_id == user_id,
+        window_minutes=window_minutes,
+    )
+
+
+def _bulk_update_words(chunk: list[WordUpdate]):
+    # UPDATE words ... FROM (VALUES ...): поля со значением None не меняются
+    rows = values(
+        *(column(name, words.c[name].type) for name in WordUpdate._fields),
+        name="changes",
+    ).data([tuple(item) for item in chunk])
+    return (
+        update(words)
+        .where(
+            words.c.word_id == rows.c.word_id,
+            words.c.user_id == rows.c.user_id,
+        )
+        .values(
+            {
+                # cast нужен, если в порции колонка целиком из NULL
+                name: func.coalesce(
+                    cast(rows.c[name], words.c[name].type), words.c[name]
+                )
+                for name in WordUpdate._fields[2:]
+            }
+        )
+    )
+
 
 class Database:
+    def __init__(self, settings: Settings | None = None):
+        self.settings = settings or get_settings()
+
+        # события активности пишутся пачками в фоне, чтобы обработчики
+        # не ждали отдельную транзакцию перед ответом пользователю
+        self.activity_buffer = WriteBuffer(
+            self._write_activity_events,
+            batch_size=self.settings.activity_batch_size,
+            flush_interval=self.settings.activity_flush_interval_ms / 1000,
+            max_size=self.settings.activity_queue_size,
+        )
+        # пользователи с настройками читаются на каждую команду, а меняются
+        # редко; в другом процессе запись увидят не позже чем через TTL
+        self.user_cache = AsyncTTLCache(
+            maxsize=self.settings.user_cache_size, ttl=self.settings.user_cache_ttl
+        )
+
+        # движки создаются в connect(): импорт модуля и конструктор не
+        # открывают соединений и не требуют настроек базы
+        self.engine = None
+        self.replica_engines = []
+        self._primary_sessions = None
+        self._replica_sessions = []
+        self._replica_counter = itertools.count()
+        # user_id -> момент, до которого его данные читаются с primary
+        self._recent_writes: dict[int, float] = {}
+        # подписчики на изменение users.next_send_at (планировщик)
+        self._due_listeners = []
+        # длина окна уведомлений: от неё зависит users.next_send_at
+        self.window_minutes = self.settings.delivery_window_hours * 60
+
+    def _create_engines(self):
+        settings = self.settings
+        settings.require("db_user", "db_password", "db_name", "db_host")
+
+        self.engine = _create_engine(
+            settings, _database_url(settings, settings.db_host, settings.db_port)
+        )
+        self._primary_sessions = _sessionmaker(self.engine)
+
+        # реплики только для чтения; без DB_REPLICA_HOSTS всё читается с primary
+        self.replica_engines = [
+            _create_engine(settings, _replica_url(settings, host))
+            for host in settings.db_replica_hosts
+        ]
+        self._replica_sessions = [
+            _sessionmaker(replica) for replica in self.replica_engines
+        ]
+
     async def connect(self):
-        async with engine.begin() as conn:
+        if self.engine is None:
+            self._create_engines()
+
+        async with self.engine.begin() as conn:
             await conn.run_sync(metadata.create_all)
+            await conn.run_sync(_upgrade_schema, self.window_minutes)
+
+        await self.ensure_activity_partitions()
+        if await self.migrate_activity_log():
+            await self.rebuild_activity_rollups()
+        self.activity_buffer.start()
+
+    async def ensure_activity_partitions(
+        self, months_ahead: int = ACTIVITY_PARTITIONS_AHEAD
+    ):
+        """
+        Досоздаёт секции activity_events на текущий и months_ahead следующих
+        месяцев. Вызывается при подключении и каждую ночь из планировщика.
+        """
+        async with self.engine.begin() as conn:
+            await conn.execute(text(ACTIVITY_DEFAULT_PARTITION_DDL))
+
+        month = _month_start(datetime.now(timezone.utc))
+        for _ in range(months_ahead + 1):
+            name = _activity_partition_name(month)
+            # каждая секция в своей транзакции: ошибка одной не мешает остальным
+            try:
+                async with self.engine.begin() as conn:
+                    exists = await conn.scalar(
+                        text("SELECT to_regclass(:name)"), {"name": name}
+                    )
+                    if exists is None:
+                        for ddl in _activity_partition_ddl(month):
+                            await conn.execute(text(ddl))
+            except Exception as e:
+                print(f"Не удалось создать секцию {name}: {e}")
+            month = _next_month(month)
 
     async def close(self):
-        await engine.dispose()
+        await self.activity_buffer.close()
+        if self.engine is not None:
+            await self.engine.dispose()
+        for replica in self.replica_engines:
+            await replica.dispose()
 
-    # USERS
+    def _session(self):
+        if self._primary_sessions is None:
+            raise RuntimeError("База данных не подключена: вызовите connect()")
+        return self._primary_sessions()
 
-    async def add_user(self, user_id: int, username: str):
-        async with AsyncSessionLocal() as session:
-            await session.execute(
-                pg_insert(users)
-                .values(
-                    user_id=user_id,
-                    username=username,
-                    settings={},
-                    progress={},
-                    words_added={},
-                    last_active=datetime.now(timezone.utc),
-                    ml_profile={},
-                )
-                .on_conflict_do_nothing()
-            )
+    def _read_session(self, user_id: int | None = None):
+        """
+        Сессия для запросов только на чтение. Идёт на реплику, если они
+        настроены и пользователь недавно ничего не записывал (read your
+        own writes), иначе на primary.
+        """
+        if not self._replica_sessions:
+            return self._session()
+        if user_id is not None and self._wrote_recently(user_id):
+            return self._session()
+        index = next(self._replica_counter) % len(self._replica_sessions)
+        return self._replica_sessions[index]()
 
-            await session.execute(
-                pg_insert(stats).values(user_id=user_id).on_conflict_do_nothing()
+    def _mark_write(self, user_id: int):
+        if not self._replica_sessions:
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) > self.settings.user_cache_size:
+            self._recent_writes = {
+                key: until for key, until in self._recent_writes.items() if until > now
+            }
+        self._recent_writes[user_id] = now + self.settings.read_your_writes_seconds
+
+    def _wrote_recently(self, user_id: int) -> bool:
+        until = self._recent_writes.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    async def _iter_keyset(
+        self,
+        table,
+        key,
+        *criteria,
+        batch_size: int,
+        columns: list[str] | None,
+        sessions=None,
+    ):
+        sessions = sessions or self._session
+        selected = [table.c[name] for name in columns] if columns else [table]
+        if columns and key.name not in columns:
+            selected.append(key)
+
+        last_key = None
+        while True:
+            query = select(*selected).where(*criteria).order_by(key).limit(batch_size)
+            if last_key is not None:
+                query = query.where(key > last_key)
+
+            # каждая порция в своей короткой сессии, чтобы фоновые задачи
+            # не держали соединение и транзакцию на весь обход
+            async with sessions() as session:
+                rows = (await session.execute(query)).fetchall()
+
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                break
+            last_key = getattr(rows[-1], key.name)
+
+    def add_due_listener(self, callback):
+        """
+        Подписывает callback(user_id, next_send_at) на изменения момента
+        следующего напоминания пользователя. Вызывается после COMMIT.
+        """
+        self._due_listeners.append(callback)
+
+    async def _execute_due(self, session, stmt) -> list:
+        result = await session.execute(
+            stmt.returning(users.c.user_id, users.c.next_send_at)
+        )
+        return result.fetchall()
+
+    def _notify_due(self, rows):
+        for row in rows:
+            for callback in self._due_listeners:
+                callback(row.user_id, row.next_send_at)
+
+    def cache_stats(self) -> dict:
+        return self.user_cache.stats()
+
+    def pool_stats(self) -> dict:
+        """Текущее состояние пула: занятые соединения, overflow и ожидание."""
+        if self.engine is None:
+            return {}
+        return {
+            **self.engine.sync_engine.pool.stats(),
+            "replicas": [
+                replica.sync_engine.pool.stats() for replica in self.replica_engines
+            ],
+        }
+
+    # USERS
+
+    async def add_user(
+        self, user_id: int, username: str, settings: dict | None = None
+    ) -> bool:
+        """
+        Регистрирует пользователя и создаёт ему строку в stats одним запросом
+        (два INSERT в CTE). Возвращает True, если пользователь новый.
+        """
+        opens_at = notify_minute(settings)
+        new_user = (
+            pg_insert(users)
+            .values(
+                user_id=user_id,
+                username=username,
+                settings=settings or {},
+                progress={},
+                words_added={},
+                last_active=datetime.now(timezone.utc),
+                ml_profile={},
+                notify_minute=opens_at,
+                motivation_minute=motivation_minute(opens_at, user_id),
             )
+            .on_conflict_do_nothing()
+            .returning(users.c.user_id)
+            .cte("new_user")
+        )
+        new_stats = (
+            pg_insert(stats)
+            .from_select(["user_id"], select(new_user.c.user_id))
+            .on_conflict_do_nothing()
+            .cte("new_stats")
+        )
+        stmt = select(func.count()).select_from(new_user).add_cte(new_stats)
 
+        async with self._session() as session:
+            created = (await session.execute(stmt)).scalar_one()
             await session.commit()
 
-    async def get_user(self, user_id: int):
-        async with AsyncSessionLocal() as session:
-            user_row = (
-                await session.execute(select(users).where(users.c.user_id == user_id))
-            ).fetchone()
+        self._mark_write(user_id)
+        self.user_cache.invalidate(user_id)
+        return created > 0
 
-            if not user_row:
-                return None
+    async def get_user(self, user_id: int):
+        return await self.user_cache.get_or_load(user_id, self._load_user)
 
-            stats_row = (
-                await session.execute(select(stats).where(stats.c.user_id == user_id))
-            ).fetchone()
+    async def _load_user(self, user_id: int):
+        stmt = (
+            select(
+                users,
+                stats.c.user_id.label("stats_user_id"),
+                stats.c.learned_words,
+                stats.c.success_rate,
+                stats.c.activity_log,
+                stats.c.histogram_data,
+                stats.c.ml_stats,
+            )
+            .outerjoin(stats, stats.c.user_id == users.c.user_id)
+            .where(users.c.user_id == user_id)
+        )
+        async with self._read_session(user_id) as session:
+            row = (await session.execute(stmt)).fetchone()
 
-            user_stats = None
-            if stats_row:
-                user_stats = Stats(
-                    user_id=user_id,
-                    learned_words=stats_row.learned_words,
-                    success_rate=stats_row.success_rate,
-                    activity_log=stats_row.activity_log,
-                    histogram_data=stats_row.histogram_data,
-                    ml_stats=stats_row.ml_stats,
-                )
+        if not row:
+            return None
 
-            return User(
-                user_id=user_row.user_id,
-                username=user_row.username,
-                settings=user_row.settings,
-                progress=user_row.progress,
-                words_added=user_row.words_added,
-                last_active=user_row.last_active,
-                stats=user_stats,
-                ml_profile=user_row.ml_profile,
-            )
+        user_stats = Stats.from_row(row) if row.stats_user_id is not None else None
+        return User.from_row(row, stats=user_stats)
 
     async def update_user_setting(self, user_id: int, key: str, value):
-        async with AsyncSessionLocal() as session:
+        await self.update_user_settings(user_id, {key: value})
+
+    async def update_user_settings(self, user_id: int, values: dict):
+        """
+        Сливает values с текущими настройками на стороне сервера одним UPDATE
+        (settings || values), без чтения настроек в Python.
+        """
+        merged = func.coalesce(users.c.settings, literal({}, JSONB)).op("||")(
+            literal(values, JSONB)
+        )
+        due = []
+        async with self._session() as session:
             result = await session.execute(
-                select(users.c.settings).where(users.c.user_id == user_id)
-            )
-            row = result.fetchone()
-            current_settings = row.settings or {}
-            current_settings[key] = value
-            stmt = (
                 update(users)
                 .where(users.c.user_id == user_id)
-                .values(settings=current_settings)
+                .values(settings=merged)
+                .returning(users.c.settings)
+            )
+            new_settings = result.scalar_one_or_none()
+            # окно уведомлений зависит от времени и зоны — пересчитываем
+            # корзину; вместе с темпом от них зависит и next_send_at
+            if new_settings is not None and values.keys() & SEND_SETTINGS:
+                opens_at = notify_minute(new_settings)
+                due = await self._execute_due(
+                    session,
+                    update(users)
+                    .where(users.c.user_id == user_id)
+                    .values(
+                        notify_minute=opens_at,
+                        motivation_minute=motivation_minute(opens_at, user_id),
+                        next_send_at=_next_send(
+                            users.c.next_due_at,
+                            literal(opens_at, SmallInteger),
+                            self.window_minutes,
+                        ),
+                    ),
+                )
+            await session.commit()
+
+        self._mark_write(user_id)
+        self.user_cache.invalidate(user_id)
+        self._notify_due(due)
+
+    async def refresh_notify_minutes(self) -> int:
+        """
+        Пересчитывает notify_minute и motivation_minute на сегодняшнюю дату.
+        В зонах с летним временем минута UTC открытия окна меняется дважды в
+        год, а сохраняется она только при регистрации и смене настроек.
+        Обновляются лишь строки, у которых минута изменилась, вместе с их
+        next_send_at. Возвращает их число.
+        """
+        fresh = select(
+            users.c.user_id,
+            cast(text(f"({NOTIFY_MINUTE_SQL})"), SmallInteger).label("minute"),
+        ).subquery("fresh")
+        async with self._session() as session:
+            due = await self._execute_due(
+                session,
+                update(users)
+                .where(
+                    users.c.user_id == fresh.c.user_id,
+                    users.c.notify_minute.is_distinct_from(fresh.c.minute),
+                )
+                .values(
+                    notify_minute=fresh.c.minute,
+                    motivation_minute=(
+                        fresh.c.minute
+                        + USER_JITTER_HASH * MOTIVATION_SPREAD_MINUTES // JITTER_MODULUS
+                    )
+                    % MINUTES_PER_DAY,
+                    next_send_at=_next_send(
+                        users.c.next_due_at, fresh.c.minute, self.window_minutes
+                    ),
+                ),
             )
-            await session.execute(stmt)
             await session.commit()
+        self._notify_due(due)
+        return len(due)
 
     async def get_all_users(self):
-        async with AsyncSessionLocal() as session:
+        async with self._read_session() as session:
             result = await session.execute(select(users))
             return result.fetchall()
 
+    async def iter_users(
+        self, batch_size: int = STREAM_BATCH_SIZE, columns: list[str] | None = None
+    ):
+        """
+        Перебирает пользователей порциями по user_id (keyset-пагинация),
+        не держа в памяти всю таблицу. columns ограничивает набор колонок.
+        """
+        async for row in self._iter_keyset(
+            users,
+            users.c.user_id,
+            batch_size=batch_size,
+            columns=columns,
+            sessions=self._read_session,
+        ):
+            yield row
+
+    async def iter_due_users(self, batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Перебирает (user_id, next_send_at) пользователей, у которых есть
+        слова, — для загрузки очереди планировщика при старте.
+        """
+        async for row in self._iter_keyset(
+            users,
+            users.c.user_id,
+            users.c.next_send_at.isnot(None),
+            batch_size=batch_size,
+            columns=["user_id", "next_send_at"],
+            sessions=self._read_session,
+        ):
+            yield row
+
+    async def get_notify_bucket_batch(
+        self, minute: int, after_user_id: int | None, limit: int
+    ) -> list[int]:
+        """
+        Следующая порция пользователей, которым мотивация положена в эту
+        минуту UTC: user_id > after_user_id по индексу
+        (motivation_minute, user_id).
+        """
+        query = (
+            select(users.c.user_id)
+            .where(users.c.motivation_minute == minute)
+            .order_by(users.c.user_id)
+            .limit(limit)
+        )
+        if after_user_id is not None:
+            query = query.where(users.c.user_id > after_user_id)
+        async with self._read_session() as session:
+            return list((await session.execute(query)).scalars().all())
+
+    async def count_notify_bucket(self, minute: int) -> int:
+        async with self._read_session() as session:
+            result = await session.execute(
+                select(func.count())
+                .select_from(users)
+                .where(users.c.motivation_minute == minute)
+            )
+            return result.scalar_one()
+
+    async def refresh_next_send(self, user_ids: list[int], now: datetime):
+        """
+        Пересчитывает next_send_at указанных пользователей не раньше now и
+        возвращает (user_id, next_send_at). Так в следующее окно переносятся
+        пользователи, чьё время отправки прошло без напоминания: окно
+        закрылось, пока узлы не работали.
+        """
+        async with self._session() as session:
+            rows = await self._execute_due(
+                session, _refresh_next_send(self.window_minutes, user_ids, now)
+            )
+            await session.commit()
+        return rows
+
     # WORDS
 
-    async def add_word(self, word: str, translation: str, user_id: int):
-        async with AsyncSessionLocal() as session:
+    async def add_word(self, text: str, translation: str, user_id: int):
+        next_repeat = datetime.now(timezone.utc) + timedelta(days=1)
+        async with self._session() as session:
             await session.execute(
                 insert(words).values(
                     user_id=user_id,
-                    text=word,
+                    text=text,
                     translation=translation,
-                    next_repeat=datetime.now(timezone.utc) + timedelta(days=1),
+                    next_repeat=next_repeat,
                 )
             )
+            due = await self._execute_due(
+                session, _lower_next_due(user_id, next_repeat, self.window_minutes)
+            )
+            await session.commit()
+
+        self._mark_write(user_id)
+        self._notify_due(due)
+
+    async def import_words(
+        self, user_id: int, pairs: list[tuple[str, str]], next_repeat: datetime
+    ) -> int:
+        """
+        Массовая загрузка слов через COPY одной транзакцией вместе с
+        обновлением users.next_due_at. Значения по умолчанию задаются на
+        стороне Python (как в add_word), поэтому здесь они перечислены явно.
+        """
+        now = datetime.now(timezone.utc)
+        records = [
+            (user_id, word, translation, next_repeat, 0, now, 0.5, 0.5, 0.5, 1.0, 0.5, "[]")
+            for word, translation in pairs
+        ]
+        if not records:
+            return 0
+        async with self._session() as session:
+            # адаптер asyncpg открывает транзакцию при первом execute через
+            # SQLAlchemy; COPY на сыром соединении до этого закоммитился бы
+            # сам по себе. Поэтому сначала UPDATE, затем COPY
+            due = await self._execute_due(
+                session, _lower_next_due(user_id, next_repeat, self.window_minutes)
+            )
+            conn = await session.connection()
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                words.name, records=records, columns=WORD_COPY_COLUMNS
+            )
             await session.commit()
 
-    async def get_user_words(self, user_id: int):
-        async with AsyncSessionLocal() as session:
+        self._mark_write(user_id)
+        self._notify_due(due)
+        return len(records)
+
+    async def get_pending_word(self, user_id: int):
+        """
+        Слово, на которое пользователь сейчас отвечает, и его ответ, если он
+        уже дан и ждёт подтверждения: (Word, answer | None) или None.
+        Читается с primary: ответ приходит сразу после записи.
+        """
+        async with self._session() as session:
+            row = (
+                await session.execute(
+                    select(words, users.c.pending_answer)
+                    .select_from(
+                        users.join(words, words.c.word_id == users.c.pending_word_id)
+                    )
+                    .where(users.c.user_id == user_id, words.c.user_id == user_id)
+                )
+            ).fetchone()
+        if row is None:
+            return None
+        return Word.from_row(row), row.pending_answer
+
+    async def set_pending_answer(self, user_id: int, word_id: int, answer: str):
+        # только если ждём ответ на это слово: новое напоминание не затираем
+        async with self._session() as session:
+            await session.execute(
+                update(users)
+                .where(users.c.user_id == user_id, users.c.pending_word_id == word_id)
+                .values(pending_answer=answer)
+            )
+            await session.commit()
+
+    async def clear_pending_word(self, user_id: int, word_id: int):
+        async with self._session() as session:
+            await session.execute(
+                update(users)
+                .where(users.c.user_id == user_id, users.c.pending_word_id == word_id)
+                .values(pending_word_id=None, pending_answer=None)
+            )
+            await session.commit()
+
+    async def get_words(self, word_ids: list[int]) -> list[Word]:
+        if not word_ids:
+            return []
+        async with self._session() as session:
             result = await session.execute(
-                select(words).where(words.c.user_id == user_id)
+                select(words).where(words.c.word_id.in_(word_ids))
+            )
+            return [Word.from_row(row) for row in result.fetchall()]
+
+    async def get_user_words(self, user_id: int, columns: list[str] | None = None):
+        """
+        Все слова пользователя. Без columns — объекты Word, с columns —
+        строки результата только с этими колонками, без создания объектов.
+        """
+        selected = [words.c[name] for name in columns] if columns else [words]
+        async with self._read_session(user_id) as session:
+            result = await session.execute(
+                select(*selected).where(words.c.user_id == user_id)
             )
             rows = result.fetchall()
 
+        if columns:
+            return rows
+        return [Word.from_row(row) for row in rows]
+
+    async def iter_user_words(
+        self,
+        user_id: int,
+        batch_size: int = STREAM_BATCH_SIZE,
+        columns: list[str] | None = None,
+    ):
+        """
+        Перебирает слова пользователя порциями по word_id. Без columns
+        отдаёт объекты Word, с columns — строки только с этими колонками.
+        """
+        async for row in self._iter_keyset(
+            words,
+            words.c.word_id,
+            words.c.user_id == user_id,
+            batch_size=batch_size,
+            columns=columns,
+            sessions=lambda: self._read_session(user_id),
+        ):
+            yield row if columns else Word.from_row(row)
+
+    async def get_due_words(self, now: datetime, limit: int = 1000):
+        """
+        Возвращает не больше одного просроченного слова на пользователя
+        (самое старое по next_repeat) вместе с reminders_per_day из настроек.
+        Результат: список (Word, reminders_per_day, notify_minute).
+
+        Пользователи берутся диапазоном по users.next_send_at: он уже учитывает
+        remind_after, окно уведомлений и первый слот пользователя
+        (bot.services.delivery_window). Для каждого слово выбирается через
+        LATERAL по words(user_id, next_repeat), так что стоимость не зависит
+        от размера словарей.
+
+        Читается с primary: планировщик сразу обновляет выбранные слова, и
+        отставшая реплика вернула бы их повторно.
+        """
+        due_users = (
+            select(
+                users.c.user_id,
+                REMINDERS_PER_DAY.label("reminders_per_day"),
+                users.c.notify_minute,
+            )
+            .where(*_due_users_criteria(now, self.window_minutes))
+            .order_by(users.c.next_send_at)
+            .limit(limit)
+            .subquery("due_users")
+        )
+        async with self._session() as session:
+            result = await session.execute(_first_due_words(due_users, now))
             return [
-                Word(
-                    word_id=row.word_id,
-                    user_id=row.user_id,
-                    text=row.text,
-                    translation=row.translation,
-                    next_repeat=row.next_repeat,
-                    repeat_count=row.repeat_count,
-                    created_at=row.created_at,
-                    base_difficulty=row.base_difficulty,
-                    personal_difficulty=row.personal_difficulty,
-                    difficulty=row.difficulty,
-                    stability=row.stability,
-                    ml_score=row.ml_score,
-                    history=row.history,
-                )
-                for row in rows
+                (Word.from_row(row), row.reminders_per_day or 1, row.notify_minute)
+                for row in result.fetchall()
             ]
 
+    async def claim_due_words(
+        self,
+        now: datetime,
+        owner: str,
+        lease_seconds: int,
+        limit: int = 1000,
+    ):
+        """
+        Как get_due_words, но для нескольких узлов планировщика: пользователи
+        берутся в аренду (lease_owner, lease_until) одним запросом с
+        FOR UPDATE SKIP LOCKED, поэтому параллельные узлы получают разные
+        пачки. Если узел упал, аренда истекает через lease_seconds и
+        пользователя забирает другой узел.
+        """
+        candidates = (
+            select(users.c.user_id)
+            .where(
+                *_due_users_criteria(now, self.window_minutes),
+                users.c.lease_until.is_(None) | (users.c.lease_until <= now),
+            )
+            .order_by(users.c.next_send_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = (
+            update(users)
+            .where(users.c.user_id.in_(candidates.scalar_subquery()))
+            .values(
+                lease_owner=owner,
+                lease_until=now + timedelta(seconds=lease_seconds),
+            )
+            .returning(
+                users.c.user_id,
+                REMINDERS_PER_DAY.label("reminders_per_day"),
+                users.c.notify_minute,
+            )
+            .cte("claimed")
+        )
+        async with self._session() as session:
+            result = await session.execute(_first_due_words(claimed, now))
+            rows = result.fetchall()
+            await session.commit()
+
+        return [
+            (Word.from_row(row), row.reminders_per_day or 1, row.notify_minute)
+            for row in rows
+        ]
+
+    async def claim_job(self, name: str, owner: str, lease_seconds: int) -> bool:
+        """
+        Берёт разовую задачу планировщика. True — задачу выполняет этот узел:
+        её ещё никто не брал, либо аренда истекла, а задача не завершена.
+        """
+        now = datetime.now(timezone.utc)
+        stmt = pg_insert(job_leases).values(
+            name=name,
+            owner=owner,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            done=False,
+            claimed_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={
+                "owner": stmt.excluded.owner,
+                "lease_until": stmt.excluded.lease_until,
+                "claimed_at": stmt.excluded.claimed_at,
+            },
+            where=(~job_leases.c.done) & (job_leases.c.lease_until < now),
+        ).returning(job_leases.c.name)
+        async with self._session() as session:
+            claimed = (await session.execute(stmt)).first()
+            await session.commit()
+        return claimed is not None
+
+    async def finish_job(self, name: str, owner: str):
+        async with self._session() as session:
+            await session.execute(
+                update(job_leases)
+                .where(job_leases.c.name == name, job_leases.c.owner == owner)
+                .values(done=True)
+            )
+            await session.commit()
+
+    async def claim_broadcast(
+        self, name: str, owner: str, lease_seconds: int, total: int
+    ):
+        """
+        Создаёт рассылку или забирает незавершённую, если аренда прежнего
+        владельца истекла. Возвращает строку broadcasts (с контрольной
+        точкой) или None, если рассылка завершена или её ведёт другой узел.
+        """
+        now = datetime.now(timezone.utc)
+        stmt = pg_insert(broadcasts).values(
+            name=name,
+            owner=owner,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            total=total,
+            sent=0,
+            failed=0,
+            skipped=0,
+            started_at=now,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={
+                "owner": stmt.excluded.owner,
+                "lease_until": stmt.excluded.lease_until,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=broadcasts.c.finished_at.is_(None)
+            & ((broadcasts.c.lease_until < now) | (broadcasts.c.owner == owner)),
+        ).returning(*broadcasts.c)
+        async with self._session() as session:
+            row = (await session.execute(stmt)).first()
+            await session.commit()
+        return row
+
+    async def checkpoint_broadcast(
+        self, name: str, owner: str, lease_seconds: int, **fields
+    ) -> bool:
+        """
+        Сохраняет контрольную точку и продлевает аренду. False — аренду
+        забрал другой узел, продолжать нельзя.
+        """
+        now = datetime.now(timezone.utc)
+        async with self._session() as session:
+            result = await session.execute(
+                update(broadcasts)
+                .where(broadcasts.c.name == name, broadcasts.c.owner == owner)
+                .values(
+                    lease_until=now + timedelta(seconds=lease_seconds),
+                    updated_at=now,
+                    **fields,
+                )
+                .returning(broadcasts.c.name)
+            )
+            updated = result.first()
+            await session.commit()
+        return updated is not None
+
+    async def is_job_done(self, name: str) -> bool:
+        async with self._session() as session:
+            result = await session.execute(
+                select(job_leases.c.done).where(job_leases.c.name == name)
+            )
+            return bool(result.scalar_one_or_none())
+
+    async def get_unfinished_broadcasts(
+        self, prefix: str, expired_before: datetime | None = None
+    ) -> list[str]:
+        """
+        Незавершённые рассылки с именем на prefix. С expired_before — только
+        те, чья аренда истекла раньше: их прежний владелец упал или
+        перезапустился.
+        """
+        query = (
+            select(broadcasts.c.name)
+            .where(
+                broadcasts.c.name.startswith(prefix),
+                broadcasts.c.finished_at.is_(None),
+            )
+            .order_by(broadcasts.c.name)
+        )
+        if expired_before is not None:
+            query = query.where(broadcasts.c.lease_until < expired_before)
+        async with self._session() as session:
+            result = await session.execute(query)
+            return list(result.scalars().all())
+
+    async def get_broadcast(self, name: str):
+        async with self._session() as session:
+            result = await session.execute(
+                select(broadcasts).where(broadcasts.c.name == name)
+            )
+            return result.first()
+
+    async def delete_finished_jobs(self, before: datetime) -> int:
+        """Удаляет завершённые разовые задачи и рассылки старше before."""
+        async with self._session() as session:
+            result = await session.execute(
+                delete(job_leases).where(
+                    job_leases.c.done, job_leases.c.claimed_at < before
+                )
+            )
+            finished = await session.execute(
+                delete(broadcasts).where(broadcasts.c.finished_at < before)
+            )
+            await session.commit()
+        return result.rowcount + finished.rowcount
+
     async def update_word_next_repeat(
         self, user_id: int, word_id: int, next_repeat=None
     ):
         if next_repeat is None:
             next_repeat = datetime.now(timezone.utc) + timedelta(days=1)
 
-        async with AsyncSessionLocal() as session:
+        async with self._session() as session:
             await session.execute(
                 update(words)
                 .where(words.c.word_id == word_id, words.c.user_id == user_id)
                 .values(next_repeat=next_repeat)
             )
+            due = await self._execute_due(
+                session, _refresh_next_due(self.window_minutes, [user_id])
+            )
             await session.commit()
 
-    # STATS
+        self._mark_write(user_id)
+        self._notify_due(due)
 
-    async def log_activity(self, user_id: int, action: str):
-        async with AsyncSessionLocal() as session:
-            new_activity = {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "action": action,
-            }
+    async def update_words_bulk(
+        self, updates: list[WordUpdate], chunk_size: int = BULK_UPDATE_CHUNK
+    ) -> int:
+        """
+        Применяет много изменений слов одним UPDATE ... FROM (VALUES ...) на
+        каждую порцию. Поля со значением None остаются прежними. Каждая
+        порция коммитится отдельно, чтобы не держать долгую транзакцию.
+        Возвращает количество обновлённых строк.
+        """
+        updated = 0
+
+        for start in range(0, len(updates), chunk_size):
+            chunk = updates[start : start + chunk_size]
+            user_ids = sorted({item.user_id for item in chunk})
+            due = []
+            async with self._session() as session:
+                result = await session.execute(_bulk_update_words(chunk))
+                if any(item.next_repeat is not None for item in chunk):
+                    due = await self._execute_due(
+                        session, _refresh_next_due(self.window_minutes, user_ids)
+                    )
+                await session.commit()
 
+            updated += result.rowcount
+            for user_id in user_ids:
+                self._mark_write(user_id)
+            self._notify_due(due)
+
+        return updated
+
+    # OUTBOX
+
+    async def schedule_reminders(
+        self,
+        updates: list[WordUpdate],
+        messages: list[dict],
+        remind_after: dict[int, datetime] | None = None,
+    ) -> int:
+        """
+        В одной транзакции переносит next_repeat слов, кладёт напоминания
+        в outbox и сохраняет users.remind_after — момент, раньше которого
+        пользователю не шлём следующее напоминание. Либо записано всё, либо
+        ничего: напоминание не теряется и не повторяется из-за падения между
+        шагами. Сообщение с уже существующим idempotency_key не добавляется.
+        Возвращает число новых сообщений.
+        """
+        if not updates and not messages:
+            return 0
+        now = datetime.now(timezone.utc)
+        user_ids = sorted({item.user_id for item in updates})
+        due = []
+        inserted = []
+        async with self._session() as session:
+            # remind_after пишется до пересчёта сроков: next_send_at от него
+            # зависит
+            if remind_after:
+                rows = values(
+                    column("user_id", Integer),
+                    column("remind_after", DateTime(timezone=True)),
+                    name="pacing",
+                ).data(list(remind_after.items()))
+                await session.execute(
+                    update(users)
+                    .where(users.c.user_id == rows.c.user_id)
+                    .values(remind_after=rows.c.remind_after)
+                )
+            if updates:
+                await session.execute(_bulk_update_words(updates))
+                due = await self._execute_due(
+                    session, _refresh_next_due(self.window_minutes, user_ids)
+                )
+            if messages:
+                stmt = (
+                    pg_insert(outbox)
+                    .values([{"created_at": now, **message} for message in messages])
+                    .on_conflict_do_nothing(index_elements=["idempotency_key"])
+                    .returning(outbox.c.message_id)
+                )
+                inserted = (await session.execute(stmt)).fetchall()
+            await session.commit()
+
+        for user_id in user_ids:
+            self._mark_write(user_id)
+        self._notify_due(due)
+        return len(inserted)
+
+    async def claim_outbox(self, now: datetime, limit: int, lease_seconds: int):
+        """
+        Берёт пачку готовых к отправке сообщений. Попытка засчитывается
+        сразу, а next_attempt_at сдвигается на lease_seconds: если
+        диспетчер упадёт, сообщение вернётся в очередь после аренды.
+        FOR UPDATE SKIP LOCKED разводит параллельных диспетчеров.
+        """
+        candidates = (
+            select(outbox.c.message_id)
+            .where(outbox.c.status == "pending", outbox.c.next_attempt_at <= now)
+            .order_by(outbox.c.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._session() as session:
             result = await session.execute(
-                select(stats.c.activity_log).where(stats.c.user_id == user_id)
+                update(outbox)
+                .where(outbox.c.message_id.in_(candidates.scalar_subquery()))
+                .values(
+                    attempts=outbox.c.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=lease_seconds),
+                )
+                .returning(*outbox.c)
             )
-            row = result.fetchone()
-
-            if row and row.activity_log:
-                activity_log = list(row.activity_log)
-            else:
-                activity_log = []
+            rows = result.fetchall()
+            await session.commit()
+        return rows
 
-            activity_log.append(new_activity)
+    async def mark_outbox_sent(self, message_ids: list[int], sent_at: datetime):
+        """
+        Отмечает сообщения отправленными и в той же транзакции запоминает
+        слово напоминания как ожидающее ответа пользователя.
+        """
+        if not message_ids:
+            return
+        async with self._session() as session:
+            await session.execute(
+                update(outbox)
+                .where(outbox.c.message_id.in_(message_ids))
+                .values(status="sent", sent_at=sent_at, last_error=None)
+            )
+            await session.execute(
+                update(users)
+                .where(
+                    users.c.user_id == outbox.c.user_id,
+                    outbox.c.message_id.in_(message_ids),
+                    outbox.c.kind == "word_reminder",
+                )
+                .values(pending_word_id=outbox.c.word_id, pending_answer=None)
+            )
+            await session.commit()
 
+    async def reschedule_outbox(self, failures: list[tuple]):
+        """
+        Сохраняет итог неудачных попыток одним UPDATE ... FROM (VALUES ...):
+        кортежи (message_id, status, next_attempt_at, last_error).
+        """
+        if not failures:
+            return
+        rows = values(
+            column("message_id", BigInteger),
+            column("status", String),
+            column("next_attempt_at", DateTime(timezone=True)),
+            column("last_error", String),
+            name="failures",
+        ).data(failures)
+        async with self._session() as session:
             await session.execute(
-                pg_insert(stats)
+                update(outbox)
+                .where(outbox.c.message_id == rows.c.message_id)
                 .values(
-                    user_id=user_id,
-                    activity_log=activity_log,
+                    status=rows.c.status,
+                    next_attempt_at=rows.c.next_attempt_at,
+                    last_error=rows.c.last_error,
                 )
-                .on_conflict_do_update(
-                    index_elements=["user_id"],
-                    set_={"activity_log": activity_log},
+            )
+            await session.commit()
+
+    async def outbox_stats(self) -> dict[str, int]:
+        """Количество сообщений по статусам: очередь, отправленные, dead."""
+        async with self._read_session() as session:
+            result = await session.execute(
+                select(outbox.c.status, func.count()).group_by(outbox.c.status)
+            )
+            return {status: count for status, count in result.fetchall()}
+
+    async def delete_sent_outbox(self, before: datetime) -> int:
+        async with self._session() as session:
+            result = await session.execute(
+                delete(outbox).where(
+                    outbox.c.status == "sent", outbox.c.sent_at < before
                 )
             )
+            await session.commit()
+        return result.rowcount
 
+    # STATS
+
+    async def log_activity(self, user_id: int, action: str, payload: dict | None = None):
+        await self.activity_buffer.put(
+            {
+                "user_id": user_id,
+                "ts": datetime.now(timezone.utc),
+                "action": action,
+                "payload": payload,
+            }
+        )
+
+    async def _write_activity_events(self, records: list[dict]):
+        rollups = aggregate_daily(records)
+        async with self._session() as session:
+            await session.execute(insert(activity_events).values(records))
+            if rollups:
+                stmt = pg_insert(activity_daily).values(rollups)
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["user_id", "day"],
+                        set_={
+                            name: activity_daily.c[name] + stmt.excluded[name]
+                            for name in ROLLUP_COUNTERS
+                        },
+                    )
+                )
+            await session.commit()
+
+        for user_id in {record["user_id"] for record in records}:
+            self._mark_write(user_id)
+
+    async def get_daily_activity(self, user_id: int, since):
+        """Дневные счётчики пользователя начиная с дня since (не больше N строк)."""
+        async with self._read_session(user_id) as session:
+            result = await session.execute(
+                select(activity_daily)
+                .where(activity_daily.c.user_id == user_id, activity_daily.c.day >= since)
+                .order_by(activity_daily.c.day)
+            )
+            return result.fetchall()
+
+    async def rebuild_activity_rollups(self):
+        """
+        Пересчитывает activity_daily целиком по activity_events. Правила те же,
+        что в bot.services.activity.activity_counters.
+        """
+        action = activity_events.c.action
+        is_answer = action.startswith("answered:")
+        imported = activity_events.c.payload["count"].astext.cast(Integer)
+        day = func.timezone("UTC", activity_events.c.ts).cast(Date)
+
+        stmt = pg_insert(activity_daily).from_select(
+            ["user_id", "day", *ROLLUP_COUNTERS],
+            select(
+                activity_events.c.user_id,
+                day,
+                func.count().filter(action.startswith("add_word:"))
+                + func.coalesce(func.sum(imported).filter(action == "import_words"), 0),
+                func.count().filter(is_answer),
+                func.count().filter(is_answer & action.endswith(":correct")),
+                func.count().filter(is_answer & ~action.endswith(":correct")),
+            ).group_by(activity_events.c.user_id, day),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={name: stmt.excluded[name] for name in ROLLUP_COUNTERS},
+        )
+        async with self._session() as session:
+            await session.execute(stmt)
             await session.commit()
 
+    async def migrate_activity_log(self, batch_size: int = ACTIVITY_MIGRATION_BATCH):
+        """
+        Переносит старые записи из stats.activity_log в activity_events
+        порциями по batch_size пользователей, каждая порция в своей транзакции.
+        Возвращает количество перенесённых событий.
+        """
+        entry = (
+            func.jsonb_array_elements(stats.c.activity_log)
+            .table_valued(column("value", JSONB))
+            .alias("entry")
+        )
+        migrated = 0
+        last_user_id = None
+
+        while True:
+            async with self._session() as session:
+                query = (
+                    select(stats.c.user_id)
+                    .where(func.jsonb_array_length(stats.c.activity_log) > 0)
+                    .order_by(stats.c.user_id)
+                    .limit(batch_size)
+                )
+                if last_user_id is not None:
+                    query = query.where(stats.c.user_id > last_user_id)
+                user_ids = (await session.execute(query)).scalars().all()
+                if not user_ids:
+                    break
+
+                result = await session.execute(
+                    insert(activity_events).from_select(
+                        ["user_id", "ts", "action"],
+                        select(
+                            stats.c.user_id,
+                            func.coalesce(
+                                entry.c.value["timestamp"].astext.cast(
+                                    DateTime(timezone=True)
+                                ),
+                                func.now(),
+                            ),
+                            func.coalesce(entry.c.value["action"].astext, ""),
+                        )
+                        .select_from(stats.join(entry, true()))
+                        .where(stats.c.user_id.in_(user_ids)),
+                    )
+                )
+                await session.execute(
+                    update(stats)
+                    .where(stats.c.user_id.in_(user_ids))
+                    .values(activity_log=[])
+                )
+                await session.commit()
+
+            migrated += result.rowcount
+            last_user_id = user_ids[-1]
+
+        return migrated
+
     async def get_user_stats(self, user_id: int):
-        async with AsyncSessionLocal() as session:
+        async with self._read_session(user_id) as session:
             row = (
                 await session.execute(select(stats).where(stats.c.user_id == user_id))
             ).fetchone()
@@ -268,14 +1723,7 @@ class Database:
             if not row:
                 return None
 
-            return Stats(
-                user_id=row.user_id,
-                learned_words=row.learned_words,
-                success_rate=row.success_rate,
-                activity_log=row.activity_log,
-                histogram_data=row.histogram_data,
-                ml_stats=row.ml_stats,
-            )
+            return Stats.from_row(row)
 
     async def update_word_after_check(
         self,
@@ -286,8 +1734,14 @@ class Database:
         stability: float,
         ml_score: float,
         repeat_count: int,
+        review: dict | None = None,
     ):
-        async with AsyncSessionLocal() as session:
+        """
+        Сохраняет новые параметры слова. Если передан review (rating,
+        is_correct, interval_days, ml_score), в той же транзакции
+        добавляется строка в review_log.
+        """
+        async with self._session() as session:
             await session.execute(
                 update(words)
                 .where(words.c.word_id == word_id, words.c.user_id == user_id)
@@ -299,4 +1753,84 @@ class Database:
                     repeat_count=repeat_count,
                 )
             )
+            if review is not None:
+                await session.execute(
+                    insert(review_log).values(
+                        word_id=word_id,
+                        user_id=user_id,
+                        ts=review.get("timestamp") or datetime.now(timezone.utc),
+                        rating=review["rating"],
+                        is_correct=review["is_correct"],
+                        interval_days=review.get("interval_days"),
+                        ml_score=review.get("ml_score"),
+                    )
+                )
+            due = await self._execute_due(
+                session, _refresh_next_due(self.window_minutes, [user_id])
+            )
             await session.commit()
+
+        self._mark_write(user_id)
+        self._notify_due(due)
+
+    async def iter_reviews(
+        self, batch_size: int = STREAM_BATCH_SIZE, columns: list[str] | None = None
+    ):
+        """Перебирает review_log порциями по review_id, например для обучения ML."""
+        async for row in self._iter_keyset(
+            review_log,
+            review_log.c.review_id,
+            batch_size=batch_size,
+            columns=columns,
+            sessions=self._read_session,
+        ):
+            yield row
+
+    # ARCHIVE
+
+    async def archive_old_records(
+        self,
+        table_name: str,
+        before: datetime,
+        archive_dir: str,
+        batch_size: int = ARCHIVE_BATCH,
+    ) -> int:
+        """
+        Переносит строки activity_events или review_log старше before в
+        архив на диске (bot.services.archive). Порция удаляется через
+        DELETE ... RETURNING и пишется в файл до COMMIT: при ошибке записи
+        строки остаются в базе. Дневные счётчики activity_daily не трогаются.
+        Возвращает количество перенесённых строк.
+        """
+        table = {"activity_events": activity_events, "review_log": review_log}[
+            table_name
+        ]
+        key = table.c[ARCHIVE_KEYS[table_name]]
+        archived = 0
+
+        while True:
+            oldest = (
+                select(key)
+                .where(table.c.ts < before)
+                .order_by(table.c.ts)
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            async with self._session() as session:
+                result = await session.execute(
+                    delete(table)
+                    .where(table.c.ts < before, key.in_(oldest))
+                    .returning(*table.c)
+                )
+                records = [dict(row._mapping) for row in result.fetchall()]
+                if records:
+                    await asyncio.to_thread(
+                        write_archive, archive_dir, table_name, records
+                    )
+                await session.commit()
+
+            archived += len(records)
+            if len(records) < batch_size:
+                break
+
+        return archived
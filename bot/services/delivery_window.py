@@ -0,0 +1,131 @@
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MINUTES_PER_DAY = 24 * 60
+
+DEFAULT_NOTIFICATION_TIME = "10:00"
+DEFAULT_TIMEZONE = "UTC"
+
+# Мотивация расходится на столько минут после открытия окна, чтобы
+# пользователи с одинаковым notification_time не получали её одной пачкой
+MOTIVATION_SPREAD_MINUTES = 60
+
+# мультипликативный хеш Кнута: соседние user_id получают далёкие доли
+JITTER_MULTIPLIER = 2654435761
+JITTER_MODULUS = 2**32
+
+# notification_time: "ч:мм", часы и минуты из одной или двух цифр ASCII.
+# Тем же шаблоном время проверяет Postgres (database.NOTIFY_MINUTE_SQL),
+# поэтому окно в Python и в базе считается по одним правилам
+NOTIFICATION_TIME_PATTERN = r"([01]?[0-9]|2[0-3]):([0-5]?[0-9])"
+
+
+def _parse_time(value) -> time | None:
+    match = re.fullmatch(NOTIFICATION_TIME_PATTERN, str(value))
+    if match is None:
+        return None
+    return time(int(match[1]), int(match[2]))
+
+
+def _parse_zone(value):
+    try:
+        return ZoneInfo(str(value))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def notify_minute(settings: dict | None, day: date | None = None) -> int:
+    """
+    Минута суток по UTC (0..1439), в которую открывается окно уведомлений
+    пользователя: notification_time в его timezone. Некорректные значения
+    заменяются значениями по умолчанию. Сдвиг при переходе на летнее время
+    учитывается на дату day (по умолчанию сегодня по UTC).
+    """
+    settings = settings or {}
+    local_time = _parse_time(settings.get("notification_time")) or _parse_time(
+        DEFAULT_NOTIFICATION_TIME
+    )
+    zone = _parse_zone(settings.get("timezone")) or ZoneInfo(DEFAULT_TIMEZONE)
+
+    day = day or datetime.now(timezone.utc).date()
+    opens = datetime.combine(day, local_time, tzinfo=zone).astimezone(timezone.utc)
+    return opens.hour * 60 + opens.minute
+
+
+def minute_of_day(moment: datetime) -> int:
+    moment = moment.astimezone(timezone.utc)
+    return moment.hour * 60 + moment.minute
+
+
+def jitter(user_id: int) -> float:
+    """
+    Детерминированная доля [0, 1) пользователя, на которую сдвигаются его
+    отправки внутри слота. Доли равномерны по пользователям, поэтому
+    отправки идут ровным потоком, а не пиком в начале часа.
+    """
+    return user_id * JITTER_MULTIPLIER % JITTER_MODULUS / JITTER_MODULUS
+
+
+def motivation_minute(opens_at: int, user_id: int) -> int:
+    """Минута UTC мотивации: открытие окна плюс сдвиг пользователя."""
+    offset = int(jitter(user_id) * MOTIVATION_SPREAD_MINUTES)
+    return (opens_at + offset) % MINUTES_PER_DAY
+
+
+def _last_opening(now: datetime, opens_at: int) -> datetime:
+    # последнее открытие окна не позже now
+    now = now.astimezone(timezone.utc)
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+        minutes=opens_at
+    )
+    if start > now:
+        start -= timedelta(days=1)
+    return start
+
+
+def earliest_send(
+    now: datetime,
+    opens_at: int | None,
+    window_minutes: int,
+    reminders_per_day: int,
+    user_jitter: float,
+) -> datetime:
+    """
+    Ближайший момент не раньше now, когда пользователю можно отправить
+    напоминание: внутри окна и не раньше его первого слота.
+    """
+    if opens_at is None:
+        return now
+    slot = timedelta(minutes=window_minutes / max(reminders_per_day, 1))
+    start = _last_opening(now, opens_at)
+    first = start + slot * user_jitter
+    if now < first:
+        return first
+    if now < start + timedelta(minutes=window_minutes):
+        return now
+    return first + timedelta(days=1)
+
+
+def next_slot(
+    now: datetime,
+    opens_at: int | None,
+    window_minutes: int,
+    reminders_per_day: int,
+    user_jitter: float,
+) -> datetime:
+    """
+    Следующий слот напоминания строго после now. Окно делится на
+    reminders_per_day равных слотов, внутри каждого пользователь получает
+    напоминание со сдвигом user_jitter: opens + (k + user_jitter) * slot.
+    """
+    if opens_at is None:
+        opens_at, window_minutes = 0, MINUTES_PER_DAY
+    reminders_per_day = max(reminders_per_day, 1)
+    slot = timedelta(minutes=window_minutes / reminders_per_day)
+    start = _last_opening(now, opens_at)
+    for k in range(reminders_per_day):
+        at = start + slot * (k + user_jitter)
+        if at > now:
+            return at
+    return start + timedelta(days=1) + slot * user_jitter
@@ -0,0 +1,87 @@
+import asyncio
+import heapq
+from datetime import datetime, timezone
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DueQueue:
+    """
+    Очередь пользователей по сроку ближайшего повторения (куча).
+
+    На пользователя хранится один актуальный срок; при изменении в кучу
+    кладётся новая запись, а старая пропускается при извлечении. Если новый
+    срок раньше текущей головы, ожидающий wait() просыпается и пересчитывает
+    время сна.
+    """
+
+    def __init__(self, clock=_utcnow):
+        self._clock = clock
+        self._heap: list[tuple[datetime, int]] = []
+        self._due: dict[int, datetime] = {}
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, user_id: int, due_at: datetime | None):
+        """Ставит или переносит срок пользователя; None — убрать из очереди."""
+        if due_at is None:
+            self._due.pop(user_id, None)
+            return
+        if due_at.tzinfo is None:
+            due_at = due_at.replace(tzinfo=timezone.utc)
+        if self._due.get(user_id) == due_at:
+            return
+
+        head = self.peek()
+        self._due[user_id] = due_at
+        heapq.heappush(self._heap, (due_at, user_id))
+        if head is None or due_at < head:
+            self._changed.set()
+
+        # устаревших записей стало больше, чем живых — пересобираем кучу
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, uid) for uid, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def get(self, user_id: int) -> datetime | None:
+        return self._due.get(user_id)
+
+    def peek(self) -> datetime | None:
+        """Ближайший срок в очереди."""
+        while self._heap:
+            due_at, user_id = self._heap[0]
+            if self._due.get(user_id) == due_at:
+                return due_at
+            heapq.heappop(self._heap)  # запись устарела
+        return None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """Забирает из очереди всех пользователей со сроком <= now."""
+        user_ids = []
+        while (head := self.peek()) is not None and head <= now:
+            _, user_id = heapq.heappop(self._heap)
+            del self._due[user_id]
+            user_ids.append(user_id)
+        return user_ids
+
+    async def wait(self):
+        """
+        Спит ровно до ближайшего срока (или пока очередь пуста) и
+        просыпается раньше, если появился более ранний срок.
+        """
+        while True:
+            self._changed.clear()
+            head = self.peek()
+            timeout = None
+            if head is not None:
+                timeout = (head - self._clock()).total_seconds()
+                if timeout <= 0:
+                    return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass  # проверяем голову заново: срок могли перенести
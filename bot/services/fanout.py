@@ -0,0 +1,90 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+_STOP = object()
+
+
+class RateLimiter:
+    """Не больше rate запусков в секунду: запуски разносятся равномерно."""
+
+    def __init__(self, rate: float, clock=time.monotonic):
+        self._interval = 1.0 / rate
+        self._clock = clock
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = self._clock()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class FanOutResult:
+    done: int = 0
+    failed: int = 0
+    # элементы, на которых worker упал, — для повтора или учёта
+    failures: list = field(default_factory=list)
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def fan_out(
+    items,
+    worker,
+    concurrency: int,
+    rate: float | None = None,
+    name: str = "fan_out",
+    limiter: RateLimiter | None = None,
+) -> FanOutResult:
+    """
+    Выполняет worker(item) для всех items (список или async-итератор) не
+    более чем в concurrency задачах одновременно и, если задан rate, не чаще
+    rate запусков в секунду. Общий limiter ограничивает частоту сразу для
+    нескольких одновременных вызовов. Ошибка одного элемента печатается и не
+    мешает остальным. Очередь между чтением items и обработчиками ограничена,
+    поэтому поток получателей из базы не читается в память целиком.
+    """
+    result = FanOutResult()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    if limiter is None and rate:
+        limiter = RateLimiter(rate)
+
+    async def run_worker():
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            try:
+                if limiter is not None:
+                    await limiter.acquire()
+                await worker(item)
+                result.done += 1
+            except Exception as e:
+                result.failed += 1
+                result.failures.append(item)
+                print(f"Ошибка в {name}: {e}")
+
+    workers = [asyncio.create_task(run_worker()) for _ in range(concurrency)]
+    try:
+        async for item in _aiter(items):
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(_STOP)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    return result
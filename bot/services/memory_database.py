@@ -0,0 +1,690 @@
+import copy
+import heapq
+import itertools
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bot.models.stats import Stats
+from bot.models.user import User
+from bot.models.word import Word, WordUpdate
+from bot.services.activity import ROLLUP_COUNTERS, aggregate_daily
+from bot.services.archive import write_archive
+from bot.services.delivery_window import (
+    earliest_send,
+    jitter,
+    motivation_minute,
+    notify_minute,
+)
+
+STREAM_BATCH_SIZE = 1000
+
+
+def _aware(moment: datetime | None) -> datetime | None:
+    # timestamptz в Postgres считает наивное время UTC, делаем так же
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def _project(obj, columns: list[str]) -> SimpleNamespace:
+    return SimpleNamespace(**{name: getattr(obj, name) for name in columns})
+
+
+class InMemoryDatabase:
+    """
+    Хранилище в памяти с тем же интерфейсом, что у Database. Нужно для
+    нагрузочных тестов планировщика и обработчиков без Postgres.
+
+    Индексы: слова по пользователю (dict), куча на пользователя для его
+    ближайшего срока (users.next_due_at) и общая куча по моменту следующего
+    напоминания (users.next_send_at). Устаревшие записи куч не удаляются
+    сразу, а пропускаются при извлечении (срок уже другой).
+
+    window_minutes — длина окна уведомлений, как DELIVERY_WINDOW_HOURS у
+    Database; без него окно отправку не ограничивает.
+    """
+
+    def __init__(self, window_minutes: int | None = None):
+        self.window_minutes = window_minutes
+        self._users: dict[int, dict] = {}
+        self._stats: dict[int, Stats] = {}
+        self._words: dict[int, Word] = {}
+        self._words_by_user: dict[int, dict[int, Word]] = {}
+        self._user_due: dict[int, list[tuple[datetime, int]]] = {}
+        self._next_send: dict[int, datetime] = {}
+        self._send_heap: list[tuple[datetime, int]] = []
+        self._activity_events: list[dict] = []
+        self._activity_daily: dict[tuple[int, date], dict] = {}
+        self._review_log: list[dict] = []
+        self._next_word_id = 1
+        self._due_listeners = []
+        self._leases: dict[int, datetime] = {}
+        self._jobs: dict[str, dict] = {}
+        self._broadcasts: dict[str, dict] = {}
+        self._outbox: dict[int, dict] = {}
+        self._outbox_keys: set[str] = set()
+        self._message_ids = itertools.count(1)
+        self._event_ids = itertools.count(1)
+        self._review_ids = itertools.count(1)
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def ensure_activity_partitions(self, months_ahead: int = 0):
+        pass
+
+    def add_due_listener(self, callback):
+        self._due_listeners.append(callback)
+
+    def cache_stats(self) -> dict:
+        return {}
+
+    def pool_stats(self) -> dict:
+        return {}
+
+    # USERS
+
+    async def add_user(
+        self, user_id: int, username: str, settings: dict | None = None
+    ) -> bool:
+        if user_id in self._users:
+            return False
+
+        self._users[user_id] = {
+            "user_id": user_id,
+            "username": username,
+            "settings": dict(settings or {}),
+            "progress": {},
+            "words_added": {},
+            "last_active": datetime.now(timezone.utc),
+            "ml_profile": {},
+        }
+        self._set_window(self._users[user_id])
+        self._stats.setdefault(user_id, Stats(user_id=user_id, activity_log=[]))
+        return True
+
+    async def get_user(self, user_id: int):
+        row = self._users.get(user_id)
+        if row is None:
+            return None
+
+        stats = self._stats.get(user_id)
+        return User.from_row(
+            SimpleNamespace(**copy.deepcopy(row)),
+            stats=copy.deepcopy(stats) if stats is not None else None,
+        )
+
+    async def update_user_setting(self, user_id: int, key: str, value):
+        await self.update_user_settings(user_id, {key: value})
+
+    async def update_user_settings(self, user_id: int, values: dict):
+        row = self._users.get(user_id)
+        if row is not None:
+            row["settings"] = {**(row["settings"] or {}), **values}
+            self._set_window(row)
+            self._notify_due([user_id])
+
+    async def refresh_notify_minutes(self) -> int:
+        changed = []
+        for row in self._users.values():
+            before = row["notify_minute"]
+            self._set_window(row)
+            if row["notify_minute"] != before:
+                changed.append(row["user_id"])
+        self._notify_due(changed)
+        return len(changed)
+
+    async def get_all_users(self):
+        return [SimpleNamespace(**copy.deepcopy(row)) for row in self._users.values()]
+
+    async def iter_users(
+        self, batch_size: int = STREAM_BATCH_SIZE, columns: list[str] | None = None
+    ):
+        for user_id in sorted(self._users):
+            row = SimpleNamespace(**copy.deepcopy(self._users[user_id]))
+            yield _project(row, columns) if columns else row
+
+    async def iter_due_users(self, batch_size: int = STREAM_BATCH_SIZE):
+        for user_id in sorted(self._next_send):
+            yield SimpleNamespace(
+                user_id=user_id, next_send_at=self._next_send[user_id]
+            )
+
+    async def get_notify_bucket_batch(
+        self, minute: int, after_user_id: int | None, limit: int
+    ) -> list[int]:
+        user_ids = [
+            user_id
+            for user_id in sorted(self._users)
+            if self._users[user_id]["motivation_minute"] == minute
+            and (after_user_id is None or user_id > after_user_id)
+        ]
+        return user_ids[:limit]
+
+    async def count_notify_bucket(self, minute: int) -> int:
+        return sum(
+            1 for user in self._users.values() if user["motivation_minute"] == minute
+        )
+
+    async def refresh_next_send(self, user_ids: list[int], now: datetime):
+        return self._refresh_send(
+            [user_id for user_id in user_ids if user_id in self._users], _aware(now)
+        )
+
+    # WORDS
+
+    async def add_word(self, text: str, translation: str, user_id: int):
+        self._insert_word(
+            user_id, text, translation, datetime.now(timezone.utc) + timedelta(days=1)
+        )
+        self._notify_due([user_id])
+
+    async def import_words(
+        self, user_id: int, pairs: list[tuple[str, str]], next_repeat: datetime
+    ) -> int:
+        for text, translation in pairs:
+            self._insert_word(user_id, text, translation, next_repeat)
+        if pairs:
+            self._notify_due([user_id])
+        return len(pairs)
+
+    async def get_pending_word(self, user_id: int):
+        row = self._users.get(user_id) or {}
+        word = self._find_word(user_id, row.get("pending_word_id"))
+        if word is None:
+            return None
+        return self._copy_word(word), row.get("pending_answer")
+
+    async def set_pending_answer(self, user_id: int, word_id: int, answer: str):
+        row = self._users.get(user_id)
+        if row is not None and row.get("pending_word_id") == word_id:
+            row["pending_answer"] = answer
+
+    async def clear_pending_word(self, user_id: int, word_id: int):
+        row = self._users.get(user_id)
+        if row is not None and row.get("pending_word_id") == word_id:
+            row["pending_word_id"] = None
+            row["pending_answer"] = None
+
+    async def get_words(self, word_ids: list[int]) -> list[Word]:
+        return [
+            self._copy_word(self._words[word_id])
+            for word_id in word_ids
+            if word_id in self._words
+        ]
+
+    async def get_user_words(self, user_id: int, columns: list[str] | None = None):
+        user_words = self._words_by_user.get(user_id, {}).values()
+        if columns:
+            return [_project(word, columns) for word in user_words]
+        return [self._copy_word(word) for word in user_words]
+
+    async def iter_user_words(
+        self,
+        user_id: int,
+        batch_size: int = STREAM_BATCH_SIZE,
+        columns: list[str] | None = None,
+    ):
+        for word in list(self._words_by_user.get(user_id, {}).values()):
+            yield _project(word, columns) if columns else self._copy_word(word)
+
+    async def get_due_words(self, now: datetime, limit: int = 1000):
+        now = _aware(now)
+        popped = []
+        chosen: dict[int, Word] = {}
+
+        while self._send_heap and self._send_heap[0][0] <= now and len(chosen) < limit:
+            entry = heapq.heappop(self._send_heap)
+            next_send, user_id = entry
+            if self._next_send.get(user_id) != next_send:
+                continue  # запись устарела
+            popped.append(entry)
+            # время отправки прошло, пока окно было открыто, а сейчас оно
+            # закрыто: такого пользователя переносит планировщик
+            if self._earliest_send(user_id, now) > now:
+                continue
+            chosen.setdefault(user_id, self._first_word(user_id))
+
+        # пользователи остаются в выборке, пока их слова не обновят
+        for entry in popped:
+            heapq.heappush(self._send_heap, entry)
+
+        result = []
+        for user_id, word in chosen.items():
+            user = self._users.get(user_id, {})
+            settings = user.get("settings") or {}
+            result.append(
+                (
+                    self._copy_word(word),
+                    settings.get("reminders_per_day") or 1,
+                    user.get("notify_minute"),
+                )
+            )
+        return result
+
+    async def claim_due_words(
+        self,
+        now: datetime,
+        owner: str,
+        lease_seconds: int,
+        limit: int = 1000,
+    ):
+        # один процесс: аренда лишь не даёт взять пользователя повторно,
+        # пока решение о напоминании не записано
+        now = _aware(now)
+        result = [
+            due
+            for due in await self.get_due_words(now, limit)
+            if self._leases.get(due[0].user_id, now) <= now
+        ]
+        for word, _, _ in result:
+            self._leases[word.user_id] = now + timedelta(seconds=lease_seconds)
+        return result
+
+    async def claim_job(self, name: str, owner: str, lease_seconds: int) -> bool:
+        now = datetime.now(timezone.utc)
+        job = self._jobs.get(name)
+        if job is not None and (job["done"] or job["lease_until"] >= now):
+            return False
+        self._jobs[name] = {
+            "owner": owner,
+            "lease_until": now + timedelta(seconds=lease_seconds),
+            "done": False,
+            "claimed_at": now,
+        }
+        return True
+
+    async def finish_job(self, name: str, owner: str):
+        job = self._jobs.get(name)
+        if job is not None and job["owner"] == owner:
+            job["done"] = True
+
+    async def claim_broadcast(
+        self, name: str, owner: str, lease_seconds: int, total: int
+    ):
+        now = datetime.now(timezone.utc)
+        broadcast = self._broadcasts.get(name)
+        if broadcast is None:
+            broadcast = self._broadcasts[name] = {
+                "name": name,
+                "last_user_id": None,
+                "inflight_user_id": None,
+                "total": total,
+                "sent": 0,
+                "failed": 0,
+                "skipped": 0,
+                "started_at": now,
+                "finished_at": None,
+            }
+        elif broadcast["finished_at"] is not None or (
+            broadcast["lease_until"] >= now and broadcast["owner"] != owner
+        ):
+            return None
+        broadcast.update(
+            owner=owner,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            updated_at=now,
+        )
+        return SimpleNamespace(**broadcast)
+
+    async def checkpoint_broadcast(
+        self, name: str, owner: str, lease_seconds: int, **fields
+    ) -> bool:
+        broadcast = self._broadcasts.get(name)
+        if broadcast is None or broadcast["owner"] != owner:
+            return False
+        now = datetime.now(timezone.utc)
+        broadcast.update(
+            fields, lease_until=now + timedelta(seconds=lease_seconds), updated_at=now
+        )
+        return True
+
+    async def is_job_done(self, name: str) -> bool:
+        job = self._jobs.get(name)
+        return job is not None and job["done"]
+
+    async def get_unfinished_broadcasts(
+        self, prefix: str, expired_before: datetime | None = None
+    ) -> list[str]:
+        return sorted(
+            name
+            for name, broadcast in self._broadcasts.items()
+            if name.startswith(prefix)
+            and broadcast["finished_at"] is None
+            and (expired_before is None or broadcast["lease_until"] < expired_before)
+        )
+
+    async def get_broadcast(self, name: str):
+        broadcast = self._broadcasts.get(name)
+        return SimpleNamespace(**broadcast) if broadcast is not None else None
+
+    async def delete_finished_jobs(self, before: datetime) -> int:
+        finished = [
+            name
+            for name, job in self._jobs.items()
+            if job["done"] and job["claimed_at"] < before
+        ]
+        for name in finished:
+            del self._jobs[name]
+        broadcasts = [
+            name
+            for name, broadcast in self._broadcasts.items()
+            if broadcast["finished_at"] is not None
+            and broadcast["finished_at"] < before
+        ]
+        for name in broadcasts:
+            del self._broadcasts[name]
+        return len(finished) + len(broadcasts)
+
+    async def update_word_next_repeat(
+        self, user_id: int, word_id: int, next_repeat=None
+    ):
+        if next_repeat is None:
+            next_repeat = datetime.now(timezone.utc) + timedelta(days=1)
+
+        word = self._find_word(user_id, word_id)
+        if word is not None:
+            self._reschedule(word, next_repeat)
+            self._notify_due([user_id])
+
+    async def update_word_after_check(
+        self,
+        user_id: int,
+        word_id: int,
+        next_repeat: datetime,
+        personal_difficulty: float,
+        stability: float,
+        ml_score: float,
+        repeat_count: int,
+        review: dict | None = None,
+    ):
+        word = self._find_word(user_id, word_id)
+        if word is None:
+            return
+
+        word.personal_difficulty = personal_difficulty
+        word.stability = stability
+        word.ml_score = ml_score
+        word.repeat_count = repeat_count
+        self._reschedule(word, next_repeat)
+        self._notify_due([user_id])
+
+        if review is not None:
+            self._review_log.append(
+                {
+                    "review_id": next(self._review_ids),
+                    "word_id": word_id,
+                    "user_id": user_id,
+                    "ts": review.get("timestamp") or datetime.now(timezone.utc),
+                    "rating": review["rating"],
+                    "is_correct": review["is_correct"],
+                    "interval_days": review.get("interval_days"),
+                    "ml_score": review.get("ml_score"),
+                }
+            )
+
+    async def update_words_bulk(self, updates: list[WordUpdate], chunk_size: int = 0) -> int:
+        updated = 0
+        rescheduled = set()
+        for item in updates:
+            word = self._find_word(item.user_id, item.word_id)
+            if word is None:
+                continue
+            for name in WordUpdate._fields[3:]:
+                value = getattr(item, name)
+                if value is not None:
+                    setattr(word, name, value)
+            if item.next_repeat is not None:
+                self._reschedule(word, item.next_repeat)
+                rescheduled.add(item.user_id)
+            updated += 1
+        self._notify_due(sorted(rescheduled))
+        return updated
+
+    # OUTBOX
+
+    async def schedule_reminders(
+        self,
+        updates: list[WordUpdate],
+        messages: list[dict],
+        remind_after: dict[int, datetime] | None = None,
+    ) -> int:
+        # remind_after до переноса слов: next_send_at от него зависит
+        for user_id, moment in (remind_after or {}).items():
+            if user_id in self._users:
+                self._users[user_id]["remind_after"] = moment
+        await self.update_words_bulk(updates)
+        now = datetime.now(timezone.utc)
+        inserted = 0
+        for message in messages:
+            if message["idempotency_key"] in self._outbox_keys:
+                continue
+            self._outbox_keys.add(message["idempotency_key"])
+            message_id = next(self._message_ids)
+            self._outbox[message_id] = {
+                "message_id": message_id,
+                "word_id": None,
+                "payload": {},
+                "status": "pending",
+                "attempts": 0,
+                "last_error": None,
+                "created_at": now,
+                "sent_at": None,
+                **copy.deepcopy(message),
+            }
+            inserted += 1
+        return inserted
+
+    async def claim_outbox(self, now: datetime, limit: int, lease_seconds: int):
+        ready = sorted(
+            (
+                message
+                for message in self._outbox.values()
+                if message["status"] == "pending" and message["next_attempt_at"] <= now
+            ),
+            key=lambda message: message["next_attempt_at"],
+        )[:limit]
+        for message in ready:
+            message["attempts"] += 1
+            message["next_attempt_at"] = now + timedelta(seconds=lease_seconds)
+        return [SimpleNamespace(**copy.deepcopy(message)) for message in ready]
+
+    async def mark_outbox_sent(self, message_ids: list[int], sent_at: datetime):
+        for message_id in message_ids:
+            message = self._outbox[message_id]
+            message.update(status="sent", sent_at=sent_at, last_error=None)
+            user = self._users.get(message["user_id"])
+            if user is not None and message["kind"] == "word_reminder":
+                user.update(pending_word_id=message["word_id"], pending_answer=None)
+
+    async def reschedule_outbox(self, failures: list[tuple]):
+        for message_id, status, next_attempt_at, last_error in failures:
+            self._outbox[message_id].update(
+                status=status, next_attempt_at=next_attempt_at, last_error=last_error
+            )
+
+    async def outbox_stats(self) -> dict[str, int]:
+        stats: dict[str, int] = {}
+        for message in self._outbox.values():
+            stats[message["status"]] = stats.get(message["status"], 0) + 1
+        return stats
+
+    async def delete_sent_outbox(self, before: datetime) -> int:
+        sent = [
+            message_id
+            for message_id, message in self._outbox.items()
+            if message["status"] == "sent" and message["sent_at"] < before
+        ]
+        for message_id in sent:
+            self._outbox_keys.discard(self._outbox.pop(message_id)["idempotency_key"])
+        return len(sent)
+
+    async def iter_reviews(
+        self, batch_size: int = STREAM_BATCH_SIZE, columns: list[str] | None = None
+    ):
+        for review in list(self._review_log):
+            row = SimpleNamespace(**review)
+            yield _project(row, columns) if columns else row
+
+    # STATS
+
+    async def log_activity(self, user_id: int, action: str, payload: dict | None = None):
+        record = {
+            "event_id": next(self._event_ids),
+            "user_id": user_id,
+            "ts": datetime.now(timezone.utc),
+            "action": action,
+            "payload": payload,
+        }
+        self._activity_events.append(record)
+        self._add_rollups(aggregate_daily([record]))
+
+    async def get_daily_activity(self, user_id: int, since):
+        return [
+            SimpleNamespace(**row)
+            for (row_user_id, day), row in sorted(self._activity_daily.items())
+            if row_user_id == user_id and day >= since
+        ]
+
+    async def rebuild_activity_rollups(self):
+        # как ON CONFLICT DO UPDATE в Postgres: дни, уже ушедшие в архив,
+        # сохраняют свои счётчики
+        for row in aggregate_daily(self._activity_events):
+            self._activity_daily[(row["user_id"], row["day"])] = row
+
+    async def migrate_activity_log(self, batch_size: int = 0):
+        return 0
+
+    async def get_user_stats(self, user_id: int):
+        stats = self._stats.get(user_id)
+        return copy.deepcopy(stats) if stats is not None else None
+
+    # ARCHIVE
+
+    async def archive_old_records(
+        self, table_name: str, before: datetime, archive_dir: str, batch_size: int = 0
+    ) -> int:
+        records = {
+            "activity_events": self._activity_events,
+            "review_log": self._review_log,
+        }[table_name]
+        before = _aware(before)
+        old = [record for record in records if _aware(record["ts"]) < before]
+        if old:
+            write_archive(archive_dir, table_name, old)
+            records[:] = [record for record in records if _aware(record["ts"]) >= before]
+        return len(old)
+
+    # helpers
+
+    def _insert_word(self, user_id: int, text: str, translation: str, next_repeat):
+        word = Word(
+            word_id=self._next_word_id,
+            user_id=user_id,
+            text=text,
+            translation=translation,
+            created_at=datetime.now(timezone.utc),
+            history=[],
+        )
+        self._next_word_id += 1
+        self._words[word.id] = word
+        self._words_by_user.setdefault(user_id, {})[word.id] = word
+        self._reschedule(word, next_repeat)
+
+    def _set_window(self, row: dict):
+        row["notify_minute"] = notify_minute(row["settings"])
+        row["motivation_minute"] = motivation_minute(
+            row["notify_minute"], row["user_id"]
+        )
+
+    def _first_word(self, user_id: int) -> Word | None:
+        heap = self._user_due.get(user_id)
+        user_words = self._words_by_user.get(user_id, {})
+        while heap:
+            next_repeat, word_id = heap[0]
+            word = user_words.get(word_id)
+            if word is not None and word.next_repeat == next_repeat:
+                return word
+            heapq.heappop(heap)  # запись устарела
+        return None
+
+    def _earliest_send(self, user_id: int, moment: datetime) -> datetime:
+        if self.window_minutes is None:
+            return moment
+        user = self._users.get(user_id, {})
+        return earliest_send(
+            moment,
+            user.get("notify_minute"),
+            self.window_minutes,
+            (user.get("settings") or {}).get("reminders_per_day") or 1,
+            jitter(user_id),
+        )
+
+    def _refresh_send(self, user_ids, now: datetime | None = None) -> list:
+        # next_send_at: срок слова и remind_after, сдвинутые внутрь окна
+        rows = []
+        for user_id in user_ids:
+            word = self._first_word(user_id)
+            next_send = None
+            if word is not None:
+                remind_after = self._users.get(user_id, {}).get("remind_after")
+                moments = [word.next_repeat, remind_after, now]
+                next_send = self._earliest_send(
+                    user_id, max(moment for moment in moments if moment is not None)
+                )
+            if next_send is None:
+                self._next_send.pop(user_id, None)
+            elif self._next_send.get(user_id) != next_send:
+                self._next_send[user_id] = next_send
+                heapq.heappush(self._send_heap, (next_send, user_id))
+            rows.append(SimpleNamespace(user_id=user_id, next_send_at=next_send))
+
+        # устаревших записей стало больше, чем живых — пересобираем кучу
+        if len(self._send_heap) > 2 * len(self._next_send) + 64:
+            self._send_heap = [
+                (next_send, user_id) for user_id, next_send in self._next_send.items()
+            ]
+            heapq.heapify(self._send_heap)
+        return rows
+
+    def _notify_due(self, user_ids):
+        for row in self._refresh_send(user_ids):
+            for callback in self._due_listeners:
+                callback(row.user_id, row.next_send_at)
+
+    def _find_word(self, user_id: int, word_id: int) -> Word | None:
+        return self._words_by_user.get(user_id, {}).get(word_id)
+
+    def _reschedule(self, word: Word, next_repeat: datetime):
+        word.next_repeat = _aware(next_repeat)
+
+        user_heap = self._user_due.setdefault(word.user_id, [])
+        heapq.heappush(user_heap, (word.next_repeat, word.id))
+        user_words = self._words_by_user[word.user_id]
+        if len(user_heap) > 2 * len(user_words) + 16:
+            user_heap[:] = [
+                (item.next_repeat, item.id)
+                for item in user_words.values()
+                if item.next_repeat is not None
+            ]
+            heapq.heapify(user_heap)
+
+    def _copy_word(self, word: Word) -> Word:
+        # наружу отдаём копию: Checker меняет слово до записи в хранилище
+        result = copy.copy(word)
+        result.history = list(word.history or [])
+        return result
+
+    def _add_rollups(self, rows: list[dict]):
+        for row in rows:
+            key = (row["user_id"], row["day"])
+            bucket = self._activity_daily.setdefault(
+                key,
+                {"user_id": row["user_id"], "day": row["day"]}
+                | {name: 0 for name in ROLLUP_COUNTERS},
+            )
+            for name in ROLLUP_COUNTERS:
+                bucket[name] += row[name]
@@ -0,0 +1,146 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+OUTBOX_BATCH = 500
+# сколько секунд сообщение закреплено за диспетчером, взявшим его
+OUTBOX_LEASE_SECONDS = 120
+OUTBOX_POLL_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def reminder_key(word) -> str:
+    """
+    Ключ идемпотентности напоминания: слово и срок, по которому оно стало
+    просроченным. Повторное решение о том же сроке не создаст второе
+    сообщение.
+    """
+    return f"word_reminder:{word.id}:{word.next_repeat.isoformat()}"
+
+
+def backoff(attempts: int, base: float) -> float:
+    """Пауза перед следующей попыткой: base, 2·base, 4·base, ... до 6 часов."""
+    return min(base * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+@dataclass
+class DispatchResult:
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+
+
+class OutboxDispatcher:
+    """
+    Отправляет сообщения из outbox пачками. Неудачная отправка повторяется
+    с экспоненциальной паузой, после max_attempts сообщение получает статус
+    dead и больше не отправляется.
+
+    Доставка «хотя бы один раз»: если процесс упал после отправки, но до
+    отметки sent, сообщение уйдёт повторно после аренды.
+    """
+
+    def __init__(
+        self,
+        db,
+        notifier,
+        fan_out,
+        max_attempts: int,
+        backoff_seconds: float,
+        batch_size: int = OUTBOX_BATCH,
+        clock=_utcnow,
+    ):
+        self.db = db
+        self.notifier = notifier
+        self.fan_out = fan_out  # (items, worker, name) -> FanOutResult
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.batch_size = batch_size
+        self.clock = clock
+        # планировщик будит диспетчер сразу после записи новых сообщений
+        self.wakeup = asyncio.Event()
+
+    async def dispatch(self) -> DispatchResult:
+        """
+        Отправляет все готовые сообщения, пачку за пачкой. Время берётся
+        заново для каждой пачки: иначе аренда поздних пачек истекала бы ещё
+        до отправки, и их забирал бы диспетчер другого узла.
+        """
+        total = DispatchResult()
+        while True:
+            messages = await self.db.claim_outbox(
+                self.clock(), self.batch_size, OUTBOX_LEASE_SECONDS
+            )
+            if not messages:
+                break
+            result = await self._send_batch(messages)
+            total.sent += result.sent
+            total.retried += result.retried
+            total.dead += result.dead
+            if len(messages) < self.batch_size:
+                break
+        return total
+
+    async def _send_batch(self, messages) -> DispatchResult:
+        word_ids = [m.word_id for m in messages if m.word_id is not None]
+        words = {word.id: word for word in await self.db.get_words(word_ids)}
+        sent = []
+        failures = []
+
+        async def deliver(message):
+            word = words.get(message.word_id)
+            if word is None:
+                # слово удалили, пока сообщение ждало отправки
+                failures.append(
+                    (message.message_id, "dead", self.clock(), "word deleted")
+                )
+                return
+            try:
+                await self.notifier.send_word_reminder(word.user_id, word.text)
+            except Exception as e:
+                # пауза отсчитывается от момента ошибки, а не от начала прохода
+                failures.append(self._failure(message, self.clock(), e))
+                raise
+            # ожидание ответа запишет mark_outbox_sent вместе с отметкой sent
+            sent.append(message.message_id)
+
+        await self.fan_out(messages, deliver, "outbox")
+        await self.db.mark_outbox_sent(sent, self.clock())
+        await self.db.reschedule_outbox(failures)
+
+        dead = sum(1 for failure in failures if failure[1] == "dead")
+        return DispatchResult(
+            sent=len(sent), retried=len(failures) - dead, dead=dead
+        )
+
+    def _failure(self, message, now: datetime, error: Exception) -> tuple:
+        if message.attempts >= self.max_attempts:
+            return (message.message_id, "dead", now, str(error))
+        retry_at = now + timedelta(seconds=backoff(message.attempts, self.backoff_seconds))
+        return (message.message_id, "pending", retry_at, str(error))
+
+    async def run(self):
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass  # пора повторить отложенные сообщения
+                self.wakeup.clear()
+
+                result = await self.dispatch()
+                if result.retried or result.dead:
+                    print(
+                        f"Outbox: отправлено {result.sent}, "
+                        f"отложено {result.retried}, dead {result.dead}"
+                    )
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Ошибка в outbox: {e}")
+                await asyncio.sleep(OUTBOX_POLL_SECONDS)
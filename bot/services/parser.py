@@ -11,13 +11,38 @@ def parse_add_command(text: str) -> tuple[str, str]:
             "❌ Неверный формат.\n" "Используйте:\n" "`/add слово:перевод`"
         )
 
-    word, translation = map(str.strip, payload.split(":", 1))
+    word, translation = payload.split(":", 1)
+    return parse_word_pair(word, translation)
+
+
+def parse_word_pair(word: str, translation: str) -> tuple[str, str]:
+    word, translation = word.strip(), translation.strip()
 
     if not word or not translation:
         raise ParseError("❌ Слово и перевод не могут быть пустыми")
     return word.lower(), translation.lower()
 
 
+IMPORT_DELIMITERS = ("\t", ";", ",", ":")
+
+
+def detect_import_delimiter(line: str) -> str:
+    """Разделитель файла импорта определяем по первой строке."""
+    for delimiter in IMPORT_DELIMITERS:
+        if delimiter in line:
+            return delimiter
+    raise ParseError(
+        "❌ Не удалось определить разделитель.\n"
+        "Используйте строки вида `слово;перевод` или `слово<TAB>перевод`"
+    )
+
+
+def parse_import_row(row: list[str]) -> tuple[str, str]:
+    if len(row) < 2:
+        raise ParseError("❌ В строке должны быть слово и перевод")
+    return parse_word_pair(row[0], row[1])
+
+
 def parse_settings_command(text: str) -> int | None:
     parts = text.strip().split()
 
@@ -1,17 +1,68 @@
 import asyncio
+import os
+import socket
 from datetime import datetime, timezone, timedelta
-from bot.commands.review import user_pending_word
+from bot.infrastructure.config import Settings, get_settings
+from bot.models.word import WordUpdate
+from bot.services.broadcast import Broadcast
+from bot.services.delivery_window import (
+    MINUTES_PER_DAY,
+    jitter,
+    minute_of_day,
+    next_slot,
+)
+from bot.services.due_queue import DueQueue
+from bot.services.fanout import RateLimiter, fan_out
+from bot.services.outbox import OutboxDispatcher, reminder_key
+
+DUE_WORDS_BATCH = 1000
+RETRY_DELAY = 60
+FINISHED_JOBS_TTL_DAYS = 7
+
+
+def _seconds_until(hour: int, minute: int = 0) -> float:
+    now = datetime.now(timezone.utc)
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
 
 
 class Scheduler:
-    def __init__(self, db, notifier):
+    def __init__(self, db, notifier, settings: Settings | None = None):
         self.db = db
         self.notifier = notifier
+        self.settings = settings or get_settings()
         self.tasks = []
 
+        self.window_minutes = self.settings.delivery_window_hours * 60
+        # в режиме lease несколько узлов делят работу через аренды в базе
+        self.lease_mode = self.settings.scheduler_mode == "lease"
+        self.node_id = self.settings.node_id or f"{socket.gethostname()}:{os.getpid()}"
+
+        # моменты следующих напоминаний пользователей (users.next_send_at);
+        # база сообщает об изменениях сама
+        self.due_queue = DueQueue()
+        db.add_due_listener(self.due_queue.schedule)
+
+        # один лимит на все рассылки узла: outbox и мотивация идут
+        # одновременно, а SEND_RATE_PER_SECOND — общий предел Telegram
+        rate = self.settings.send_rate_per_second
+        self.send_limiter = RateLimiter(rate) if rate else None
+
+        self.outbox = OutboxDispatcher(
+            db,
+            notifier,
+            self.fan_out,
+            max_attempts=self.settings.outbox_max_attempts,
+            backoff_seconds=self.settings.outbox_backoff_seconds,
+        )
+
     def start(self):
         self.tasks.append(asyncio.create_task(self.revise_words_task()))
+        self.tasks.append(asyncio.create_task(self.outbox.run()))
         self.tasks.append(asyncio.create_task(self.daily_motivation_task()))
+        self.tasks.append(asyncio.create_task(self.archive_task()))
 
     async def stop(self):
         for task in self.tasks:
@@ -23,66 +74,252 @@ class Scheduler:
             except asyncio.CancelledError:
                 pass
 
-    async def revise_words_task(self):
-        DEFAULT_INTERVAL = 86400  # 24 часа
+    async def load_due_queue(self):
+        """Загружает моменты напоминаний всех пользователей потоково, порциями."""
+        async for row in self.db.iter_due_users():
+            self.due_queue.schedule(row.user_id, row.next_send_at)
 
+    async def send_due_reminders(self, now: datetime):
+        # одно слово на пользователя за проход; после обновления next_repeat
+        # слово уходит из выборки, поэтому берём следующую пачку, пока она
+        # заполнена целиком
+        while True:
+            if self.lease_mode:
+                due_words = await self.db.claim_due_words(
+                    now, self.node_id, self.settings.lease_seconds, DUE_WORDS_BATCH
+                )
+            else:
+                due_words = await self.db.get_due_words(now, DUE_WORDS_BATCH)
+            rescheduled = []
+            messages = []
+            not_before = {}
+            for word, reminders_per_day, opens_at in due_words:
+                # окно уведомлений делится на reminders_per_day слотов, и в
+                # каждом пользователь получает напоминание со своим сдвигом:
+                # пользователи с одинаковым notification_time не шлются
+                # одной пачкой, и общий поток отправок остаётся ровным
+                next_repeat = next_slot(
+                    now,
+                    opens_at,
+                    self.window_minutes,
+                    reminders_per_day,
+                    jitter(word.user_id),
+                )
+                rescheduled.append(
+                    WordUpdate(
+                        word_id=word.id, user_id=word.user_id, next_repeat=next_repeat
+                    )
+                )
+                messages.append(
+                    {
+                        "idempotency_key": reminder_key(word),
+                        "kind": "word_reminder",
+                        "user_id": word.user_id,
+                        "word_id": word.id,
+                        "payload": {"text": word.text},
+                        "next_attempt_at": now,
+                    }
+                )
+                not_before[word.user_id] = next_repeat
+
+            # решение о напоминании и само сообщение пишутся одной
+            # транзакцией; отправляет и повторяет при ошибках диспетчер
+            # outbox. Вместе с ними сохраняется remind_after: следующее
+            # напоминание не раньше следующего слота, даже если у
+            # пользователя есть другие просроченные слова и проход запустил
+            # кто-то другой. Новый next_send_at учитывает его, и очередь
+            # получает его через add_due_listener
+            await self.db.schedule_reminders(rescheduled, messages, not_before)
+            if messages:
+                self.outbox.wakeup.set()
+
+            if len(due_words) < DUE_WORDS_BATCH:
+                break
+
+        # в очереди остались пользователи, чьё время отправки прошло вне
+        # окна (узел не работал), взятые другим узлом, или сроки, которых
+        # база уже не подтверждает: база переносит их не раньше now
+        stale = self.due_queue.pop_due(now)
+        if stale:
+            for row in await self.db.refresh_next_send(stale, now):
+                send_at = row.next_send_at
+                if send_at is not None and send_at <= now:
+                    send_at = now + timedelta(seconds=RETRY_DELAY)
+                self.due_queue.schedule(row.user_id, send_at)
+
+    async def revise_words_task(self):
+        loaded = False
         while True:
             try:
-                users = await self.db.get_all_users()
-                now = datetime.now(timezone.utc)
+                # загрузка очереди повторяется после ошибки, как и проходы
+                if not loaded:
+                    await self.load_due_queue()
+                    loaded = True
 
-                for user in users:
-                    settings = user.settings or {}
-                    reminders_per_day = max(settings.get("reminders_per_day", 1), 1)
-                    interval = DEFAULT_INTERVAL // reminders_per_day
-
-                    words = await self.db.get_user_words(user.user_id)
-                    for word in words:
-                        next_repeat = word.next_repeat
-                        if next_repeat and next_repeat.tzinfo is None:
-                            next_repeat = next_repeat.replace(tzinfo=timezone.utc)
-
-                        if next_repeat and next_repeat <= now:
-                            await self.notifier.send_word_reminder(
-                                user.user_id, word.text
-                            )
-                            await self.db.update_word_next_repeat(
-                                user.user_id,
-                                word.id,
-                                now + timedelta(seconds=interval),
-                            )
-                            user_pending_word[user.user_id] = {
-                                "stage": "answer",
-                                "word": word,
-                            }
-                            break  # одно слово за проход
-
-                await asyncio.sleep(DEFAULT_INTERVAL)
+                # спим ровно до ближайшего срока; новое слово или ответ с
+                # более ранним сроком будят задачу раньше. В режиме lease
+                # изменения других узлов сюда не приходят, поэтому база
+                # дополнительно опрашивается раз в lease_poll_seconds
+                if self.lease_mode:
+                    try:
+                        await asyncio.wait_for(
+                            self.due_queue.wait(), self.settings.lease_poll_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await self.due_queue.wait()
+                await self.send_due_reminders(datetime.now(timezone.utc))
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"Ошибка в revise_words_task: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def fan_out(self, items, worker, name: str):
+        """Отправки параллельно в пределах SEND_CONCURRENCY и SEND_RATE_PER_SECOND."""
+        return await fan_out(
+            items,
+            worker,
+            concurrency=self.settings.send_concurrency,
+            name=name,
+            limiter=self.send_limiter,
+        )
+
+    async def claim_job(self, name: str) -> bool:
+        """Разовая задача выполняется одним узлом; в режиме local — всегда этим."""
+        if not self.lease_mode:
+            return True
+        return await self.db.claim_job(name, self.node_id, self.settings.lease_seconds)
+
+    async def finish_job(self, name: str):
+        if self.lease_mode:
+            await self.db.finish_job(name, self.node_id)
+
+    async def send_motivation_bucket(self, minute: int, day=None):
+        """
+        Мотивация пользователям, у которых окно открывается в эту минуту UTC.
+        Рассылка идёт с контрольными точками: после перезапуска она
+        продолжается с места остановки, а уже получившим не повторяется.
+        """
+        day = day or datetime.now(timezone.utc).date()
+
+        async def motivate(user_id):
+            await self.notifier.send_motivation(user_id)
+
+        async def fetch_batch(after_user_id, limit):
+            return await self.db.get_notify_bucket_batch(minute, after_user_id, limit)
+
+        async def count():
+            return await self.db.count_notify_bucket(minute)
+
+        broadcast = Broadcast(
+            self.db,
+            f"motivation:{day}:{minute}",
+            fetch_batch,
+            count,
+            motivate,
+            self.fan_out,
+            owner=self.node_id,
+            # в режиме local узел один: после перезапуска продолжаем сразу,
+            # не дожидаясь истечения аренды прежнего процесса
+            lease_seconds=self.settings.lease_seconds if self.lease_mode else 0,
+        )
+        return await broadcast.run()
+
+    async def resume_broadcasts(self):
+        """
+        Дослать мотивацию за сегодня, прерванную падением или перезапуском.
+        Берутся рассылки с истекшей арендой: живой узел продлевает её после
+        каждой порции, поэтому чужие текущие рассылки не перехватываются.
+        """
+        now = datetime.now(timezone.utc)
+        today = now.date()
+        for name in await self.db.get_unfinished_broadcasts(
+            f"motivation:{today}:", expired_before=now
+        ):
+            await self.send_motivation_bucket(int(name.rsplit(":", 1)[1]), today)
 
     async def daily_motivation_task(self):
-        daily_hour = 12
-        daily_minute = 0
+        # пользователи разложены по минутным корзинам (users.motivation_minute
+        # — в пределах часа после открытия окна): каждую минуту обходим
+        # только свою корзину, и отправка распределена по суткам
+        last_minute = minute_of_day(datetime.now(timezone.utc))
+        try:
+            await self.resume_broadcasts()
+        except Exception as e:
+            print(f"Ошибка в daily_motivation_task: {e}")
         while True:
-            now = datetime.now(timezone.utc)
-            next_run = datetime(
-                year=now.year,
-                month=now.month,
-                day=now.day,
-                hour=daily_hour,
-                minute=daily_minute,
-                tzinfo=timezone.utc,
+            try:
+                now = datetime.now(timezone.utc)
+                await asyncio.sleep(60 - now.second - now.microsecond / 1_000_000)
+
+                current = minute_of_day(datetime.now(timezone.utc))
+                # если проход занял больше минуты, догоняем пропущенные корзины
+                while last_minute != current:
+                    last_minute = (last_minute + 1) % MINUTES_PER_DAY
+                    await self.send_motivation_bucket(last_minute)
+                # корзину, брошенную упавшим узлом, остальные узлы уже
+                # прошли: подбираем её после истечения аренды
+                await self.resume_broadcasts()
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Ошибка в daily_motivation_task: {e}")
+
+    async def archive_old_records(self) -> dict[str, int]:
+        """
+        Переносит в архив события и ответы старше сроков хранения из
+        настроек. Дневные счётчики для /stats остаются в базе.
+        """
+        now = datetime.now(timezone.utc)
+        retention = {
+            "activity_events": self.settings.activity_retention_days,
+            "review_log": self.settings.review_retention_days,
+        }
+        archived = {}
+        for table_name, days in retention.items():
+            archived[table_name] = await self.db.archive_old_records(
+                table_name, now - timedelta(days=days), self.settings.archive_dir
             )
-            if next_run <= now:
-                next_run += timedelta(days=1)
-            wait_seconds = (next_run - now).total_seconds()
-            await asyncio.sleep(wait_seconds)
-
-            users = await self.db.get_all_users()
-            for user in users:
-                await self.notifier.send_motivation(user["user_id"])
+        return archived
+
+    async def nightly_jobs(self):
+        """Ночное обслуживание; при нескольких узлах его выполняет один."""
+        job = f"archive:{datetime.now(timezone.utc).date()}"
+        # если взявший задачу узел упал до finish_job, после истечения его
+        # аренды задачу забирает другой
+        while not await self.claim_job(job):
+            if await self.db.is_job_done(job):
+                return
+            await asyncio.sleep(self.settings.lease_seconds)
+
+        # секции activity_events создаются на месяцы вперёд; без этого
+        # процесс, работающий дольше ACTIVITY_PARTITIONS_AHEAD месяцев,
+        # писал бы события в default-секцию
+        await self.db.ensure_activity_partitions()
+        # окна пользователей в зонах с летним временем сдвигаются по UTC
+        refreshed = await self.db.refresh_notify_minutes()
+        print(f"Пересчитано окон уведомлений: {refreshed}")
+        archived = await self.archive_old_records()
+        print(f"Перенесено в архив: {archived}")
+        await self.finish_job(job)
+        # завершённые рассылки и отправленные сообщения outbox
+        # хранятся в обоих режимах
+        expired = datetime.now(timezone.utc) - timedelta(days=FINISHED_JOBS_TTL_DAYS)
+        await self.db.delete_finished_jobs(expired)
+        await self.db.delete_sent_outbox(expired)
+        print(f"Outbox: {await self.db.outbox_stats()}")
+
+    async def archive_task(self):
+        archive_hour = 3  # ночью, когда нагрузка на базу минимальна
+        while True:
+            try:
+                await asyncio.sleep(_seconds_until(archive_hour))
+                await self.nightly_jobs()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                print(f"Ошибка в archive_task: {e}")
@@ -0,0 +1,21 @@
+from bot.infrastructure.config import get_settings
+
+
+def create_database(backend: str | None = None):
+    """
+    Создаёт хранилище по имени бэкенда (по умолчанию STORAGE_BACKEND).
+    Модули импортируются лениво, чтобы для memory не требовались настройки
+    и драйвер Postgres.
+    """
+    settings = get_settings()
+    backend = backend or settings.storage_backend
+
+    if backend == "postgres":
+        from bot.services.database import Database
+
+        return Database(settings)
+    if backend == "memory":
+        from bot.services.memory_database import InMemoryDatabase
+
+        return InMemoryDatabase(settings.delivery_window_hours * 60)
+    raise ValueError(f"Неизвестный STORAGE_BACKEND: {backend}")
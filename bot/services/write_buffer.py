@@ -0,0 +1,89 @@
+import asyncio
+from typing import Awaitable, Callable
+
+_STOP = object()
+
+
+class WriteBuffer:
+    """
+    Буфер отложенной записи: копит записи в ограниченной очереди и сбрасывает
+    их пачкой, когда набралось batch_size записей или прошло flush_interval
+    секунд с первой записи в пачке. Если очередь заполнена, put ждёт
+    (backpressure), пока фоновая задача не разгрузит её.
+
+    Неудачная запись пачки повторяется до retries раз с паузой retry_delay,
+    2·retry_delay, ...; пока идут повторы, новые записи копятся в очереди.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list], Awaitable[None]],
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        max_size: int = 10000,
+        retries: int = 5,
+        retry_delay: float = 0.5,
+    ):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, record):
+        await self._queue.put(record)
+
+    async def close(self):
+        """Сбрасывает всё, что осталось в очереди, и останавливает задачу."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            record = await self._queue.get()
+            if record is _STOP:
+                break
+
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        record = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    record = self._queue.get_nowait()
+
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            await self._flush_batch(batch)
+
+    async def _flush_batch(self, batch: list):
+        for attempt in range(self.retries + 1):
+            try:
+                await self.flush(batch)
+                return
+            except Exception as e:
+                print(f"Ошибка при записи пачки из {len(batch)} записей: {e}")
+            if attempt < self.retries:
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+        print(f"Пачка из {len(batch)} записей потеряна после {self.retries} повторов")
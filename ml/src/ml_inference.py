@@ -1,6 +1,4 @@
 import os
-import numpy as np
-import joblib
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
@@ -16,12 +14,20 @@ FEATURE_COLS = [
 
 _interval_model = None
 _score_model = None
+_models_loaded = False
 
 
 def _load_models():
-    global _interval_model, _score_model
+    """
+    Загружает модели при первом предсказании, а не при импорте: numpy и
+    joblib нужны только тогда, когда модель действительно используется.
+    """
+    global _interval_model, _score_model, _models_loaded
 
+    _models_loaded = True
     try:
+        import joblib
+
         interval_path = os.path.join(MODELS_DIR, "interval_model.joblib")
         score_path = os.path.join(MODELS_DIR, "ml_score_model.joblib")
 
@@ -37,15 +43,15 @@ def _load_models():
         print(f"Причина: {e}")
 
 
-_load_models()
-
-
 def predict_interval_and_score(features: dict) -> tuple[float, float]:
     """
     Возвращает (interval_days, ml_score)
 
     Если ML недоступен → fallback значения
     """
+    if not _models_loaded:
+        _load_models()
+
     if _interval_model is None or _score_model is None:
         difficulty = features.get("difficulty", 0.5)
         repeat_count = features.get("repeat_count", 1)
@@ -55,6 +61,8 @@ def predict_interval_and_score(features: dict) -> tuple[float, float]:
 
         return float(interval_days), float(ml_score)
 
+    import numpy as np
+
     x = np.array([[features[col] for col in FEATURE_COLS]], dtype=float)
 
     interval = float(_interval_model.predict(x)[0])
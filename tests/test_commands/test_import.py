@@ -0,0 +1,133 @@
+import io
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bot.commands.import_words import ImportStates, bot_import, bot_import_file
+
+
+def _make_message(content: bytes, file_size: int | None = None):
+    message = MagicMock()
+    message.from_user = MagicMock(id=123)
+    message.answer = AsyncMock()
+    message.document = MagicMock(file_name="words.csv", file_size=file_size or len(content))
+
+    mock_db = AsyncMock()
+    mock_db.import_words = AsyncMock(side_effect=lambda user_id, pairs, next_repeat: len(pairs))
+
+    mock_bot = MagicMock()
+    mock_bot.db = mock_db
+    mock_bot.download = AsyncMock(return_value=io.BytesIO(content))
+    message.bot = mock_bot
+    return message, mock_db
+
+
+def _last_answer(message):
+    call_args = message.answer.call_args
+    return call_args.args[0] if call_args.args else call_args.kwargs.get('text', '')
+
+
+@pytest.mark.asyncio
+async def test_import_instructions():
+    """Тест подсказки по формату файла"""
+    message = MagicMock()
+    message.answer = AsyncMock()
+    state = AsyncMock()
+
+    await bot_import(message, state)
+
+    state.set_state.assert_called_once_with(ImportStates.waiting_for_file)
+    answer_text = _last_answer(message)
+    assert "Импорт словаря" in answer_text
+    assert "`слово;перевод`" in answer_text
+
+
+@pytest.mark.asyncio
+async def test_import_file_success():
+    """Тест импорта файла с пропуском некорректных строк"""
+    content = "Apple;Яблоко\nbad line\n\ncat; кот\n;пусто\n".encode("utf-8")
+    message, mock_db = _make_message(content)
+
+    state = AsyncMock()
+    await bot_import_file(message, state)
+
+    state.clear.assert_called_once()
+    mock_db.import_words.assert_called_once()
+    call_args = mock_db.import_words.call_args
+    assert call_args.args[0] == 123
+    assert call_args.args[1] == [("apple", "яблоко"), ("cat", "кот")]
+
+    mock_db.log_activity.assert_called_once_with(
+        123, "import_words", {"count": 2, "skipped": 2}
+    )
+
+    answer_text = _last_answer(message)
+    assert "✅ *Импорт завершён!*" in answer_text
+    assert "Добавлено слов: 2" in answer_text
+    assert "Пропущено строк: 2" in answer_text
+
+
+@pytest.mark.asyncio
+async def test_import_file_in_chunks():
+    """Тест загрузки большого файла несколькими пачками с одной датой повторения"""
+    content = "".join(f"word{i}\tперевод{i}\n" for i in range(5)).encode("utf-8")
+    message, mock_db = _make_message(content)
+
+    with patch('bot.commands.import_words.IMPORT_CHUNK_SIZE', 2):
+        await bot_import_file(message, AsyncMock())
+
+    assert mock_db.import_words.call_count == 3
+    next_repeats = {call.args[2] for call in mock_db.import_words.call_args_list}
+    assert len(next_repeats) == 1
+    mock_db.log_activity.assert_called_once_with(
+        123, "import_words", {"count": 5, "skipped": 0}
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_unknown_delimiter():
+    """Тест файла без разделителя"""
+    message, mock_db = _make_message("just words\n".encode("utf-8"))
+
+    await bot_import_file(message, AsyncMock())
+
+    mock_db.import_words.assert_not_called()
+    assert "Не удалось определить разделитель" in _last_answer(message)
+
+
+@pytest.mark.asyncio
+async def test_import_file_too_large():
+    """Тест слишком большого файла"""
+    message, mock_db = _make_message(b"a;b\n", file_size=50 * 1024 * 1024)
+
+    await bot_import_file(message, AsyncMock())
+
+    message.bot.download.assert_not_called()
+    assert "Файл слишком большой" in _last_answer(message)
+
+
+@pytest.mark.asyncio
+async def test_import_database_error():
+    """Тест обработки ошибок базы данных"""
+    message, mock_db = _make_message("apple;яблоко\n".encode("utf-8"))
+    mock_db.import_words = AsyncMock(side_effect=Exception("Database connection failed"))
+
+    await bot_import_file(message, AsyncMock())
+
+    assert "Ошибка подключения к базе данных" in _last_answer(message)
+
+
+@pytest.mark.asyncio
+async def test_import_failure_logs_imported_part():
+    """Тест, что при ошибке посреди импорта в событие попадают уже загруженные слова"""
+    content = "".join(f"word{i};перевод{i}\n" for i in range(5)).encode("utf-8")
+    message, mock_db = _make_message(content)
+    mock_db.import_words = AsyncMock(side_effect=[2, Exception("Database connection failed")])
+
+    with patch('bot.commands.import_words.IMPORT_CHUNK_SIZE', 2):
+        await bot_import_file(message, AsyncMock())
+
+    assert "Ошибка подключения к базе данных" in _last_answer(message)
+    mock_db.log_activity.assert_called_once_with(
+        123, "import_words", {"count": 2, "skipped": 0}
+    )
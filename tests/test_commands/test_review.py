@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bot.commands.review import review_flow
+from bot.services.fanout import fan_out
+from bot.services.memory_database import InMemoryDatabase
+from bot.services.outbox import OutboxDispatcher, reminder_key
+
+
+def _message(text: str, db) -> AsyncMock:
+    message = AsyncMock()
+    message.text = text
+    message.from_user = MagicMock(id=123)
+    message.bot = MagicMock(db=db)
+    return message
+
+
+async def _send_reminder(db):
+    now = datetime.now(timezone.utc)
+    await db.add_user(123, "test")
+    await db.import_words(123, [("apple", "яблоко")], now)
+    word = (await db.get_user_words(123))[0]
+    await db.schedule_reminders(
+        [],
+        [
+            {
+                "idempotency_key": reminder_key(word),
+                "kind": "word_reminder",
+                "user_id": 123,
+                "word_id": word.id,
+                "next_attempt_at": now,
+            }
+        ],
+    )
+
+    async def _fan_out(items, worker, name):
+        return await fan_out(items, worker, concurrency=1, name=name)
+
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+    dispatcher = OutboxDispatcher(db, notifier, _fan_out, max_attempts=3, backoff_seconds=10)
+    await dispatcher.dispatch()
+    return word
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("reply, is_correct, rating", [("нет", False, 1), ("да", True, 4)])
+async def test_review_log_gets_user_answer(reply, is_correct, rating):
+    """Тест, что в review_log попадает ответ пользователя из шага подтверждения"""
+    db = InMemoryDatabase()
+    word = await _send_reminder(db)
+
+    with patch(
+        "bot.models.checker.predict_interval_and_score", return_value=(3.0, 0.7)
+    ):
+        await review_flow(_message("груша", db))
+        assert db._review_log == []
+        assert (await db.get_pending_word(123))[1] == "груша"
+
+        await review_flow(_message(reply, db))
+
+    [review] = db._review_log
+    assert review["word_id"] == word.id
+    assert review["is_correct"] is is_correct
+    assert review["rating"] == rating
+    assert review["interval_days"] == 3.0
+    assert await db.get_pending_word(123) is None
+
+
+@pytest.mark.asyncio
+async def test_review_ignores_messages_without_reminder():
+    """Тест, что без отправленного напоминания сообщения не считаются ответом"""
+    db = InMemoryDatabase()
+    await db.add_user(123, "test")
+    message = _message("яблоко", db)
+
+    await review_flow(message)
+
+    message.answer.assert_not_called()
+    assert db._review_log == []
@@ -20,8 +20,7 @@ async def test_start_success_with_new_user():
     message.answer = AsyncMock()
 
     mock_db = AsyncMock()
-    mock_db.get_user = AsyncMock(return_value=None)
-    mock_db.add_user = AsyncMock()
+    mock_db.add_user = AsyncMock(return_value=True)
 
     mock_bot = MagicMock()
     mock_bot.db = mock_db
@@ -29,10 +28,16 @@ async def test_start_success_with_new_user():
 
     await bot_start(message)
 
-    mock_db.get_user.assert_called_once_with(123)
+    mock_db.get_user.assert_not_called()
     mock_db.add_user.assert_called_once_with(
         user_id=123,
-        username="test_user"
+        username="test_user",
+        settings={
+            "notification_time": "10:00",
+            "reminders_per_day": 1,
+            "timezone": "UTC",
+            "language": "рус",
+        },
     )
 
     message.answer.assert_called_once()
@@ -71,17 +76,7 @@ async def test_start_success_with_existing_user():
     message.answer = AsyncMock()
 
     mock_db = AsyncMock()
-    get_user_mock = AsyncMock()
-    get_user_mock.return_value = {
-        "user_id": 123,
-        "username": "test_user",
-        "settings": {
-            "notification_time": "09:00",
-        }
-    }
-
-    mock_db.get_user = get_user_mock
-    mock_db.add_user = AsyncMock()
+    mock_db.add_user = AsyncMock(return_value=False)
 
     mock_bot = MagicMock()
     mock_bot.db = mock_db
@@ -89,8 +84,8 @@ async def test_start_success_with_existing_user():
 
     await bot_start(message)
 
-    mock_db.get_user.assert_called_once_with(123)
-    mock_db.add_user.assert_not_called()
+    mock_db.get_user.assert_not_called()
+    mock_db.add_user.assert_called_once()
     message.answer.assert_called_once()
 
     call_args = message.answer.call_args
@@ -120,7 +115,7 @@ async def test_start_database_error():
     message.reply = AsyncMock()
 
     mock_db = AsyncMock()
-    mock_db.get_user = AsyncMock(side_effect=Exception("Database connection failed"))
+    mock_db.add_user = AsyncMock(side_effect=Exception("Database connection failed"))
 
     message.bot = {"db": mock_db}
 
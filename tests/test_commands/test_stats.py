@@ -1,13 +1,5 @@
-import os
-
-os.environ['DB_PORT'] = '5432'
-os.environ['DB_USER'] = 'test_user'
-os.environ['DB_PASSWORD'] = 'test_password'
-os.environ['DB_NAME'] = 'test_db'
-os.environ['DB_HOST'] = 'localhost'
-
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 from datetime import datetime, timedelta, timezone
 
 from bot.commands.stats import bot_stats
@@ -24,37 +16,26 @@ async def test_stats_success():
     mock_user = MagicMock()
     mock_user.user_id = 123
 
-    mock_stats = MagicMock()
-    now = datetime.now(timezone.utc)
-    mock_stats.activity_log = [
-        {"action": "add_word:hello", "timestamp": (now - timedelta(days=3)).isoformat()},
-        {"action": "add_word:world", "timestamp": (now - timedelta(days=10)).isoformat()},
-    ]
-
     mock_stats_data = MagicMock()
     mock_stats_data.learned_words = 15
     mock_stats_data.success_rate = 75.5
 
     mock_db = AsyncMock()
+    mock_db.get_user = AsyncMock(return_value=mock_user)
     mock_db.get_user_stats = AsyncMock(return_value=mock_stats_data)
+    today = datetime.now(timezone.utc).date()
+    mock_db.get_daily_activity = AsyncMock(
+        return_value=[
+            MagicMock(day=today - timedelta(days=10), adds=1),
+            MagicMock(day=today - timedelta(days=3), adds=1),
+        ]
+    )
 
     mock_bot = MagicMock()
     mock_bot.db = mock_db
     message.bot = mock_bot
 
-    with patch('bot.commands.stats.AsyncSessionLocal') as mock_session_local:
-        mock_session = AsyncMock()
-        mock_session_local.return_value.__aenter__.return_value = mock_session
-
-        mock_user_result = MagicMock()
-        mock_user_result.fetchone.return_value = mock_user
-
-        mock_stats_result = MagicMock()
-        mock_stats_result.fetchone.return_value = mock_stats
-
-        mock_session.execute.side_effect = [mock_user_result, mock_stats_result]
-
-        await bot_stats(message)
+    await bot_stats(message)
 
     message.answer.assert_called_once()
 
@@ -66,6 +47,7 @@ async def test_stats_success():
     assert "75.5% от всех" in answer_text
     assert "За последнюю неделю: *+1* слов" in answer_text
     assert "За последний месяц: *+2* слов" in answer_text
+    mock_db.get_daily_activity.assert_called_once_with(123, today - timedelta(days=30))
     assert call_args.kwargs.get("parse_mode") == "Markdown"
 
 
@@ -77,19 +59,14 @@ async def test_stats_user_not_found():
     message.text = "/stats"
     message.answer = AsyncMock()
 
+    mock_db = AsyncMock()
+    mock_db.get_user = AsyncMock(return_value=None)
+
     mock_bot = MagicMock()
-    mock_bot.db = AsyncMock()
+    mock_bot.db = mock_db
     message.bot = mock_bot
 
-    with patch('bot.commands.stats.AsyncSessionLocal') as mock_session_local:
-        mock_session = AsyncMock()
-        mock_session_local.return_value.__aenter__.return_value = mock_session
-
-        mock_result = MagicMock()
-        mock_result.fetchone.return_value = None
-        mock_session.execute.return_value = mock_result
-
-        await bot_stats(message)
+    await bot_stats(message)
 
     message.answer.assert_called_once()
 
@@ -111,23 +88,15 @@ async def test_stats_no_stats():
     mock_user = MagicMock()
     mock_user.user_id = 123
 
+    mock_db = AsyncMock()
+    mock_db.get_user = AsyncMock(return_value=mock_user)
+    mock_db.get_user_stats = AsyncMock(return_value=None)
+
     mock_bot = MagicMock()
-    mock_bot.db = AsyncMock()
+    mock_bot.db = mock_db
     message.bot = mock_bot
 
-    with patch('bot.commands.stats.AsyncSessionLocal') as mock_session_local:
-        mock_session = AsyncMock()
-        mock_session_local.return_value.__aenter__.return_value = mock_session
-
-        mock_user_result = MagicMock()
-        mock_user_result.fetchone.return_value = mock_user
-
-        mock_stats_result = MagicMock()
-        mock_stats_result.fetchone.return_value = None
-
-        mock_session.execute.side_effect = [mock_user_result, mock_stats_result]
-
-        await bot_stats(message)
+    await bot_stats(message)
 
     message.answer.assert_called_once()
 
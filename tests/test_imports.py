@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# запас на медленные CI; локально импорт занимает десятки миллисекунд
+LIGHT_IMPORT_BUDGET = 0.5
+
+COMMAND_MODULES = [
+    "bot.commands.start",
+    "bot.commands.info",
+    "bot.commands.stats",
+    "bot.commands.add",
+    "bot.commands.import_words",
+    "bot.commands.settings",
+    "bot.commands.review",
+    "bot.main",
+]
+
+
+def _import_in_clean_env(modules: list[str]) -> dict:
+    # отдельный процесс без переменных окружения: импорт не должен
+    # читать .env, требовать настройки базы или создавать движок
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    __import__(name)\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={"PATH": os.environ.get("PATH", "")},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_config_and_storage_import_fast():
+    """Тест, что конфиг и фабрика хранилища импортируются быстро и без тяжёлых зависимостей"""
+    report = _import_in_clean_env(
+        ["bot.infrastructure.config", "bot.services.storage"]
+    )
+
+    assert report["elapsed"] < LIGHT_IMPORT_BUDGET
+    for heavy in ("sqlalchemy", "asyncpg", "aiogram", "dotenv"):
+        assert heavy not in report["modules"]
+
+
+def test_command_modules_import_without_environment():
+    """Тест, что модули команд импортируются без настроек и без ML-моделей"""
+    report = _import_in_clean_env(COMMAND_MODULES)
+
+    for heavy in ("asyncpg", "dotenv", "numpy", "joblib"):
+        assert heavy not in report["modules"]
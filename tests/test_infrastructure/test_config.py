@@ -0,0 +1,44 @@
+import pytest
+
+from bot.infrastructure.config import ConfigError, Settings
+
+
+def test_settings_from_env():
+    """Тест разбора настроек из окружения"""
+    settings = Settings.from_env(
+        {
+            "DB_PORT": "6432",
+            "DB_POOL_PRE_PING": "false",
+            "DB_REPLICA_HOSTS": "replica1, replica2:5433",
+            "USER_CACHE_TTL": "2.5",
+        }
+    )
+
+    assert settings.db_port == 6432
+    assert settings.db_pool_pre_ping is False
+    assert settings.db_replica_hosts == ["replica1", "replica2:5433"]
+    assert settings.user_cache_ttl == 2.5
+    assert settings.db_pool_size == 5
+
+
+@pytest.mark.parametrize(
+    "env",
+    [
+        {"DB_PORT": "abc"},
+        {"DB_PORT": "70000"},
+        {"DB_POOL_SIZE": "0"},
+        {"STORAGE_BACKEND": "sqlite"},
+    ],
+)
+def test_settings_validation(env):
+    """Тест, что некорректные значения дают понятную ошибку"""
+    with pytest.raises(ConfigError):
+        Settings.from_env(env)
+
+
+def test_settings_require():
+    """Тест проверки обязательных параметров"""
+    with pytest.raises(ConfigError, match="DB_HOST"):
+        Settings(db_user="u", db_password="p", db_name="n").require(
+            "db_user", "db_password", "db_name", "db_host"
+        )
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from bot.models.stats import Stats
+from bot.models.user import User
+from bot.models.word import HISTORY_LIMIT, Word
+
+
+def test_record_history_returns_entry():
+    """Тест, что запись истории возвращается для сохранения в review_log"""
+    word = Word(word_id=1, user_id=123, text="apple", translation="яблоко")
+
+    entry = word.record_history(rating=4, is_correct=True)
+
+    assert entry["rating"] == 4
+    assert entry["is_correct"] is True
+    assert entry["timestamp"].tzinfo is not None
+    assert word.history == [entry]
+
+
+def test_record_history_is_bounded():
+    """Тест, что история в памяти не растёт бесконечно"""
+    word = Word(word_id=1, user_id=123, text="apple", translation="яблоко", history=[])
+
+    for i in range(HISTORY_LIMIT + 5):
+        word.record_history(rating=i, is_correct=False)
+
+    assert len(word.history) == HISTORY_LIMIT
+    assert word.history[-1]["rating"] == HISTORY_LIMIT + 4
+
+
+def test_word_from_row_is_slotted():
+    """Тест сборки слова из строки и отсутствия __dict__"""
+    row = SimpleNamespace(
+        word_id=7,
+        user_id=123,
+        text="apple",
+        translation="яблоко",
+        next_repeat=None,
+        repeat_count=2,
+        created_at=None,
+        base_difficulty=0.4,
+        personal_difficulty=0.6,
+        difficulty=0.5,
+        stability=3.0,
+        ml_score=0.7,
+        history=[],
+    )
+
+    word = Word.from_row(row)
+
+    assert word.id == word.word_id == 7
+    assert word.stability == 3.0
+    assert not hasattr(word, "__dict__")
+
+
+def test_is_due_uses_aware_time():
+    """Тест проверки срока повторения"""
+    word = Word(word_id=1, user_id=123, text="apple", translation="яблоко")
+    word.schedule_next_repeat(-1)
+
+    assert word.is_due()
+
+
+def test_user_keeps_passed_stats():
+    """Тест, что User не подменяет переданную статистику"""
+    stats = Stats(user_id=123, learned_words=5)
+
+    user = User(user_id=123, username="test", stats=stats)
+
+    assert user.stats is stats
+    assert User(user_id=123, username="test").stats.user_id == 123
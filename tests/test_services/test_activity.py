@@ -0,0 +1,33 @@
+from datetime import date, datetime, timedelta, timezone
+
+from bot.services.activity import activity_counters, aggregate_daily
+
+
+def test_activity_counters():
+    """Тест разбора событий в приращения счётчиков"""
+    assert activity_counters("add_word:apple") == {"adds": 1}
+    assert activity_counters("import_words", {"count": 42, "skipped": 3}) == {"adds": 42}
+    assert activity_counters("answered:a:b:correct") == {"reviews": 1, "correct": 1}
+    assert activity_counters("answered:apple:wrong") == {"reviews": 1, "wrong": 1}
+    assert activity_counters("reminder:apple") == {}
+    assert activity_counters("daily_motivation") == {}
+
+
+def test_aggregate_daily_groups_by_user_and_utc_day():
+    """Тест свёртки пачки событий по пользователю и дню"""
+    moscow = timezone(timedelta(hours=3))
+    records = [
+        {"user_id": 1, "ts": datetime(2026, 1, 1, 10, tzinfo=timezone.utc), "action": "add_word:a"},
+        {"user_id": 1, "ts": datetime(2026, 1, 1, 23, tzinfo=timezone.utc), "action": "answered:a:correct"},
+        # 02:00 по Москве — это ещё 1 января по UTC
+        {"user_id": 1, "ts": datetime(2026, 1, 2, 2, tzinfo=moscow), "action": "answered:a:wrong"},
+        {"user_id": 2, "ts": datetime(2026, 1, 1, 10, tzinfo=timezone.utc), "action": "reminder:a"},
+        {"user_id": 2, "ts": datetime(2026, 1, 2, 10, tzinfo=timezone.utc), "action": "import_words", "payload": {"count": 5}},
+    ]
+
+    rows = sorted(aggregate_daily(records), key=lambda row: (row["user_id"], row["day"]))
+
+    assert rows == [
+        {"user_id": 1, "day": date(2026, 1, 1), "adds": 1, "reviews": 2, "correct": 1, "wrong": 1},
+        {"user_id": 2, "day": date(2026, 1, 2), "adds": 5, "reviews": 0, "correct": 0, "wrong": 0},
+    ]
@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from bot.services.archive import iter_archive, write_archive
+from bot.services.memory_database import InMemoryDatabase
+
+
+def _event(event_id, ts, user_id=1):
+    return {
+        "event_id": event_id,
+        "user_id": user_id,
+        "ts": ts,
+        "action": "add_word:apple",
+        "payload": {"source": "test"},
+    }
+
+
+def test_archive_roundtrip_partitioned_by_day(tmp_path):
+    """Тест записи архива по дням и чтения обратно с фильтрами"""
+    first = datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    second = datetime(2025, 1, 2, 10, tzinfo=timezone.utc)
+    write_archive(str(tmp_path), "activity_events", [_event(1, first), _event(2, second, user_id=2)])
+    # повторная запись той же порции (сбой до COMMIT) не даёт дублей
+    write_archive(str(tmp_path), "activity_events", [_event(1, first)])
+
+    assert (tmp_path / "activity_events" / "date=2025-01-01" / "part.jsonl.gz").exists()
+
+    records = list(iter_archive(str(tmp_path), "activity_events"))
+    assert [record["event_id"] for record in records] == [1, 2]
+    assert records[0]["ts"] == first
+    assert records[0]["payload"] == {"source": "test"}
+
+    assert [
+        record["event_id"]
+        for record in iter_archive(str(tmp_path), "activity_events", since=date(2025, 1, 2))
+    ] == [2]
+    assert list(iter_archive(str(tmp_path), "activity_events", user_id=3)) == []
+    assert list(iter_archive(str(tmp_path), "review_log")) == []
+
+
+@pytest.mark.asyncio
+async def test_archive_old_records_keeps_rollups(tmp_path):
+    """Тест переноса старых событий в архив без потери дневных счётчиков"""
+    db = InMemoryDatabase()
+    await db.log_activity(1, "add_word:apple")
+    await db.log_activity(1, "add_word:pear")
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+    db._activity_events[0]["ts"] = old
+
+    archived = await db.archive_old_records(
+        "activity_events", datetime.now(timezone.utc) - timedelta(days=180), str(tmp_path)
+    )
+
+    assert archived == 1
+    assert len(db._activity_events) == 1
+    assert [record["action"] for record in iter_archive(str(tmp_path), "activity_events")] == [
+        "add_word:apple"
+    ]
+    daily = await db.get_daily_activity(1, date.min)
+    assert sum(row.adds for row in daily) == 2
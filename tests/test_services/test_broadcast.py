@@ -0,0 +1,116 @@
+import itertools
+
+import pytest
+
+from bot.services.broadcast import Broadcast
+from bot.services.fanout import fan_out
+from bot.services.memory_database import InMemoryDatabase
+
+RECIPIENTS = list(range(1, 11))
+
+
+class Crash(BaseException):
+    """Падение процесса: fan_out такие ошибки не перехватывает."""
+
+
+async def _fetch_batch(after_user_id, limit):
+    return [u for u in RECIPIENTS if after_user_id is None or u > after_user_id][:limit]
+
+
+async def _count():
+    return len(RECIPIENTS)
+
+
+async def _fan_out(items, worker, name):
+    return await fan_out(items, worker, concurrency=2, name=name)
+
+
+def _broadcast(db, send, owner="a", lease_seconds=0, clock=None):
+    ticks = itertools.count()
+    return Broadcast(
+        db,
+        "motivation:test",
+        _fetch_batch,
+        _count,
+        send,
+        _fan_out,
+        owner=owner,
+        lease_seconds=lease_seconds,
+        batch_size=3,
+        clock=clock or (lambda: float(next(ticks))),
+    )
+
+
+@pytest.mark.asyncio
+async def test_broadcast_sends_all_and_finishes():
+    """Тест, что рассылка доходит до всех и повторно не запускается"""
+    db = InMemoryDatabase()
+    sent = []
+
+    async def send(user_id):
+        sent.append(user_id)
+
+    progress = await _broadcast(db, send).run()
+
+    assert sorted(sent) == RECIPIENTS
+    assert progress.finished and progress.sent == 10 and progress.eta_seconds == 0
+    assert (await db.get_broadcast("motivation:test")).last_user_id == 10
+    assert await _broadcast(db, send).run() is None
+    assert len(sent) == 10
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_checkpoint():
+    """Тест, что после падения рассылка продолжается без повторов"""
+    db = InMemoryDatabase()
+    sent = []
+
+    async def crashing_send(user_id):
+        if user_id == 5:
+            raise Crash  # процесс упал посреди второй порции
+        sent.append(user_id)
+
+    with pytest.raises(Crash):
+        await _broadcast(db, crashing_send).run()
+    state = await db.get_broadcast("motivation:test")
+    assert state.last_user_id == 3 and state.inflight_user_id == 6
+
+    async def send(user_id):
+        sent.append(user_id)
+
+    progress = await _broadcast(db, send, owner="b").run()
+
+    # прерванная порция 4..6 пропускается, остальные получают ровно по одному
+    assert len(sent) == len(set(sent))
+    assert set(range(7, 11)) <= set(sent)
+    assert progress.finished and progress.skipped == 3
+    assert progress.processed == progress.total == 10
+
+
+@pytest.mark.asyncio
+async def test_broadcast_respects_foreign_lease():
+    """Тест, что рассылку с действующей арендой другого узла не перехватывают"""
+    db = InMemoryDatabase()
+    await db.claim_broadcast("motivation:test", "a", 300, 10)
+
+    async def send(user_id):
+        raise AssertionError("не должно отправляться")
+
+    assert await _broadcast(db, send, owner="b").run() is None
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reports_progress_and_eta(capsys):
+    """Тест, что прогресс и ETA считаются по скорости отправленных порций"""
+    db = InMemoryDatabase()
+    clock = iter([0.0, 3.0, 6.0, 9.0, 10.0])
+
+    async def send(user_id):
+        pass
+
+    await _broadcast(db, send, clock=lambda: next(clock)).run()
+
+    lines = capsys.readouterr().out.splitlines()
+    # порция из 3 за 3 секунды: на оставшихся 7 уйдёт ~7 секунд
+    assert lines[0] == "Рассылка motivation:test: 3/10, осталось ~7 с"
+    assert lines[-1] == "Рассылка motivation:test: 10/10, осталось ~0 с"
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from bot.services.cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_hit_after_first_load():
+    """Тест, что повторное чтение берётся из кэша"""
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        return {"user_id": key}
+
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+
+    assert await cache.get_or_load(1, loader) == {"user_id": 1}
+    assert await cache.get_or_load(1, loader) == {"user_id": 1}
+
+    assert calls == [1]
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+@pytest.mark.asyncio
+async def test_entry_expires_after_ttl():
+    """Тест истечения TTL"""
+    clock = FakeClock()
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        return len(calls)
+
+    cache = AsyncTTLCache(maxsize=10, ttl=5, clock=clock)
+
+    assert await cache.get_or_load("a", loader) == 1
+    clock.now = 6
+    assert await cache.get_or_load("a", loader) == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    """Тест вытеснения давно не использованного ключа"""
+
+    async def loader(key):
+        return key
+
+    cache = AsyncTTLCache(maxsize=2, ttl=60)
+    await cache.get_or_load(1, loader)
+    await cache.get_or_load(2, loader)
+    await cache.get_or_load(1, loader)
+    await cache.get_or_load(3, loader)
+
+    assert cache.evictions == 1
+    misses = cache.misses
+    await cache.get_or_load(1, loader)
+    assert cache.misses == misses
+    await cache.get_or_load(2, loader)
+    assert cache.misses == misses + 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_reload():
+    """Тест явной инвалидации после записи"""
+    values = iter(["old", "new"])
+
+    async def loader(key):
+        return next(values)
+
+    cache = AsyncTTLCache()
+    assert await cache.get_or_load(1, loader) == "old"
+    cache.invalidate(1)
+    assert await cache.get_or_load(1, loader) == "new"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_key_loads_once():
+    """Тест защиты от stampede: один вызов загрузчика на холодный ключ"""
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader(key):
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    cache = AsyncTTLCache()
+    tasks = [asyncio.create_task(cache.get_or_load(1, loader)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == ["value"] * 10
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_loader_error_is_not_cached():
+    """Тест, что ошибка загрузчика не кэшируется"""
+    attempts = 0
+
+    async def loader(key):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("db is down")
+        return "value"
+
+    cache = AsyncTTLCache()
+    with pytest.raises(RuntimeError):
+        await cache.get_or_load(1, loader)
+    assert await cache.get_or_load(1, loader) == "value"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_skips_stale_value():
+    """Тест, что значение, загруженное до инвалидации, не попадает в кэш"""
+    release = asyncio.Event()
+    values = iter(["stale", "fresh"])
+
+    async def loader(key):
+        value = next(values)
+        if value == "stale":
+            await release.wait()
+        return value
+
+    cache = AsyncTTLCache()
+    task = asyncio.create_task(cache.get_or_load(1, loader))
+    await asyncio.sleep(0)
+    cache.invalidate(1)
+    release.set()
+
+    assert await task == "stale"
+    assert await cache.get_or_load(1, loader) == "fresh"
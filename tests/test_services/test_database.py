@@ -0,0 +1,438 @@
+import re
+from datetime import datetime, time, timezone
+
+import pytest
+from sqlalchemy import BigInteger, Integer, SmallInteger
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import asyncpg
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.infrastructure.config import Settings
+from bot.models.word import WordUpdate
+from bot.services.database import Database
+
+
+def _result(rows):
+    result = MagicMock()
+    result.fetchall.return_value = rows
+    return result
+
+
+def _stub_sessions(row):
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(fetchone=MagicMock(return_value=row))
+    factory = MagicMock()
+    factory.return_value.__aenter__.return_value = session
+    return factory, session
+
+
+@pytest.mark.asyncio
+async def test_iter_users_uses_keyset_batches():
+    """Тест постраничного обхода пользователей по user_id"""
+    rows = [MagicMock(user_id=i) for i in (1, 2, 3)]
+
+    db = Database(Settings())
+    db._primary_sessions, mock_session = _stub_sessions(None)
+    mock_session.execute.side_effect = [_result(rows[:2]), _result(rows[2:])]
+
+    seen = [
+        row.user_id
+        async for row in db.iter_users(batch_size=2, columns=["user_id"])
+    ]
+
+    assert seen == [1, 2, 3]
+    assert mock_session.execute.call_count == 2
+
+    first_query = str(mock_session.execute.call_args_list[0].args[0])
+    second_query = str(mock_session.execute.call_args_list[1].args[0])
+    assert "users.user_id >" not in first_query
+    assert "users.user_id >" in second_query
+    assert "users.settings" not in second_query
+
+
+@pytest.mark.asyncio
+async def test_iter_user_words_stops_on_short_batch():
+    """Тест, что обход слов заканчивается на неполной порции"""
+    rows = [MagicMock(word_id=10, text="apple")]
+
+    db = Database(Settings())
+    db._primary_sessions, mock_session = _stub_sessions(None)
+    mock_session.execute.return_value = _result(rows)
+
+    seen = [
+        row.text
+        async for row in db.iter_user_words(
+            123, batch_size=2, columns=["word_id", "text"]
+        )
+    ]
+
+    assert seen == ["apple"]
+    assert mock_session.execute.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica():
+    """Тест, что чтение статистики идёт на реплику"""
+    db = Database(Settings())
+    primary, primary_session = _stub_sessions(None)
+    replica, replica_session = _stub_sessions(None)
+    db._primary_sessions = primary
+    db._replica_sessions = [replica]
+
+    await db.get_user_stats(123)
+
+    replica_session.execute.assert_called_once()
+    primary_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_read_your_own_writes_uses_primary():
+    """Тест, что сразу после записи данные пользователя читаются с primary"""
+    db = Database(Settings())
+    primary, primary_session = _stub_sessions(None)
+    replica, replica_session = _stub_sessions(None)
+    db._primary_sessions = primary
+    db._replica_sessions = [replica]
+
+    await db.update_word_next_repeat(123, 1)
+    await db.get_user_stats(123)
+    await db.get_user_stats(456)
+
+    # UPDATE words, пересчёт next_due_at и чтение статистики
+    assert primary_session.execute.call_count == 3
+    replica_session.execute.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_replicas_are_used_round_robin():
+    """Тест распределения чтений между репликами"""
+    db = Database(Settings())
+    first, first_session = _stub_sessions(None)
+    second, second_session = _stub_sessions(None)
+    db._replica_sessions = [first, second]
+
+    for user_id in range(4):
+        await db.get_user_stats(user_id)
+
+    assert first_session.execute.call_count == 2
+    assert second_session.execute.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_update_words_bulk_one_statement_per_chunk():
+    """Тест массового обновления: один UPDATE ... FROM VALUES на порцию"""
+    db = Database(Settings())
+    primary, session = _stub_sessions(None)
+    session.execute.return_value = MagicMock(rowcount=2)
+    db._primary_sessions = primary
+
+    now = datetime.now(timezone.utc)
+    updates = [WordUpdate(word_id=i, user_id=1, next_repeat=now) for i in range(5)]
+    updated = await db.update_words_bulk(updates, chunk_size=2)
+
+    # на каждую порцию: UPDATE words и пересчёт users.next_due_at
+    assert session.execute.call_count == 6
+    assert updated == 6
+    query = str(session.execute.call_args_list[0].args[0])
+    assert "UPDATE words" in query
+    assert "VALUES" in query
+    assert "UPDATE users SET next_due_at" in str(session.execute.call_args_list[1].args[0])
+
+
+@pytest.mark.asyncio
+async def test_database_is_lazy_until_connect():
+    """Тест, что конструктор не создаёт движок и не требует настроек базы"""
+    db = Database(Settings())
+
+    assert db.engine is None
+    assert db.pool_stats() == {}
+    with pytest.raises(RuntimeError):
+        await db.get_user_stats(123)
+
+
+@pytest.mark.asyncio
+async def test_get_user_words_projection_skips_objects():
+    """Тест, что с columns выбираются только нужные колонки и возвращаются строки"""
+    rows = [MagicMock(word_id=1, text="apple", next_repeat=None)]
+
+    db = Database(Settings())
+    db._primary_sessions, mock_session = _stub_sessions(None)
+    mock_session.execute.return_value = _result(rows)
+
+    result = await db.get_user_words(123, columns=["word_id", "text", "next_repeat"])
+
+    assert result == rows
+    query = str(mock_session.execute.call_args.args[0])
+    assert "words.history" not in query
+    assert "words.ml_score" not in query
+
+
+@pytest.mark.asyncio
+async def test_get_due_words_scans_users_by_next_send_at():
+    """Тест, что просроченные слова ищутся через users.next_send_at и LATERAL"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([])
+
+    assert await db.get_due_words(datetime.now(timezone.utc), limit=10) == []
+
+    query = str(session.execute.call_args.args[0])
+    assert "users.next_send_at <=" in query
+    assert "ORDER BY users.next_send_at" in query
+    assert "remind_after" not in query
+    assert "LATERAL" in query
+
+
+@pytest.mark.asyncio
+async def test_word_writes_maintain_next_due_at():
+    """Тест, что запись слов обновляет users.next_due_at в той же транзакции"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+
+    await db.add_word("apple", "яблоко", 123)
+    await db.update_word_next_repeat(123, 1)
+
+    queries = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert "least(users.next_due_at" in queries[1]
+    assert "min(words.next_repeat)" in queries[3]
+    # момент напоминания пересчитывается тем же UPDATE, что и срок
+    assert "next_send_at=CASE" in queries[1]
+    assert "next_send_at=CASE" in queries[3]
+    assert session.commit.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_claim_due_words_uses_skip_locked():
+    """Тест, что узлы берут пользователей в аренду через FOR UPDATE SKIP LOCKED"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([])
+
+    await db.claim_due_words(datetime.now(timezone.utc), "node-1", 300, limit=10)
+
+    query = str(
+        session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert "lease_until" in query
+    session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_schedule_reminders_writes_outbox_in_same_transaction():
+    """Тест, что перенос слов и запись в outbox коммитятся одной транзакцией"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([])
+    now = datetime.now(timezone.utc)
+
+    await db.schedule_reminders(
+        [WordUpdate(word_id=1, user_id=123, next_repeat=now)],
+        [
+            {
+                "idempotency_key": "word_reminder:1:key",
+                "kind": "word_reminder",
+                "user_id": 123,
+                "word_id": 1,
+                "next_attempt_at": now,
+            }
+        ],
+        {123: now},
+    )
+
+    queries = [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in session.execute.call_args_list
+    ]
+    # remind_after пишется до пересчёта next_send_at, который от него зависит
+    assert queries[0].startswith("UPDATE users SET remind_after")
+    assert queries[1].startswith("UPDATE words")
+    assert queries[2].startswith("UPDATE users SET next_due_at")
+    assert "INSERT INTO outbox" in queries[3]
+    assert "ON CONFLICT (idempotency_key) DO NOTHING" in queries[3]
+    session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_due_words_wait_for_user_slot():
+    """Тест, что выборка просроченных слов учитывает сдвиг пользователя в окне"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([])
+
+    await db.get_due_words(datetime.now(timezone.utc), limit=10)
+
+    query = str(
+        session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert "CAST(users.user_id AS BIGINT)" in query
+    assert "users.notify_minute" in query
+
+
+def _assert_binds_fit(stmt):
+    # asyncpg передаёт параметры с типом колонки: 2**32 как SMALLINT Postgres
+    # отвергнет, хотя текст запроса выглядит верно
+    limits = {SmallInteger: 2**15, Integer: 2**31, BigInteger: 2**63}
+    compiled = stmt.compile(dialect=asyncpg.dialect())
+    for name, bind in compiled.binds.items():
+        for type_, limit in limits.items():
+            if type(bind.type) is type_ and isinstance(bind.value, int):
+                assert -limit <= bind.value < limit, (name, bind.value, bind.type)
+
+
+@pytest.mark.asyncio
+async def test_pace_change_refreshes_next_send_at():
+    """Тест, что смена reminders_per_day пересчитывает next_send_at и будит очередь"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    now = datetime.now(timezone.utc)
+    session.execute.return_value = _result([MagicMock(user_id=123, next_send_at=now)])
+    session.execute.return_value.scalar_one_or_none.return_value = {"reminders_per_day": 3}
+    seen = []
+    db.add_due_listener(lambda user_id, send_at: seen.append((user_id, send_at)))
+
+    await db.update_user_settings(123, {"reminders_per_day": 3})
+
+    stmt = session.execute.call_args_list[1].args[0]
+    assert "next_send_at=CASE" in str(stmt.compile(dialect=postgresql.dialect()))
+    _assert_binds_fit(stmt)
+    assert seen == [(123, now)]
+
+
+@pytest.mark.asyncio
+async def test_refresh_notify_minutes_updates_only_shifted_rows():
+    """Тест, что ночной пересчёт окон трогает только строки с изменившейся минутой"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([MagicMock(), MagicMock(), MagicMock()])
+
+    assert await db.refresh_notify_minutes() == 3
+
+    stmt = session.execute.call_args.args[0]
+    query = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "users.notify_minute IS DISTINCT FROM fresh.minute" in query
+    assert "(now() AT TIME ZONE 'UTC')::date" in query
+    assert "motivation_minute=" in query
+    assert "next_send_at=" in query
+    _assert_binds_fit(stmt)
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["09:30", "9:30", "9:5", "23:59", "0:00", "24:00", "9:60", "9:005", " 9:30",
+     "+9:30", "9:30:00", "٩:30", "9", "", None],
+)
+def test_notify_minute_sql_parses_time_like_python(value):
+    """Тест, что Postgres и Python одинаково разбирают notification_time"""
+    from bot.services.database import NOTIFY_MINUTE_SQL
+    from bot.services.delivery_window import _parse_time
+
+    # условие из NOTIFY_MINUTE_SQL: `->> ~ '<шаблон>'`, затем split_part по ':'
+    pattern = re.search(r"~ '(.+?)'", NOTIFY_MINUTE_SQL).group(1)
+    sql_match = value is not None and re.search(pattern, value) is not None
+    sql_time = (
+        time(*(int(part) for part in value.split(":"))) if sql_match else None
+    )
+
+    assert sql_time == _parse_time(value)
+    assert "current_date" not in NOTIFY_MINUTE_SQL
+
+
+@pytest.mark.asyncio
+async def test_due_words_query_binds_fit_column_types():
+    """Тест, что параметры выборки просроченных слов влезают в свои типы"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+    session.execute.return_value = _result([])
+    now = datetime.now(timezone.utc)
+
+    await db.get_due_words(now, limit=10)
+    await db.claim_due_words(now, "node-1", 300, limit=10)
+    await db.refresh_next_send([1, 2], now)
+    await db.update_words_bulk([WordUpdate(1, 1, next_repeat=now)])
+
+    for call in session.execute.call_args_list:
+        _assert_binds_fit(call.args[0])
+
+
+def test_dropped_indexes_are_not_recreated():
+    """Тест, что удаляемые при обновлении схемы индексы не объявлены в metadata"""
+    from bot.services.database import DROPPED_INDEXES, metadata
+
+    declared = {index.name for table in metadata.sorted_tables for index in table.indexes}
+
+    assert "ix_words_next_repeat_user_id" in DROPPED_INDEXES
+    assert "ix_users_notify_minute_user_id" in DROPPED_INDEXES
+    assert not declared & set(DROPPED_INDEXES)
+
+
+def test_activity_partition_moves_rows_out_of_default():
+    """Тест, что новая секция забирает строки своего месяца из default-секции"""
+    from bot.services.database import _activity_partition_ddl
+
+    create, move, attach = _activity_partition_ddl(datetime(2026, 12, 1, tzinfo=timezone.utc))
+
+    assert create.startswith("CREATE TABLE activity_events_y2026m12 (LIKE activity_events")
+    assert "DELETE FROM activity_events_default" in move
+    assert "INSERT INTO activity_events_y2026m12" in move
+    assert attach.endswith(
+        "FOR VALUES FROM ('2026-12-01T00:00:00+00:00') TO ('2027-01-01T00:00:00+00:00')"
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_words_copy_runs_inside_transaction():
+    """Тест, что COPY идёт после первого запроса SQLAlchemy, то есть внутри транзакции"""
+    calls = []
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+
+    async def execute(stmt):
+        calls.append("execute")
+        return _result([])
+
+    async def copy_records_to_table(*args, **kwargs):
+        calls.append("copy")
+
+    async def commit():
+        calls.append("commit")
+
+    session.execute = execute
+    session.commit = commit
+    raw = MagicMock()
+    raw.driver_connection.copy_records_to_table = copy_records_to_table
+    session.connection.return_value.get_raw_connection = AsyncMock(return_value=raw)
+
+    imported = await db.import_words(
+        123, [("apple", "яблоко")], datetime.now(timezone.utc)
+    )
+
+    assert imported == 1
+    assert calls == ["execute", "copy", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_import_words_requires_connect():
+    """Тест, что импорт без connect() падает так же, как остальные методы"""
+    db = Database(Settings())
+
+    with pytest.raises(RuntimeError, match="connect"):
+        await db.import_words(123, [("apple", "яблоко")], datetime.now(timezone.utc))
+
+
+@pytest.mark.asyncio
+async def test_sent_reminder_becomes_pending_word():
+    """Тест, что отметка sent и ожидание ответа пишутся одной транзакцией"""
+    db = Database(Settings())
+    db._primary_sessions, session = _stub_sessions(None)
+
+    await db.mark_outbox_sent([1, 2], datetime.now(timezone.utc))
+
+    queries = [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in session.execute.call_args_list
+    ]
+    assert queries[0].startswith("UPDATE outbox SET status=")
+    assert queries[1].startswith("UPDATE users SET pending_word_id=outbox.word_id")
+    assert "FROM outbox" in queries[1]
+    session.commit.assert_called_once()
@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta, timezone
+
+from bot.services.delivery_window import (
+    MOTIVATION_SPREAD_MINUTES,
+    earliest_send,
+    jitter,
+    motivation_minute,
+    next_slot,
+    notify_minute,
+)
+
+
+def test_notify_minute_uses_timezone_and_dst():
+    """Тест перевода локального времени уведомлений в минуту UTC"""
+    assert notify_minute({"notification_time": "09:30", "timezone": "Europe/Moscow"}) == 6 * 60 + 30
+    winter = {"notification_time": "09:00", "timezone": "Europe/Berlin"}
+    assert notify_minute(winter, date(2026, 1, 15)) == 8 * 60
+    assert notify_minute(winter, date(2026, 7, 15)) == 7 * 60
+
+
+def test_notify_minute_falls_back_to_defaults():
+    """Тест значений по умолчанию для некорректных настроек"""
+    assert notify_minute({}) == 10 * 60
+    assert notify_minute({"notification_time": "25:99", "timezone": "Mars/Base"}) == 10 * 60
+
+
+def test_jitter_is_deterministic_and_uniform():
+    """Тест, что сдвиг пользователя постоянен и равномерно покрывает [0, 1)"""
+    assert jitter(42) == jitter(42)
+    shares = [jitter(user_id) for user_id in range(1, 1001)]
+    assert all(0 <= share < 1 for share in shares)
+    per_tenth = [sum(1 for s in shares if k / 10 <= s < (k + 1) / 10) for k in range(10)]
+    assert max(per_tenth) - min(per_tenth) < 20
+
+
+def test_motivation_minute_spreads_after_opening():
+    """Тест, что мотивация расходится по часу после открытия окна"""
+    minutes = {motivation_minute(23 * 60 + 30, user_id) for user_id in range(1, 1001)}
+    assert len(minutes) == MOTIVATION_SPREAD_MINUTES
+    assert minutes == {(23 * 60 + 30 + k) % (24 * 60) for k in range(60)}
+
+
+def test_next_slot_walks_slots_of_window():
+    """Тест слотов напоминаний: окно 12 часов, три напоминания, сдвиг 0.5"""
+    opens = datetime(2026, 1, 1, 8, tzinfo=timezone.utc)
+    slots = [opens + timedelta(hours=2), opens + timedelta(hours=6), opens + timedelta(hours=10)]
+
+    assert next_slot(opens, 8 * 60, 720, 3, 0.5) == slots[0]
+    assert next_slot(slots[0], 8 * 60, 720, 3, 0.5) == slots[1]
+    assert next_slot(slots[1] + timedelta(hours=1), 8 * 60, 720, 3, 0.5) == slots[2]
+    assert next_slot(slots[2], 8 * 60, 720, 3, 0.5) == slots[0] + timedelta(days=1)
+
+
+def test_earliest_send_waits_for_first_slot():
+    """Тест, что до первого слота и вне окна отправка откладывается"""
+    opens = datetime(2026, 1, 1, 8, tzinfo=timezone.utc)
+    first = opens + timedelta(hours=3)
+
+    assert earliest_send(opens, 8 * 60, 720, 2, 0.5) == first
+    assert earliest_send(first + timedelta(hours=1), 8 * 60, 720, 2, 0.5) == first + timedelta(
+        hours=1
+    )
+    assert earliest_send(opens + timedelta(hours=13), 8 * 60, 720, 2, 0.5) == first + timedelta(
+        days=1
+    )
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bot.services.due_queue import DueQueue
+
+
+def test_schedule_keeps_latest_due_per_user():
+    """Тест, что у пользователя в очереди только последний срок"""
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    queue = DueQueue()
+    queue.schedule(1, now + timedelta(hours=1))
+    queue.schedule(2, now + timedelta(hours=2))
+    queue.schedule(1, now + timedelta(hours=3))
+
+    assert queue.peek() == now + timedelta(hours=2)
+    assert queue.pop_due(now + timedelta(hours=2)) == [2]
+    assert len(queue) == 1
+
+    queue.schedule(1, None)
+    assert queue.peek() is None
+
+
+@pytest.mark.asyncio
+async def test_wait_wakes_for_earlier_due():
+    """Тест, что wait() просыпается, когда появился более ранний срок"""
+    queue = DueQueue()
+    queue.schedule(1, datetime.now(timezone.utc) + timedelta(hours=1))
+
+    waiter = asyncio.create_task(queue.wait())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    queue.schedule(2, datetime.now(timezone.utc) + timedelta(milliseconds=10))
+    await asyncio.wait_for(waiter, 1)
+
+    assert queue.pop_due(datetime.now(timezone.utc)) == [2]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from bot.services.fanout import fan_out
+
+
+@pytest.mark.asyncio
+async def test_fan_out_bounds_concurrency():
+    """Тест, что одновременно выполняется не больше concurrency обработчиков"""
+    running = 0
+    peak = 0
+    seen = []
+
+    async def worker(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        seen.append(item)
+        running -= 1
+
+    result = await fan_out(range(20), worker, concurrency=4)
+
+    assert result.done == 20
+    assert peak == 4
+    assert sorted(seen) == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_fan_out_isolates_errors_and_reads_async_streams():
+    """Тест, что ошибка одного элемента не останавливает остальные"""
+
+    async def stream():
+        for item in range(5):
+            yield item
+
+    async def worker(item):
+        if item == 2:
+            raise RuntimeError("telegram недоступен")
+
+    result = await fan_out(stream(), worker, concurrency=2)
+
+    assert result.done == 4
+    assert result.failed == 1
+    assert result.failures == [2]
+
+
+@pytest.mark.asyncio
+async def test_fan_out_rate_limit():
+    """Тест ограничения частоты запусков"""
+    loop = asyncio.get_running_loop()
+    started = []
+
+    async def worker(item):
+        started.append(loop.time())
+
+    await fan_out(range(5), worker, concurrency=5, rate=100)
+
+    assert started[-1] - started[0] >= 0.035
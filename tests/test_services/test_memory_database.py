@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bot.models.word import WordUpdate
+from bot.services.memory_database import InMemoryDatabase
+from bot.services.storage import create_database
+
+
+@pytest.mark.asyncio
+async def test_add_and_get_user():
+    """Тест регистрации и загрузки пользователя"""
+    db = InMemoryDatabase()
+
+    assert await db.add_user(123, "test_user", settings={"reminders_per_day": 2})
+    assert not await db.add_user(123, "test_user")
+
+    await db.update_user_settings(123, {"timezone": "Europe/Moscow"})
+    user = await db.get_user(123)
+
+    assert user.username == "test_user"
+    assert user.settings == {"reminders_per_day": 2, "timezone": "Europe/Moscow"}
+    assert await db.get_user(999) is None
+
+
+@pytest.mark.asyncio
+async def test_get_due_words_one_per_user():
+    """Тест выборки просроченных слов: одно, самое старое, на пользователя"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    await db.add_user(1, "a", settings={"reminders_per_day": 3})
+    await db.add_user(2, "b")
+
+    await db.import_words(1, [("old", "старый")], now - timedelta(days=2))
+    await db.import_words(1, [("new", "новый")], now - timedelta(days=1))
+    await db.import_words(2, [("later", "позже")], now + timedelta(days=1))
+
+    due = await db.get_due_words(now, limit=10)
+
+    assert [(word.text, per_day) for word, per_day, _ in due] == [("old", 3)]
+
+    word = due[0][0]
+    await db.update_word_next_repeat(1, word.id, now + timedelta(days=1))
+    due = await db.get_due_words(now, limit=10)
+    assert [word.text for word, _, _ in due] == ["new"]
+
+
+@pytest.mark.asyncio
+async def test_due_words_are_copies():
+    """Тест, что изменение слова снаружи не ломает индекс по next_repeat"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    await db.add_user(1, "a")
+    await db.import_words(1, [("apple", "яблоко")], now - timedelta(hours=1))
+
+    word, _, _ = (await db.get_due_words(now))[0]
+    word.next_repeat = now + timedelta(days=5)
+
+    assert len(await db.get_due_words(now)) == 1
+
+
+@pytest.mark.asyncio
+async def test_update_word_after_check_writes_review_log():
+    """Тест записи ответа в review_log вместе с обновлением слова"""
+    db = InMemoryDatabase()
+    await db.add_user(1, "a")
+    await db.add_word(text="apple", translation="яблоко", user_id=1)
+    word = (await db.get_user_words(1))[0]
+
+    await db.update_word_after_check(
+        user_id=1,
+        word_id=word.id,
+        next_repeat=datetime.utcnow() + timedelta(days=3),
+        personal_difficulty=0.4,
+        stability=3.0,
+        ml_score=0.8,
+        repeat_count=1,
+        review={"rating": 4, "is_correct": True, "interval_days": 3.0, "ml_score": 0.8},
+    )
+
+    updated = (await db.get_user_words(1))[0]
+    assert updated.repeat_count == 1
+    assert updated.next_repeat.tzinfo is not None
+    reviews = [row async for row in db.iter_reviews(columns=["word_id", "rating"])]
+    assert [(row.word_id, row.rating) for row in reviews] == [(word.id, 4)]
+
+
+@pytest.mark.asyncio
+async def test_activity_rollups():
+    """Тест дневных счётчиков активности"""
+    db = InMemoryDatabase()
+    await db.log_activity(1, "add_word:apple")
+    await db.log_activity(1, "import_words", {"count": 10})
+    await db.log_activity(1, "answered:apple:wrong")
+
+    today = datetime.now(timezone.utc).date()
+    (row,) = await db.get_daily_activity(1, today)
+
+    assert (row.adds, row.reviews, row.wrong) == (11, 1, 1)
+
+    await db.rebuild_activity_rollups()
+    (row,) = await db.get_daily_activity(1, today)
+    assert row.adds == 11
+
+
+@pytest.mark.asyncio
+async def test_iter_users_with_columns():
+    """Тест обхода пользователей с выбором колонок"""
+    db = InMemoryDatabase()
+    for user_id in (3, 1, 2):
+        await db.add_user(user_id, f"user{user_id}")
+
+    rows = [row async for row in db.iter_users(columns=["user_id"])]
+
+    assert [row.user_id for row in rows] == [1, 2, 3]
+    assert not hasattr(rows[0], "settings")
+
+
+def test_create_database_memory_backend():
+    """Тест выбора бэкенда хранилища"""
+    assert isinstance(create_database("memory"), InMemoryDatabase)
+    with pytest.raises(ValueError):
+        create_database("sqlite")
+
+
+@pytest.mark.asyncio
+async def test_update_words_bulk():
+    """Тест массового обновления слов: None не меняет поле"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    await db.add_user(1, "a")
+    await db.import_words(1, [("a", "а"), ("b", "б")], now - timedelta(hours=1))
+    first, second = await db.get_user_words(1)
+
+    updated = await db.update_words_bulk(
+        [
+            WordUpdate(first.id, 1, next_repeat=now + timedelta(days=2), stability=2.5),
+            WordUpdate(second.id, 1, ml_score=0.9),
+            WordUpdate(999, 1, ml_score=0.1),
+        ]
+    )
+
+    assert updated == 2
+    first, second = await db.get_user_words(1)
+    assert (first.stability, first.ml_score) == (2.5, 0.5)
+    assert (second.stability, second.ml_score) == (1.0, 0.9)
+    assert [word.text for word, _, _ in await db.get_due_words(now)] == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_next_due_follows_rescheduled_words():
+    """Тест, что ближайший срок пользователя берётся из его кучи с учётом переносов"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    await db.add_user(1, "a")
+    await db.import_words(1, [(f"w{i}", "t") for i in range(50)], now + timedelta(days=1))
+    first, second = (await db.get_user_words(1))[:2]
+    seen = []
+    db.add_due_listener(lambda user_id, due_at: seen.append(due_at))
+
+    await db.update_word_next_repeat(1, first.id, now + timedelta(hours=1))
+    await db.update_word_next_repeat(1, second.id, now + timedelta(hours=2))
+    # самое раннее слово ушло на потом: срок — следующее по порядку
+    await db.update_word_next_repeat(1, first.id, now + timedelta(days=3))
+
+    assert seen == [now + timedelta(hours=1)] * 2 + [now + timedelta(hours=2)]
+    # куча не растёт бесконечно от переносов
+    for _ in range(200):
+        await db.update_word_next_repeat(1, first.id, now + timedelta(days=3))
+    assert len(db._user_due[1]) <= 2 * 50 + 16
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.services.fanout import fan_out
+from bot.services.memory_database import InMemoryDatabase
+from bot.services.outbox import OutboxDispatcher, backoff, reminder_key
+
+
+async def _fan_out(items, worker, name):
+    return await fan_out(items, worker, concurrency=2, name=name)
+
+
+async def _schedule(db, now, user_id=1):
+    await db.add_user(user_id, "test")
+    await db.import_words(user_id, [("apple", "яблоко")], now)
+    word = (await db.get_user_words(user_id))[0]
+    message = {
+        "idempotency_key": reminder_key(word),
+        "kind": "word_reminder",
+        "user_id": user_id,
+        "word_id": word.id,
+        "next_attempt_at": now,
+    }
+    return word, message
+
+
+def test_backoff_doubles_and_is_capped():
+    """Тест, что пауза между попытками растёт вдвое и ограничена сверху"""
+    assert [backoff(n, 30) for n in (1, 2, 3)] == [30, 60, 120]
+    assert backoff(30, 30) == 6 * 60 * 60
+
+
+@pytest.mark.asyncio
+async def test_same_decision_is_queued_once():
+    """Тест, что повторное решение с тем же ключом не создаёт второе сообщение"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    _, message = await _schedule(db, now)
+
+    assert await db.schedule_reminders([], [message]) == 1
+    assert await db.schedule_reminders([], [dict(message)]) == 0
+    assert await db.outbox_stats() == {"pending": 1}
+
+
+@pytest.mark.asyncio
+async def test_message_becomes_dead_after_max_attempts():
+    """Тест, что после исчерпания попыток сообщение уходит в dead"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    _, message = await _schedule(db, now)
+    await db.schedule_reminders([], [message])
+    notifier = MagicMock(send_word_reminder=AsyncMock(side_effect=RuntimeError("403")))
+    dispatcher = OutboxDispatcher(
+        db, notifier, _fan_out, max_attempts=2, backoff_seconds=10
+    )
+
+    dispatcher.clock = lambda: now
+    first = await dispatcher.dispatch()
+    dispatcher.clock = lambda: now + timedelta(seconds=10)
+    second = await dispatcher.dispatch()
+    dispatcher.clock = lambda: now + timedelta(hours=1)
+    third = await dispatcher.dispatch()
+
+    assert (first.retried, second.dead, third.dead) == (1, 1, 0)
+    assert notifier.send_word_reminder.call_count == 2
+    assert await db.outbox_stats() == {"dead": 1}
+
+
+@pytest.mark.asyncio
+async def test_claimed_message_is_not_sent_twice():
+    """Тест, что взятое диспетчером сообщение не получит второй диспетчер"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    _, message = await _schedule(db, now)
+    await db.schedule_reminders([], [message])
+
+    claimed = await db.claim_outbox(now, 10, lease_seconds=120)
+    assert len(claimed) == 1 and claimed[0].attempts == 1
+    assert await db.claim_outbox(now, 10, lease_seconds=120) == []
+    # диспетчер упал, не отметив отправку: после аренды сообщение вернётся
+    assert len(await db.claim_outbox(now + timedelta(seconds=120), 10, 120)) == 1
+
+
+@pytest.mark.asyncio
+async def test_each_batch_is_claimed_with_fresh_time():
+    """Тест, что аренда и пауза повтора считаются от времени своей пачки"""
+    db = InMemoryDatabase()
+    now = datetime.now(timezone.utc)
+    messages = []
+    for user_id in (1, 2, 3):
+        _, message = await _schedule(db, now, user_id)
+        messages.append(message)
+    await db.schedule_reminders([], messages)
+
+    # каждая отправка занимает 10 минут — дольше аренды
+    moments = iter(now + timedelta(minutes=10 * k) for k in range(100))
+    calls = []
+
+    async def send(user_id, text):
+        calls.append(user_id)
+        raise RuntimeError("timeout")
+
+    notifier = MagicMock(send_word_reminder=AsyncMock(side_effect=send))
+    dispatcher = OutboxDispatcher(
+        db,
+        notifier,
+        _fan_out,
+        max_attempts=5,
+        backoff_seconds=60,
+        batch_size=1,
+        clock=lambda: next(moments),
+    )
+    claims = []
+    original = db.claim_outbox
+
+    async def claim_outbox(moment, limit, lease_seconds):
+        claims.append(moment)
+        return await original(moment, limit, lease_seconds)
+
+    db.claim_outbox = claim_outbox
+    await dispatcher.dispatch()
+
+    assert claims == sorted(set(claims)) and len(claims) >= 3
+    for message in db._outbox.values():
+        # повтор назначен через минуту после ошибки, а не в прошлом
+        assert message["next_attempt_at"] > claims[0] + timedelta(minutes=1)
@@ -0,0 +1,23 @@
+from unittest.mock import MagicMock
+
+from bot.services.pool import TimedAsyncQueuePool
+
+
+def test_pool_stats_track_checkouts_and_overflow():
+    """Тест подсчёта выданных соединений и overflow"""
+    pool = TimedAsyncQueuePool(lambda: MagicMock(), pool_size=2, max_overflow=1)
+
+    connections = [pool.connect() for _ in range(3)]
+    stats = pool.stats()
+
+    assert stats["size"] == 2
+    assert stats["checked_out"] == 3
+    assert stats["overflow"] == 1
+    assert stats["checkouts"] == 3
+    assert stats["timeouts"] == 0
+    assert stats["wait_time_max"] >= stats["wait_time_avg"] >= 0
+
+    for connection in connections:
+        connection.close()
+
+    assert pool.stats()["checked_out"] == 0
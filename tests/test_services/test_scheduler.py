@@ -0,0 +1,397 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.infrastructure.config import Settings
+from bot.services.delivery_window import jitter, motivation_minute
+from bot.services.memory_database import InMemoryDatabase
+from bot.services.scheduler import Scheduler
+
+WINDOW_MINUTES = Settings().delivery_window_hours * 60
+
+
+@pytest.mark.asyncio
+async def test_due_queue_follows_word_writes():
+    """Тест, что очередь планировщика получает сроки из хранилища"""
+    db = InMemoryDatabase()
+    await db.add_user(1, "test", {"reminders_per_day": 2})
+    now = datetime.now(timezone.utc)
+    await db.import_words(1, [("apple", "яблоко")], now + timedelta(hours=5))
+
+    scheduler = Scheduler(db, MagicMock(), Settings())
+    await scheduler.load_due_queue()
+    assert scheduler.due_queue.peek() == now + timedelta(hours=5)
+
+    await db.import_words(1, [("pear", "груша")], now - timedelta(minutes=1))
+    assert scheduler.due_queue.peek() == now - timedelta(minutes=1)
+
+
+@pytest.mark.asyncio
+async def test_revise_task_retries_queue_load(monkeypatch, capsys):
+    """Тест, что ошибка базы при загрузке очереди не останавливает задачу"""
+    db = InMemoryDatabase()
+    await db.add_user(1, "test")
+    await db.import_words(1, [("apple", "яблоко")], datetime.now(timezone.utc) + timedelta(hours=5))
+    load = db.iter_due_users
+    calls = []
+
+    def flaky_load(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("база недоступна")
+        return load(*args, **kwargs)
+
+    db.iter_due_users = flaky_load
+    monkeypatch.setattr("bot.services.scheduler.RETRY_DELAY", 0)
+    scheduler = Scheduler(db, MagicMock(), Settings())
+
+    task = asyncio.create_task(scheduler.revise_words_task())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert len(calls) == 2
+    assert len(scheduler.due_queue) == 1
+    assert "база недоступна" in capsys.readouterr().out
+
+
+async def _dispatch(scheduler, moment: datetime):
+    scheduler.outbox.clock = lambda: moment
+    return await scheduler.outbox.dispatch()
+
+
+def _settings_opening_at(moment: datetime, reminders_per_day: int = 2) -> dict:
+    return {
+        "notification_time": f"{moment.hour}:{moment.minute:02d}",
+        "timezone": "UTC",
+        "reminders_per_day": reminders_per_day,
+    }
+
+
+@pytest.mark.asyncio
+async def test_send_due_reminders_paces_user():
+    """Тест, что пользователь получает одно слово, а следующее — в своём слоте"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    opens = (now - timedelta(hours=6)).replace(second=0, microsecond=0)
+    await db.add_user(1, "test", _settings_opening_at(opens))
+    await db.import_words(
+        1, [("apple", "яблоко"), ("pear", "груша")], now - timedelta(minutes=1)
+    )
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.load_due_queue()
+    await scheduler.send_due_reminders(now)
+    await _dispatch(scheduler, now)
+
+    notifier.send_word_reminder.assert_called_once()
+    # окно 12 часов делится на два слота по 6 часов, внутри слота у
+    # пользователя постоянный сдвиг
+    assert scheduler.due_queue.get(1) == opens + timedelta(hours=6) * (1 + jitter(1))
+
+
+@pytest.mark.asyncio
+async def test_repeated_passes_keep_reminders_per_day():
+    """Тест, что повторные проходы не шлют пользователю следующее слово раньше слота"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    # одно напоминание в день: слот — всё 12-часовое окно, сдвиг ~7.4 часа
+    opens = (now - timedelta(hours=10)).replace(second=0, microsecond=0)
+    await db.add_user(1, "test", _settings_opening_at(opens, reminders_per_day=1))
+    await db.import_words(
+        1, [(f"word{i}", f"слово{i}") for i in range(5)], now - timedelta(minutes=1)
+    )
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+
+    # проходы будит не очередь этого пользователя, а, например, чужие сроки
+    scheduler = Scheduler(db, notifier, Settings())
+    for minute in range(5):
+        moment = now + timedelta(minutes=minute)
+        await scheduler.send_due_reminders(moment)
+        await _dispatch(scheduler, moment)
+
+    notifier.send_word_reminder.assert_called_once()
+    # новый экземпляр планировщика (перезапуск) тоже соблюдает темп
+    restarted = Scheduler(db, notifier, Settings())
+    await restarted.send_due_reminders(now + timedelta(minutes=10))
+    await _dispatch(restarted, now + timedelta(minutes=10))
+    notifier.send_word_reminder.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_send_due_reminders_waits_for_window():
+    """Тест, что вне окна уведомлений напоминание переносится на открытие окна"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    opens = now + timedelta(hours=6)
+    await db.add_user(1, "test", _settings_opening_at(opens))
+    await db.import_words(1, [("apple", "яблоко")], now - timedelta(minutes=1))
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.load_due_queue()
+    await scheduler.send_due_reminders(now)
+    await _dispatch(scheduler, now)
+
+    notifier.send_word_reminder.assert_not_called()
+    first_slot = opens.replace(second=0, microsecond=0) + timedelta(hours=6) * jitter(1)
+    assert scheduler.due_queue.get(1) == first_slot
+
+
+@pytest.mark.asyncio
+async def test_window_opening_is_spread_by_jitter():
+    """Тест, что в начале окна пользователи ждут своего сдвига, а не шлются разом"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    opens = now.replace(second=0, microsecond=0)
+    user_ids = range(1, 101)
+    for user_id in user_ids:
+        await db.add_user(user_id, "test", _settings_opening_at(opens))
+        await db.import_words(user_id, [("apple", "яблоко")], now - timedelta(minutes=1))
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.load_due_queue()
+    await scheduler.send_due_reminders(now)
+    await _dispatch(scheduler, now)
+
+    notifier.send_word_reminder.assert_not_called()
+    # первые напоминания равномерно разложены по 6-часовому слоту
+    slots = sorted(scheduler.due_queue.get(user_id) for user_id in user_ids)
+    assert slots[0] - opens < timedelta(minutes=30)
+    assert timedelta(hours=5, minutes=30) < slots[-1] - opens < timedelta(hours=6)
+    per_hour = [
+        sum(1 for slot in slots if hour <= (slot - opens) / timedelta(hours=1) < hour + 1)
+        for hour in range(6)
+    ]
+    assert max(per_hour) - min(per_hour) <= 6
+
+
+@pytest.mark.asyncio
+async def test_missed_window_moves_to_next_window():
+    """Тест, что пропущенное вне работы узла окно переносит напоминание в следующее"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    # окно открылось 13 часов назад и уже закрыто, слово наступило в нём
+    opens = (now - timedelta(hours=13)).replace(second=0, microsecond=0)
+    await db.add_user(1, "test", _settings_opening_at(opens))
+    await db.import_words(1, [("apple", "яблоко")], now - timedelta(hours=12, minutes=30))
+    notifier = MagicMock(send_word_reminder=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.load_due_queue()
+    assert scheduler.due_queue.get(1) < now
+    await scheduler.send_due_reminders(now)
+    await _dispatch(scheduler, now)
+
+    notifier.send_word_reminder.assert_not_called()
+    first_slot = opens + timedelta(days=1) + timedelta(hours=6) * jitter(1)
+    assert scheduler.due_queue.get(1) == first_slot
+    # база тоже перенесла момент отправки и больше не отдаёт пользователя
+    assert [row.next_send_at async for row in db.iter_due_users()] == [first_slot]
+    assert await db.get_due_words(now) == []
+
+
+@pytest.mark.asyncio
+async def test_motivation_goes_to_bucket_only():
+    """Тест, что мотивация уходит только пользователям своей минутной корзины"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    await db.add_user(1, "moscow", {"notification_time": "09:30", "timezone": "Europe/Moscow"})
+    await db.add_user(2, "utc", {"notification_time": "09:30", "timezone": "UTC"})
+    notifier = MagicMock(send_motivation=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.send_motivation_bucket(motivation_minute(6 * 60 + 30, 1))
+
+    notifier.send_motivation.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_motivation_resumes_after_restart():
+    """Тест, что после перезапуска мотивация досылается с контрольной точки"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    minute = motivation_minute(9 * 60 + 30, 1)
+    # пользователи с одной минутой мотивации
+    user_ids = [u for u in range(1, 500) if motivation_minute(9 * 60 + 30, u) == minute]
+    first, *rest = user_ids[:3]
+    for user_id in user_ids[:3]:
+        await db.add_user(user_id, "utc", {"notification_time": "09:30", "timezone": "UTC"})
+    today = datetime.now(timezone.utc).date()
+    name = f"motivation:{today}:{minute}"
+    await db.claim_broadcast(name, "old-process", 0, 3)
+    await db.checkpoint_broadcast(name, "old-process", 0, last_user_id=first, sent=1)
+    notifier = MagicMock(send_motivation=AsyncMock())
+
+    scheduler = Scheduler(db, notifier, Settings())
+    await scheduler.resume_broadcasts()
+
+    assert [c.args[0] for c in notifier.send_motivation.call_args_list] == rest
+    assert (await db.get_broadcast(name)).finished_at is not None
+    await scheduler.send_motivation_bucket(minute)
+    assert notifier.send_motivation.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_motivation_taken_over_after_lease_expires():
+    """Тест, что корзину упавшего узла досылает другой после истечения аренды"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    await db.add_user(1, "utc", {"notification_time": "09:30", "timezone": "UTC"})
+    minute = motivation_minute(9 * 60 + 30, 1)
+    name = f"motivation:{datetime.now(timezone.utc).date()}:{minute}"
+    await db.claim_broadcast(name, "dead-node", 300, 1)
+    notifier = MagicMock(send_motivation=AsyncMock())
+    scheduler = Scheduler(
+        db, notifier, Settings(scheduler_mode="lease", node_id="alive")
+    )
+
+    # аренда ещё действует: рассылку ведёт другой узел
+    await scheduler.resume_broadcasts()
+    notifier.send_motivation.assert_not_called()
+
+    db._broadcasts[name]["lease_until"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await scheduler.resume_broadcasts()
+
+    notifier.send_motivation.assert_called_once_with(1)
+    assert (await db.get_broadcast(name)).finished_at is not None
+
+
+@pytest.mark.asyncio
+async def test_lease_mode_two_nodes_send_once():
+    """Тест, что два узла в режиме lease не отправляют одно напоминание дважды"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    opens = now - timedelta(hours=6)
+    for user_id in (1, 2):
+        await db.add_user(user_id, "test", _settings_opening_at(opens))
+        await db.import_words(user_id, [("apple", "яблоко")], now - timedelta(minutes=1))
+    notifier = MagicMock(send_word_reminder=AsyncMock(), send_motivation=AsyncMock())
+
+    first = Scheduler(db, notifier, Settings(scheduler_mode="lease", node_id="a"))
+    second = Scheduler(db, notifier, Settings(scheduler_mode="lease", node_id="b"))
+    await first.send_due_reminders(now)
+    await second.send_due_reminders(now)
+    await _dispatch(first, now)
+    await _dispatch(second, now)
+
+    assert notifier.send_word_reminder.call_count == 2
+
+    for user_id in (1, 2):
+        minute = motivation_minute(opens.hour * 60 + opens.minute, user_id)
+        await first.send_motivation_bucket(minute)
+        await second.send_motivation_bucket(minute)
+    assert notifier.send_motivation.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_with_backoff():
+    """Тест, что неудачная отправка остаётся в outbox и повторяется с паузой"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    now = datetime.now(timezone.utc)
+    for user_id in (1, 2):
+        await db.add_user(user_id, "test", _settings_opening_at(now - timedelta(hours=6)))
+        await db.import_words(user_id, [("apple", "яблоко")], now - timedelta(minutes=1))
+
+    async def send(user_id, text):
+        if user_id == 1:
+            raise RuntimeError("telegram timeout")
+
+    notifier = MagicMock(send_word_reminder=AsyncMock(side_effect=send))
+    scheduler = Scheduler(
+        db, notifier, Settings(send_concurrency=2, outbox_backoff_seconds=30)
+    )
+    await scheduler.send_due_reminders(now)
+    result = await _dispatch(scheduler, now)
+
+    assert (result.sent, result.retried, result.dead) == (1, 1, 0)
+    assert await db.outbox_stats() == {"sent": 1, "pending": 1}
+    # слово перенесено вместе с записью в outbox, повтор — забота диспетчера
+    assert (await db.get_user_words(1))[0].next_repeat > now
+
+    # до истечения паузы повтора нет, после — сообщение уходит
+    await _dispatch(scheduler, now + timedelta(seconds=10))
+    assert notifier.send_word_reminder.call_count == 2
+    notifier.send_word_reminder.side_effect = None
+    result = await _dispatch(scheduler, now + timedelta(seconds=30))
+    assert result.sent == 1
+    assert await db.outbox_stats() == {"sent": 2}
+
+
+@pytest.mark.asyncio
+async def test_nightly_jobs_extend_activity_partitions(tmp_path):
+    """Тест, что ночное обслуживание досоздаёт секции событий на месяцы вперёд"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    db.ensure_activity_partitions = AsyncMock()
+
+    scheduler = Scheduler(db, MagicMock(), Settings(archive_dir=str(tmp_path)))
+    await scheduler.nightly_jobs()
+
+    db.ensure_activity_partitions.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_nightly_jobs_follow_dst_shift(tmp_path):
+    """Тест, что ночное обслуживание сдвигает окно после перехода на летнее время"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    settings = {"notification_time": "09:00", "timezone": "Europe/Berlin"}
+    await db.add_user(1, "berlin", settings)
+    await db.add_user(2, "utc", {"notification_time": "09:00", "timezone": "UTC"})
+    row = db._users[1]
+    fresh = row["notify_minute"]
+    # минута, сохранённая до перехода: сдвиг зоны отличается на час
+    row["notify_minute"] = (fresh + 60) % 1440
+    row["motivation_minute"] = motivation_minute(row["notify_minute"], 1)
+
+    scheduler = Scheduler(db, MagicMock(), Settings(archive_dir=str(tmp_path)))
+    await scheduler.nightly_jobs()
+
+    assert row["notify_minute"] == fresh
+    assert row["motivation_minute"] == motivation_minute(fresh, 1)
+    assert db._users[2]["notify_minute"] == 9 * 60
+
+
+@pytest.mark.asyncio
+async def test_nightly_jobs_retry_after_lease_expires(tmp_path, monkeypatch):
+    """Тест, что ночное обслуживание упавшего узла выполняет другой"""
+    db = InMemoryDatabase(WINDOW_MINUTES)
+    db.ensure_activity_partitions = AsyncMock()
+    job = f"archive:{datetime.now(timezone.utc).date()}"
+    await db.claim_job(job, "dead-node", 300)
+    settings = Settings(scheduler_mode="lease", node_id="alive", archive_dir=str(tmp_path))
+    scheduler = Scheduler(db, MagicMock(), settings)
+
+    async def expire_lease(seconds):
+        assert seconds == settings.lease_seconds
+        db._jobs[job]["lease_until"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+    monkeypatch.setattr("bot.services.scheduler.asyncio.sleep", expire_lease)
+    await scheduler.nightly_jobs()
+
+    db.ensure_activity_partitions.assert_called_once()
+    assert await db.is_job_done(job)
+
+    # завершённую задачу повторно не выполняют
+    await scheduler.nightly_jobs()
+    db.ensure_activity_partitions.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_fan_outs_share_send_rate():
+    """Тест, что одновременные рассылки вместе не превышают SEND_RATE_PER_SECOND"""
+    scheduler = Scheduler(InMemoryDatabase(), MagicMock(), Settings(send_rate_per_second=100))
+    loop = asyncio.get_running_loop()
+    started = []
+
+    async def worker(item):
+        started.append(loop.time())
+
+    await asyncio.gather(
+        scheduler.fan_out(range(5), worker, "outbox"),
+        scheduler.fan_out(range(5), worker, "motivation"),
+    )
+
+    # 10 запусков при 100 в секунду занимают не меньше 9 интервалов
+    assert max(started) - min(started) >= 0.085
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from bot.services.write_buffer import WriteBuffer
+
+
+@pytest.mark.asyncio
+async def test_flush_when_batch_is_full():
+    """Тест сброса пачки при достижении batch_size"""
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    buffer = WriteBuffer(flush, batch_size=3, flush_interval=10)
+    buffer.start()
+
+    for i in range(3):
+        await buffer.put(i)
+    await asyncio.sleep(0.01)
+
+    assert batches == [[0, 1, 2]]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_by_interval():
+    """Тест сброса неполной пачки по таймеру"""
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    buffer = WriteBuffer(flush, batch_size=100, flush_interval=0.02)
+    buffer.start()
+
+    await buffer.put("a")
+    await buffer.put("b")
+    await asyncio.sleep(0.1)
+
+    assert batches == [["a", "b"]]
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_everything():
+    """Тест, что при закрытии буфера ничего не теряется"""
+    flushed = []
+
+    async def flush(batch):
+        flushed.extend(batch)
+
+    buffer = WriteBuffer(flush, batch_size=4, flush_interval=10)
+    buffer.start()
+
+    for i in range(10):
+        await buffer.put(i)
+    await buffer.close()
+
+    assert flushed == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_put_waits_when_queue_is_full():
+    """Тест backpressure: put ждёт, пока очередь не освободится"""
+    buffer = WriteBuffer(lambda batch: asyncio.sleep(0), max_size=2)
+
+    await buffer.put(1)
+    await buffer.put(2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(buffer.put(3), timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_flush_error_does_not_stop_buffer():
+    """Тест, что неудачная запись пачки повторяется, а буфер продолжает работу"""
+    flushed = []
+    failures = []
+
+    async def flush(batch):
+        if batch == ["bad"] and len(failures) < 2:
+            failures.append(batch)
+            raise RuntimeError("db is down")
+        flushed.extend(batch)
+
+    buffer = WriteBuffer(flush, batch_size=1, flush_interval=10, retry_delay=0)
+    buffer.start()
+
+    await buffer.put("bad")
+    await buffer.put("good")
+    await buffer.close()
+
+    assert len(failures) == 2
+    assert flushed == ["bad", "good"]
+
+
+@pytest.mark.asyncio
+async def test_flush_retries_are_bounded(capsys):
+    """Тест, что повторы записи ограничены и не блокируют следующие пачки"""
+    attempts = []
+    flushed = []
+
+    async def flush(batch):
+        if batch == ["bad"]:
+            attempts.append(batch)
+            raise RuntimeError("db is down")
+        flushed.extend(batch)
+
+    buffer = WriteBuffer(flush, batch_size=1, flush_interval=10, retries=3, retry_delay=0)
+    buffer.start()
+
+    await buffer.put("bad")
+    await buffer.put("good")
+    await buffer.close()
+
+    assert len(attempts) == 4
+    assert flushed == ["good"]
+    assert "потеряна после 3 повторов" in capsys.readouterr().out